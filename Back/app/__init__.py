@@ -3,6 +3,7 @@ from app.routes import router
 from app.database import engine, Base, SessionLocal
 from app.model import *
 from app.API.ApiController import get_aliment_from_API
+from app.exercise_catalog import init_exercise_catalog, refresh_exercise_catalog
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from fastapi.middleware.cors import CORSMiddleware
@@ -38,6 +39,28 @@ def create_app():
     async def on_startup():
         await init_models()
 
+        async with SessionLocal() as session:
+            count = await init_exercise_catalog(session)
+            print(f"[Startup] Exercise catalog loaded ({count} exercises)")
+            count = await backfill_city_keys(session)
+            if count:
+                print(f"[Startup] Backfilled city search key for {count} user(s)")
+            count = await backfill_workout_metrics(session)
+            if count:
+                print(f"[Startup] Computed stored metrics for {count} workout(s)")
+            count = await backfill_meal_items(session)
+            if count:
+                print(f"[Startup] Normalized aliments of {count} meal(s) into meal items")
+            count = await backfill_exercise_progress(session)
+            if count:
+                print(f"[Startup] Built progression series for {count} completed workout(s)")
+            count = await backfill_forum_search_index(session)
+            if count:
+                print(f"[Startup] Indexed {count} forum(s) / message(s) for search")
+            count = await migrate_message_notifications(session)
+            if count:
+                print(f"[Startup] Moved {count} notification(s) from messages to the notifications table")
+
         async def run_cleanup():
             async with SessionLocal() as session:
                 count = await cleanup_inactive_forums(session)
@@ -53,10 +76,30 @@ def create_app():
                 count = await cleanup_inactive_accounts(session)
                 print(f"[Scheduler] RGPD: Deleted {count} inactive account(s) (18+ months)")
 
+        async def run_exercise_catalog_refresh():
+            async with SessionLocal() as session:
+                count = await refresh_exercise_catalog(session)
+                print(f"[Scheduler] Exercise catalog refreshed ({count} exercises)")
+
+        async def run_unread_counters_repair():
+            async with SessionLocal() as session:
+                count = await repair_unread_counters(session)
+                if count:
+                    print(f"[Scheduler] Repaired {count} unread message counter(s)")
+
+        async def run_sync_log_prune():
+            async with SessionLocal() as session:
+                count = await prune_sync_log(session)
+                if count:
+                    print(f"[Scheduler] Pruned {count} sync change log entries")
+
         scheduler.add_job(run_cleanup, CronTrigger(hour=0, minute=0))
         scheduler.add_job(run_auto_complete_workouts, CronTrigger(hour=23, minute=59))
         # RGPD: check inactive accounts daily at 02:00
         scheduler.add_job(run_inactive_accounts_cleanup, CronTrigger(hour=2, minute=0))
+        scheduler.add_job(run_exercise_catalog_refresh, CronTrigger(hour="*/6", minute=15))
+        scheduler.add_job(run_unread_counters_repair, CronTrigger(hour=3, minute=30))
+        scheduler.add_job(run_sync_log_prune, CronTrigger(hour=4, minute=0))
         scheduler.start()
 
     @app.on_event("shutdown")
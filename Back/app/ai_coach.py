@@ -7,11 +7,30 @@ Configure via environment variables:
   - AI_MODEL_NAME: "mistral-small-3.2-24b-instruct-2506"
   - MISTRAL_API_KEY: Your Scaleway Secret Key
   - SCALEWAY_API_URL: "https://api.scaleway.ai/65a7dd3f-2376-4856-8e6f-8162c28d6f9a/v1"
+  - AI_PROGRAM_PARALLEL / AI_PROGRAM_MAX_CONCURRENCY / AI_PROGRAM_DAY_RETRIES:
+    per-day concurrent program generation (default: on, 4 in flight, 2 retries)
+  - AI_PROGRAM_MEMO_TTL: seconds an identical program request is served from memory (default 600)
+  - AI_PROGRAM_TIMEOUT / AI_PROGRAM_FALLBACK: seconds before giving up on the provider and
+    building the program with the rule-based generator instead (default: 90s, fallback on)
 """
 
+import asyncio
+import copy
+import hashlib
+import json
 import os
+from collections import Counter
 from openai import AsyncOpenAI
 from dotenv import load_dotenv
+from app.cache import TTLCache
+from app.program_filter import (
+    RULE_BASED_SOURCE,
+    filter_exercises_for_day,
+    generate_rule_based_program,
+    injured_zones,
+    injury_groups,
+    pick_least_used,
+)
 
 load_dotenv()
 
@@ -24,6 +43,16 @@ AI_MODEL_NAME = os.getenv("AI_MODEL_NAME", "mistral-small-3.2-24b-instruct-2506"
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY", "")
 AI_API_BASE_URL = os.getenv("SCALEWAY_API_URL", "https://api.scaleway.ai/65a7dd3f-2376-4856-8e6f-8162c28d6f9a/v1")
 
+# Program generation: one completion per day, run concurrently
+AI_PROGRAM_PARALLEL = os.getenv("AI_PROGRAM_PARALLEL", "true").lower() in ("1", "true", "yes")
+AI_PROGRAM_MAX_CONCURRENCY = int(os.getenv("AI_PROGRAM_MAX_CONCURRENCY", "4"))
+AI_PROGRAM_DAY_RETRIES = int(os.getenv("AI_PROGRAM_DAY_RETRIES", "2"))
+# Identical generation requests within this window reuse the same result
+AI_PROGRAM_MEMO_TTL = int(os.getenv("AI_PROGRAM_MEMO_TTL", "600"))
+# Slow or failing provider: fall back to app.program_filter.generate_rule_based_program
+AI_PROGRAM_TIMEOUT = float(os.getenv("AI_PROGRAM_TIMEOUT", "90"))
+AI_PROGRAM_FALLBACK = os.getenv("AI_PROGRAM_FALLBACK", "true").lower() in ("1", "true", "yes")
+
 # ---------------------------------------------------------------------------
 # Client initialization
 # ---------------------------------------------------------------------------
@@ -204,57 +233,142 @@ async def generate_ai_response(
 # AI Workout Program Generation
 # ---------------------------------------------------------------------------
 
-async def generate_workout_program(
-    selected_dates: list[str],
+PROGRAM_SYSTEM_PROMPT = "You are a fitness program generator. Output ONLY valid JSON arrays. No markdown, no explanations, no code fences."
+
+# Fitness level guidelines
+LEVEL_GUIDELINES = {
+    "beginner": (
+        "- Beginner level: 2-3 sets per exercise, 12-15 reps, light weights (focus on form).\n"
+        "- Weight increments between progressive/degressive sets should be small (+/- 2kg).\n"
+        "- Keep total exercises per session to 4."
+    ),
+    "intermediate": (
+        "- Intermediate level: 3-4 sets per exercise, 8-12 reps, moderate weights.\n"
+        "- Weight increments between progressive/degressive sets: +/- 5kg.\n"
+        "- 4-5 exercises per session."
+    ),
+    "advanced": (
+        "- Advanced level: 4-5 sets per exercise, 6-10 reps, heavier weights.\n"
+        "- Weight increments between progressive/degressive sets: +/- 5-10kg.\n"
+        "- 5-6 exercises per session. Can include supersets."
+    ),
+}
+
+# Max exercise names listed per day in the variety summary sent to the other days
+VARIETY_SUMMARY_SIZE = 6
+
+
+def _program_days(selected_dates: list[str], day_configs: list[dict] | None) -> list[dict]:
+    """Normalize the request into one {date, focus, mode} entry per day."""
+    if day_configs:
+        return [{"date": dc["date"], "focus": dc["focus"], "mode": dc["mode"]} for dc in day_configs]
+    return [{"date": d, "focus": "Adapted Full Body", "mode": "progressive"} for d in selected_dates]
+
+
+# Per-mode and per-focus rules, only the ones used by the requested days are sent
+LOAD_MODE_RULES = {
+    "progressive": '- "progressive": Each set increases weight and decreases reps (pyramid up). Example: Set1: 12 reps @ 15kg → Set2: 10 reps @ 20kg → Set3: 8 reps @ 25kg',
+    "degressive": '- "degressive": Each set decreases weight and increases reps (drop set). Example: Set1: 8 reps @ 25kg → Set2: 10 reps @ 20kg → Set3: 12 reps @ 15kg',
+    "constant": '- "constant": Same weight and reps across all sets. Example: Set1: 10 reps @ 20kg → Set2: 10 reps @ 20kg → Set3: 10 reps @ 20kg',
+}
+
+FOCUS_RULES = {
+    "Full Body": '- "Full Body": Mix upper and lower body exercises for a balanced session',
+    "Adapted Full Body": '- "Adapted Full Body": Mix upper and lower body exercises, excluding injured zones',
+    "Upper Body": '- "Upper Body": Only chest, back, shoulders, biceps, triceps, forearms exercises',
+    "Lower Body": '- "Lower Body": Only quads, hamstrings, glutes, calves exercises',
+    "Push": '- "Push": Chest, shoulders, triceps exercises',
+    "Pull": '- "Pull": Back, biceps, forearms exercises',
+    "Core": '- "Core": Abs and core stability exercises',
+    "Cardio": '- "Cardio": Duration-based and cardio exercises',
+}
+
+# Injury protocol, split by injury group (see app.program_filter.INJURY_GROUPS) so that
+# only the sections matching the user's active injuries are sent
+INJURY_PROTOCOL_INTRO = (
+    "🚨 CRITICAL INJURY PROTOCOL (BIOMECHANICS):\n"
+    "When creating a workout for a user with active injuries, you MUST NOT simply exclude exercises that target the injured muscle. You MUST evaluate the biomechanical role of the injured joint in EVERY exercise you consider.\n"
+    "\n"
+    'General principle — Stabilizers & Anchors: Exclude any exercise where the injured joint acts as a stabilizer, anchor, or supports body weight, even if the exercise "targets" a completely different muscle group.'
+)
+
+INJURY_PROTOCOL_SECTIONS = {
+    "shoulder": (
+        "Shoulder injuries (right_shoulder, left_shoulder, right_trapezius, left_trapezius) — Strict rules:\n"
+        "- NO hanging exercises (e.g., Pull-ups, Chin-ups, Hanging Leg Raises) — 100% of body weight stretches and loads the shoulder joint.\n"
+        "- NO Barbell Back Squats — requires extreme external shoulder rotation to hold the bar. Replace with Hack Squat, Leg Press, or Goblet Squat.\n"
+        "- NO unsupported heavy pulling (e.g., Heavy Barbell Rows, Bent Over Barbell Rows, Deadlifts, T-Bar Rows) — places massive isometric stress on the rotator cuff. Replace with Chest-Supported Rows, seated machine rows, or cable rows.\n"
+        "- NO overhead pressing (e.g., Overhead Press, Military Press, Arnold Press, Push Press) — direct compression of the shoulder joint.\n"
+        "- NO dips — heavy shoulder extension under load, high injury risk.\n"
+        "- PREFER machine-based or cable alternatives that do not require the shoulder to stabilize freely (e.g., Machine Chest Press instead of Barbell Bench Press, Cable Lateral Raises instead of Dumbbell Lateral Raises)."
+    ),
+    "lower_back": (
+        "Lower back injuries (lower_back) — Strict rules:\n"
+        "- NO axial loading (e.g., Barbell Squats, Standing Overhead Press, Deadlifts) — compresses the lumbar spine.\n"
+        "- NO unsupported hinge movements (e.g., Romanian Deadlifts, Barbell Rows, Good Mornings) — high shear force on lumbar discs.\n"
+        "- ALWAYS prioritize machine-based alternatives that isolate the target muscle without spinal loading (e.g., Leg Press, Chest-Supported Row, Cable Crunch, Machine Leg Curl)."
+    ),
+    "knee": (
+        "Knee injuries (right_knee, left_knee) — Strict rules:\n"
+        "- NO deep squats, lunges, or leg extensions with heavy load — high patellofemoral stress.\n"
+        "- PREFER partial range-of-motion exercises, leg press with controlled ROM, or isometric holds.\n"
+        "- NO plyometrics (jump squats, box jumps)."
+    ),
+    "elbow": (
+        "Elbow injuries (right_elbow, left_elbow) — Strict rules:\n"
+        "- NO heavy barbell curls or skull crushers — high stress on the elbow joint.\n"
+        "- PREFER cable or machine isolation movements with controlled load."
+    ),
+    "hip": (
+        "Hip injuries (right_hip, left_hip) — Strict rules:\n"
+        "- NO deep squats, heavy lunges, or sumo deadlifts.\n"
+        "- PREFER machine-based leg work (Leg Press, Machine Leg Curl, Machine Leg Extension) with controlled ROM."
+    ),
+    "other": (
+        "For ANY other injured zone: apply the same principle — if the injured joint bears load, stabilizes, anchors, or undergoes significant stretch/compression during the exercise, EXCLUDE that exercise and find a safer machine-based or supported alternative."
+    ),
+}
+
+INJURY_PROTOCOL_OUTRO = (
+    'In the "description" field of each workout, you MUST explicitly mention which exercises were excluded due to injury biomechanics and what alternatives were chosen instead.'
+)
+
+
+def _injury_protocol(injuries: list[str]) -> str:
+    """Injury protocol text restricted to the sections relevant to `injuries` (empty if none)."""
+    groups = injury_groups(injured_zones(injuries))
+    if not groups:
+        return ""
+    sections = [INJURY_PROTOCOL_SECTIONS[g] for g in INJURY_PROTOCOL_SECTIONS if g in groups]
+    return "\n\n".join([INJURY_PROTOCOL_INTRO, *sections, INJURY_PROTOCOL_OUTRO]) + "\n\n"
+
+
+def _build_program_prompt(
+    days: list[dict],
     available_exercises: list[dict],
     user_context: dict,
-    day_configs: list[dict] | None = None,
-) -> list[dict]:
-    """
-    Ask the AI to generate a structured workout program for the given dates,
-    using only the provided exercises, adapted to the user's profile and injuries.
-    Returns a list of workout dicts ready to be saved.
-    """
-    import json
-
-    client = get_ai_client()
-
+    variety_notes: str = "",
+) -> str:
     exercises_str = "\n".join([
         f"- {ex['name']} (muscle: {ex['muscle']}, type: {ex['type']}, difficulty: {ex['difficulty']})"
         for ex in available_exercises
     ])
 
-    injuries_str = "\n".join(user_context.get("injuries", [])) or "None"
+    injuries = user_context.get("injuries", [])
+    injuries_str = "\n".join(injuries) or "None"
     fitness_level = user_context.get("fitness_level", "intermediate")
 
-    # Build per-day instructions
-    day_instructions = ""
-    if day_configs:
-        day_lines = []
-        for dc in day_configs:
-            day_lines.append(f"  - {dc['date']}: Focus = {dc['focus']}, Load mode = {dc['mode']}")
-        day_instructions = "\n".join(day_lines)
-    else:
-        day_instructions = "\n".join([f"  - {d}: Focus = Adapted Full Body, Load mode = progressive" for d in selected_dates])
-
-    # Fitness level guidelines
-    level_guidelines = {
-        "beginner": (
-            "- Beginner level: 2-3 sets per exercise, 12-15 reps, light weights (focus on form).\n"
-            "- Weight increments between progressive/degressive sets should be small (+/- 2kg).\n"
-            "- Keep total exercises per session to 4."
-        ),
-        "intermediate": (
-            "- Intermediate level: 3-4 sets per exercise, 8-12 reps, moderate weights.\n"
-            "- Weight increments between progressive/degressive sets: +/- 5kg.\n"
-            "- 4-5 exercises per session."
-        ),
-        "advanced": (
-            "- Advanced level: 4-5 sets per exercise, 6-10 reps, heavier weights.\n"
-            "- Weight increments between progressive/degressive sets: +/- 5-10kg.\n"
-            "- 5-6 exercises per session. Can include supersets."
-        ),
-    }
+    day_instructions = "\n".join([
+        f"  - {day['date']}: Focus = {day['focus']}, Load mode = {day['mode']}" for day in days
+    ])
+    used_modes = {day["mode"] for day in days}
+    used_focuses = {day["focus"] for day in days}
+    mode_rules = "\n".join(
+        rule for mode, rule in LOAD_MODE_RULES.items() if mode in used_modes
+    ) or "\n".join(LOAD_MODE_RULES.values())
+    focus_rules = "\n".join(
+        rule for focus, rule in FOCUS_RULES.items() if focus in used_focuses
+    ) or "\n".join(FOCUS_RULES.values())
 
     prompt = f"""Generate a workout program for the following dates with per-day preferences:
 {day_instructions}
@@ -266,62 +380,18 @@ User profile:
 - Active injuries: {injuries_str}
 
 Fitness level guidelines:
-{level_guidelines.get(fitness_level, level_guidelines['intermediate'])}
+{LEVEL_GUIDELINES.get(fitness_level, LEVEL_GUIDELINES['intermediate'])}
 
 Load mode rules:
-- "progressive": Each set increases weight and decreases reps (pyramid up). Example: Set1: 12 reps @ 15kg → Set2: 10 reps @ 20kg → Set3: 8 reps @ 25kg
-- "degressive": Each set decreases weight and increases reps (drop set). Example: Set1: 8 reps @ 25kg → Set2: 10 reps @ 20kg → Set3: 12 reps @ 15kg
-- "constant": Same weight and reps across all sets. Example: Set1: 10 reps @ 20kg → Set2: 10 reps @ 20kg → Set3: 10 reps @ 20kg
+{mode_rules}
 
 Focus rules:
-- "Full Body": Mix upper and lower body exercises for a balanced session
-- "Adapted Full Body": Mix upper and lower body exercises, excluding injured zones
-- "Upper Body": Only chest, back, shoulders, biceps, triceps, forearms exercises
-- "Lower Body": Only quads, hamstrings, glutes, calves exercises
-- "Push": Chest, shoulders, triceps exercises
-- "Pull": Back, biceps, forearms exercises
-- "Core": Abs and core stability exercises
-- "Cardio": Duration-based and cardio exercises
-
-Available exercises (ONLY use exercises from this list, use their EXACT names):
-{exercises_str}
-
-🚨 CRITICAL INJURY PROTOCOL (BIOMECHANICS):
-When creating a workout for a user with active injuries, you MUST NOT simply exclude exercises that target the injured muscle. You MUST evaluate the biomechanical role of the injured joint in EVERY exercise you consider.
-
-General principle — Stabilizers & Anchors: Exclude any exercise where the injured joint acts as a stabilizer, anchor, or supports body weight, even if the exercise "targets" a completely different muscle group.
-
-Shoulder injuries (right_shoulder, left_shoulder, right_trapezius, left_trapezius) — Strict rules:
-- NO hanging exercises (e.g., Pull-ups, Chin-ups, Hanging Leg Raises) — 100% of body weight stretches and loads the shoulder joint.
-- NO Barbell Back Squats — requires extreme external shoulder rotation to hold the bar. Replace with Hack Squat, Leg Press, or Goblet Squat.
-- NO unsupported heavy pulling (e.g., Heavy Barbell Rows, Bent Over Barbell Rows, Deadlifts, T-Bar Rows) — places massive isometric stress on the rotator cuff. Replace with Chest-Supported Rows, seated machine rows, or cable rows.
-- NO overhead pressing (e.g., Overhead Press, Military Press, Arnold Press, Push Press) — direct compression of the shoulder joint.
-- NO dips — heavy shoulder extension under load, high injury risk.
-- PREFER machine-based or cable alternatives that do not require the shoulder to stabilize freely (e.g., Machine Chest Press instead of Barbell Bench Press, Cable Lateral Raises instead of Dumbbell Lateral Raises).
+{focus_rules}
 
-Lower back injuries (lower_back) — Strict rules:
-- NO axial loading (e.g., Barbell Squats, Standing Overhead Press, Deadlifts) — compresses the lumbar spine.
-- NO unsupported hinge movements (e.g., Romanian Deadlifts, Barbell Rows, Good Mornings) — high shear force on lumbar discs.
-- ALWAYS prioritize machine-based alternatives that isolate the target muscle without spinal loading (e.g., Leg Press, Chest-Supported Row, Cable Crunch, Machine Leg Curl).
-
-Knee injuries (right_knee, left_knee) — Strict rules:
-- NO deep squats, lunges, or leg extensions with heavy load — high patellofemoral stress.
-- PREFER partial range-of-motion exercises, leg press with controlled ROM, or isometric holds.
-- NO plyometrics (jump squats, box jumps).
-
-Elbow injuries (right_elbow, left_elbow) — Strict rules:
-- NO heavy barbell curls or skull crushers — high stress on the elbow joint.
-- PREFER cable or machine isolation movements with controlled load.
-
-Hip injuries (right_hip, left_hip) — Strict rules:
-- NO deep squats, heavy lunges, or sumo deadlifts.
-- PREFER machine-based leg work (Leg Press, Machine Leg Curl, Machine Leg Extension) with controlled ROM.
-
-For ANY other injured zone: apply the same principle — if the injured joint bears load, stabilizes, anchors, or undergoes significant stretch/compression during the exercise, EXCLUDE that exercise and find a safer machine-based or supported alternative.
-
-In the "description" field of each workout, you MUST explicitly mention which exercises were excluded due to injury biomechanics and what alternatives were chosen instead.
+Available exercises (ONLY use exercises from this list, use their EXACT names; already filtered for each day's focus and the user's injuries):
+{exercises_str}
 
-🎯 RULE FOR VARIETY & PROGRESSION:
+{_injury_protocol(injuries)}🎯 RULE FOR VARIETY & PROGRESSION:
 - NEVER repeat the exact same workout on multiple days. If generating a multi-day plan, ensure HIGH exercise variety across all days. Each day MUST have a different exercise selection.
 - Even with strict injury constraints, find DIFFERENT safe alternative exercises for each day. For example: if Day 1 uses Leg Press, Day 2 should use Hack Squat or Leg Extensions/Curls instead. Rotate through all available safe exercises before reusing any.
 - NEVER copy-paste the description text. Each day's "description" field MUST be unique, engaging, and explain how this specific day complements the others in the weekly plan (e.g., "Yesterday focused on quads with Leg Press; today we shift to hamstrings and glutes with Leg Curls and Hip Thrusts to balance your lower body development.").
@@ -329,6 +399,7 @@ In the "description" field of each workout, you MUST explicitly mention which ex
 - Vary the number of sets too when appropriate (e.g., 4 sets for compound movements, 3 sets for isolation).
 - If the user selected different focus areas per day (e.g., Upper Body on Day 1, Lower Body on Day 2), this naturally creates variety. But if the user selected the SAME focus for multiple days, you MUST still create distinct workouts with different exercises and rep schemes for each day.
 
+{variety_notes}
 Rules:
 - For "strength" type exercises: apply the load mode specified for that day.
 - For "duration" type exercises: set reps to 0. In progressive mode increase duration each set, in degressive mode decrease it, in constant keep it the same.
@@ -358,29 +429,271 @@ CRITICAL: Return ONLY a valid JSON array, no markdown, no code fences, no explan
   }}
 ]
 """
+    return prompt
+
 
+def _parse_program_json(raw: str):
+    """Parse the model output, stripping potential markdown code fences."""
+    raw = (raw or "[]").strip()
+    if raw.startswith("```"):
+        lines = raw.split("\n")
+        lines = lines[1:]  # Remove opening fence
+        if lines and lines[-1].strip() == "```":
+            lines = lines[:-1]  # Remove closing fence
+        raw = "\n".join(lines).strip()
+
+    return json.loads(raw)
+
+
+async def _complete_program(prompt: str, max_tokens: int) -> str:
+    client = get_ai_client()
     response = await client.chat.completions.create(
         model=AI_MODEL_NAME,
         messages=[
-            {
-                "role": "system",
-                "content": "You are a fitness program generator. Output ONLY valid JSON arrays. No markdown, no explanations, no code fences.",
-            },
+            {"role": "system", "content": PROGRAM_SYSTEM_PROMPT},
             {"role": "user", "content": prompt},
         ],
-        max_tokens=4096,
+        max_tokens=max_tokens,
         temperature=0.3,
     )
+    return response.choices[0].message.content or "[]"
 
-    raw = response.choices[0].message.content or "[]"
 
-    # Strip potential markdown code fences
-    raw = raw.strip()
-    if raw.startswith("```"):
-        lines = raw.split("\n")
-        lines = lines[1:]  # Remove opening fence
-        if lines and lines[-1].strip() == "```":
-            lines = lines[:-1]  # Remove closing fence
-        raw = "\n".join(lines).strip()
+def _merge_candidates(candidates_per_day: list[list[dict]]) -> list[dict]:
+    """Union of the per-day candidate lists, first occurrence order."""
+    merged, seen = [], set()
+    for candidates in candidates_per_day:
+        for ex in candidates:
+            if ex["name"] not in seen:
+                seen.add(ex["name"])
+                merged.append(ex)
+    return merged
+
 
-    return json.loads(raw)
\ No newline at end of file
+async def generate_workout_program(
+    selected_dates: list[str],
+    available_exercises: list[dict],
+    user_context: dict,
+    day_configs: list[dict] | None = None,
+    parallel: bool | None = None,
+) -> list[dict]:
+    """
+    Ask the AI to generate a structured workout program for the given dates,
+    using only the provided exercises, adapted to the user's profile and injuries.
+    Returns a list of workout dicts ready to be saved.
+
+    The exercises are first filtered per day (focus + injury rules, see
+    app.program_filter) so the prompt only lists real candidates. Multi-day
+    programs are generated one day per completion, concurrently (see
+    generate_workout_program_by_day); pass parallel=False to force the legacy
+    single-completion mode. If the provider errors or takes longer than
+    AI_PROGRAM_TIMEOUT, the rule-based generator builds the program instead.
+    """
+    days = _program_days(selected_dates, day_configs)
+
+    if parallel is None:
+        parallel = AI_PROGRAM_PARALLEL and len(days) > 1
+
+    try:
+        return await asyncio.wait_for(
+            _generate_with_ai(days, available_exercises, user_context, parallel),
+            timeout=AI_PROGRAM_TIMEOUT,
+        )
+    except Exception as e:
+        if not AI_PROGRAM_FALLBACK:
+            raise
+        print(f"[AI Program] AI generation unavailable ({e!r}), using rule-based program")
+        return generate_rule_based_program(days, available_exercises, user_context)
+
+
+async def _generate_with_ai(days: list[dict], available_exercises: list[dict], user_context: dict, parallel: bool) -> list[dict]:
+    if parallel:
+        return await generate_workout_program_by_day(days, available_exercises, user_context)
+
+    injuries = user_context.get("injuries", [])
+    candidates = _merge_candidates([filter_exercises_for_day(day, available_exercises, injuries) for day in days])
+    prompt = _build_program_prompt(days, candidates, user_context)
+    raw = await _complete_program(prompt, max_tokens=4096)
+    return _parse_program_json(raw)
+
+
+# ---------------------------------------------------------------------------
+# Per-day parallel generation
+# ---------------------------------------------------------------------------
+
+def _reserve_exercises_per_day(candidates_per_day: list[list[dict]]) -> list[list[str]]:
+    """
+    Deterministically spread each day's candidates over the plan (least used
+    first) so that days generated concurrently can be told what the others will
+    likely use before any of them has answered.
+    """
+    usage: Counter = Counter()
+    return [
+        [ex["name"] for ex in pick_least_used(candidates, usage, VARIETY_SUMMARY_SIZE)]
+        for candidates in candidates_per_day
+    ]
+
+
+def _variety_notes(index: int, days: list[dict], choices: list[list[str]]) -> str:
+    """Compact summary of the exercise choices of every other day of the plan."""
+    lines = []
+    for j, day in enumerate(days):
+        if j == index or not choices[j]:
+            continue
+        names = ", ".join(choices[j][:VARIETY_SUMMARY_SIZE])
+        lines.append(f"- {day['date']} ({day['focus']}, {day['mode']}): {names}")
+    if not lines:
+        return ""
+    return (
+        "OTHER DAYS OF THIS PLAN (generated separately). This prompt covers ONE day only; "
+        "pick DIFFERENT exercises from the ones below whenever a safe alternative exists:\n"
+        + "\n".join(lines)
+        + "\n"
+    )
+
+
+def _validate_day(data, day: dict) -> dict:
+    """Extract the single workout for `day` from the model output and validate it."""
+    from app.schemas import GeneratedWorkout
+
+    if isinstance(data, list):
+        if not data:
+            raise ValueError("empty program")
+        matching = [w for w in data if str(w.get("scheduled_date", "")).startswith(day["date"])]
+        data = matching[0] if matching else data[0]
+    if not isinstance(data, dict):
+        raise ValueError("workout is not a JSON object")
+
+    if not str(data.get("scheduled_date", "")).startswith(day["date"]):
+        data["scheduled_date"] = f"{day['date']}T10:00:00"
+
+    workout = GeneratedWorkout.model_validate(data)
+    if not workout.exercises:
+        raise ValueError("workout has no exercises")
+    return workout.model_dump()
+
+
+async def generate_workout_program_by_day(
+    days: list[dict],
+    available_exercises: list[dict],
+    user_context: dict,
+    max_concurrency: int = AI_PROGRAM_MAX_CONCURRENCY,
+    max_retries: int = AI_PROGRAM_DAY_RETRIES,
+) -> list[dict]:
+    """
+    Generate each day of the program in its own small completion, with at most
+    `max_concurrency` requests in flight. Each prompt carries a compact summary of
+    the other days' exercises to keep variety across the week. Days whose output
+    fails to parse or validate against GeneratedWorkout are retried alone (with the
+    real choices of the days that already succeeded), up to `max_retries` times;
+    days still failing after that get a rule-based session.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    injuries = user_context.get("injuries", [])
+    candidates = [filter_exercises_for_day(day, available_exercises, injuries) for day in days]
+    choices = _reserve_exercises_per_day(candidates)
+    results: dict[int, dict] = {}
+
+    async def generate_day(index: int) -> dict:
+        day = days[index]
+        prompt = _build_program_prompt(
+            [day],
+            candidates[index],
+            user_context,
+            variety_notes=_variety_notes(index, days, choices),
+        )
+        async with semaphore:
+            raw = await _complete_program(prompt, max_tokens=1536)
+        return _validate_day(_parse_program_json(raw), day)
+
+    pending = list(range(len(days)))
+    for attempt in range(max_retries + 1):
+        if not pending:
+            break
+        outcomes = await asyncio.gather(*(generate_day(i) for i in pending), return_exceptions=True)
+
+        failed = []
+        for index, outcome in zip(pending, outcomes):
+            if isinstance(outcome, Exception):
+                print(f"[AI Program] Day {days[index]['date']} failed (attempt {attempt + 1}): {outcome}")
+                failed.append(index)
+            else:
+                results[index] = outcome
+                choices[index] = [ex["name"] for ex in outcome["exercises"]]
+        pending = failed
+
+    if not results:
+        raise ValueError("AI generation failed for every selected day")
+    if pending:
+        print(f"[AI Program] Giving up on {', '.join(days[i]['date'] for i in pending)}")
+        if AI_PROGRAM_FALLBACK:
+            fallback = generate_rule_based_program([days[i] for i in pending], available_exercises, user_context)
+            results.update(zip(pending, fallback))
+
+    return [results[i] for i in sorted(results)]
+
+
+# ---------------------------------------------------------------------------
+# Memoized generation
+# ---------------------------------------------------------------------------
+
+_program_memo = TTLCache(ttl_seconds=AI_PROGRAM_MEMO_TTL, max_entries=256)
+_program_inflight: dict[str, asyncio.Task] = {}
+
+
+def _program_cache_key(
+    user_id: int,
+    selected_dates: list[str],
+    available_exercises: list[dict],
+    user_context: dict,
+    day_configs: list[dict] | None,
+) -> str:
+    payload = json.dumps(
+        {
+            "user_id": user_id,
+            "days": _program_days(selected_dates, day_configs),
+            "exercises": sorted(available_exercises, key=lambda ex: ex["name"]),
+            "context": user_context,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+async def generate_workout_program_cached(
+    user_id: int,
+    selected_dates: list[str],
+    available_exercises: list[dict],
+    user_context: dict,
+    day_configs: list[dict] | None = None,
+) -> list[dict]:
+    """
+    Same as generate_workout_program, but identical requests (same user context,
+    exercises and day configs) within AI_PROGRAM_MEMO_TTL share one LLM call.
+    A request arriving while the same generation is still running waits for it
+    instead of starting a second one.
+    """
+    key = _program_cache_key(user_id, selected_dates, available_exercises, user_context, day_configs)
+
+    cached = _program_memo.get(key)
+    if cached is not None:
+        return copy.deepcopy(cached)
+
+    task = _program_inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(generate_workout_program(
+            selected_dates=selected_dates,
+            available_exercises=available_exercises,
+            user_context=user_context,
+            day_configs=day_configs,
+        ))
+        _program_inflight[key] = task
+        task.add_done_callback(lambda _: _program_inflight.pop(key, None))
+
+    # shield: a caller going away must not cancel the generation others wait on
+    result = await asyncio.shield(task)
+    # a rule-based fallback is not memoized: the next request should retry the AI
+    if not any(w.get("source") == RULE_BASED_SOURCE for w in result):
+        _program_memo.set(key, result)
+    return copy.deepcopy(result)
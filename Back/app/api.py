@@ -3,6 +3,7 @@ import urllib.parse
 from fastapi import HTTPException
 from dotenv import load_dotenv
 import os
+from app.exercise_catalog import exercise_index
 
 def get_auth_params():
     return {
@@ -112,36 +113,12 @@ def get_food_by_code(code, quantity):
         return None
 
 def get_muscles():
-    EXERCICES_API_URL = os.getenv("EXERCICES_API_URL")
-    FULL_URL = f"{EXERCICES_API_URL}/muscles"
-    response = requests.get(FULL_URL)
-
-    if response.status_code == 200:
-        try:
-            data = response.json()
-            return data
-        except ValueError:
-            print("Erreur de décodage JSON pour l'URL :", FULL_URL)
-            return None
-    elif response.status_code == 404:
-        raise HTTPException(status_code=404, detail="Ressource non trouvée")
-    return [];
-    
-def get_exercises(muscle):
-    EXERCICES_API_URL = os.getenv("EXERCICES_API_URL")
-    FULL_URL = f"{EXERCICES_API_URL}/muscles/{muscle}/exercises"
-    response = requests.get(FULL_URL)
+    return exercise_index.muscles()
 
-    if response.status_code == 200:
-        try:
-            data = response.json()
-            return data
-        except ValueError:
-            print("Erreur de décodage JSON pour l'URL :", FULL_URL)
-            return None
-    elif response.status_code == 404:
+def get_exercises(muscle, target=None, difficulty=None):
+    if not exercise_index.has_muscle(muscle):
         raise HTTPException(status_code=404, detail="Muscle not found")
-    return [];
+    return exercise_index.exercises(muscle=muscle, target=target, difficulty=difficulty)
 
 def scan_food(code, format):
     SCAN_API = os.getenv("SCAN_API")
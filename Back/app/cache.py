@@ -0,0 +1,65 @@
+"""
+Small in-process caches with TTL eviction.
+
+Entries live in the memory of the worker that created them, so only use this
+for data that can always be recomputed or re-requested (AI program previews,
+memoized generations, directory listings...).
+"""
+
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Dict-like cache where every entry expires `ttl_seconds` after being set.
+
+    Expired entries are evicted lazily (on read and on write); when the cache is
+    full the least recently used entry is dropped.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self.evict_expired()
+        self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        value = self.get(key, default)
+        self._data.pop(key, None)
+        return value
+
+    def clear(self):
+        self._data.clear()
+
+    def evict_expired(self) -> int:
+        now = time.monotonic()
+        expired = [key for key, (expires_at, _) in self._data.items() if expires_at <= now]
+        for key in expired:
+            del self._data[key]
+        return len(expired)
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+_MISSING = object()
@@ -0,0 +1,242 @@
+"""
+Local exercise catalog.
+
+The bundled catalog (app/data/exercise_catalog.json, the same exercises as the
+mobile app's LOCAL_EXERCISES) is written to the `exercice` table at startup and
+indexed in memory by muscle, target and difficulty, so /getMuscles/ and
+/getExercises/{muscle} are answered without leaving the process.
+
+`refresh_exercise_catalog` runs on the scheduler: it re-reads the table into the
+index and, when EXERCISE_CATALOG_REMOTE_SYNC is enabled, first merges the remote
+catalog served at EXERCICES_API_URL (ExerciseDB v1 format).
+"""
+
+import json
+import os
+from pathlib import Path
+
+import httpx
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.schemas import Exercice
+
+CATALOG_PATH = Path(__file__).parent / "data" / "exercise_catalog.json"
+
+EXERCISE_CATALOG_REMOTE_SYNC = os.getenv("EXERCISE_CATALOG_REMOTE_SYNC", "false").lower() in ("1", "true", "yes")
+REMOTE_PAGE_SIZE = 100
+REMOTE_MAX_PAGES = 20
+
+DIFFICULTY_LEVELS = ("beginner", "intermediate", "advanced")
+
+# ExerciseDB target muscles -> app muscle groups (others are not imported)
+REMOTE_MUSCLE_GROUPS = {
+    "pectorals": "chest",
+    "serratus anterior": "chest",
+    "lats": "back",
+    "upper back": "back",
+    "spine": "back",
+    "quads": "legs",
+    "hamstrings": "legs",
+    "adductors": "legs",
+    "abductors": "legs",
+    "glutes": "glutes",
+    "calves": "calves",
+    "delts": "shoulders",
+    "traps": "trapezius",
+    "levator scapulae": "trapezius",
+    "biceps": "arms",
+    "triceps": "arms",
+    "forearms": "arms",
+    "abs": "abs",
+    "cardiovascular system": "cardio",
+}
+
+
+# ---------------------------------------------------------------------------
+# In-memory index
+# ---------------------------------------------------------------------------
+
+class ExerciseIndex:
+    """Read-only view of the catalog, indexed by muscle, target and difficulty.
+
+    `load` builds new indexes and swaps them in at once, so readers never see a
+    half-built catalog during a refresh.
+    """
+
+    def __init__(self):
+        self._by_muscle: dict[str, list[dict]] = {}
+        self._by_target: dict[str, list[dict]] = {}
+        self._by_difficulty: dict[str, list[dict]] = {}
+        self._muscles: list[str] = []
+
+    def load(self, exercises: list[dict]) -> int:
+        by_muscle: dict[str, list[dict]] = {}
+        by_target: dict[str, list[dict]] = {}
+        by_difficulty: dict[str, list[dict]] = {}
+        for ex in exercises:
+            by_muscle.setdefault(ex["muscle"], []).append(ex)
+            by_target.setdefault(ex["target"], []).append(ex)
+            by_difficulty.setdefault(ex["difficulty"], []).append(ex)
+
+        self._by_muscle, self._by_target, self._by_difficulty = by_muscle, by_target, by_difficulty
+        self._muscles = sorted(by_muscle)
+        return len(exercises)
+
+    def muscles(self) -> list[str]:
+        return self._muscles
+
+    def has_muscle(self, muscle: str) -> bool:
+        return muscle in self._by_muscle
+
+    def exercises(self, muscle: str | None = None, target: str | None = None, difficulty: str | None = None) -> list[dict]:
+        """Exercises matching every given filter, catalog order."""
+        if muscle is not None:
+            candidates = self._by_muscle.get(muscle, [])
+        elif target is not None:
+            candidates = self._by_target.get(target, [])
+        elif difficulty is not None:
+            candidates = self._by_difficulty.get(difficulty, [])
+        else:
+            candidates = [ex for m in self._muscles for ex in self._by_muscle[m]]
+
+        return [
+            ex for ex in candidates
+            if (target is None or ex["target"] == target)
+            and (difficulty is None or ex["difficulty"] == difficulty)
+        ]
+
+
+exercise_index = ExerciseIndex()
+
+
+# ---------------------------------------------------------------------------
+# Catalog sources
+# ---------------------------------------------------------------------------
+
+def load_bundled_catalog() -> list[dict]:
+    with open(CATALOG_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _remote_to_entry(item: dict) -> dict | None:
+    """ExerciseDB v1 exercise -> catalog entry, None if its muscle is not an app group."""
+    target = (item.get("targetMuscles") or [None])[0]
+    muscle = REMOTE_MUSCLE_GROUPS.get(target)
+    if not muscle or not item.get("name"):
+        return None
+    equipment = (item.get("equipments") or [None])[0]
+    instructions = item.get("instructions") or []
+    return {
+        "name": item["name"].title(),
+        "muscle": muscle,
+        "target": target,
+        "equipment": equipment.title() if equipment else None,
+        "type": "duration" if muscle == "cardio" else "strength",
+        "difficulty": "intermediate",
+        "description": instructions[0] if instructions else "",
+        "body_zones": [],
+        "video_url": item.get("gifUrl"),
+    }
+
+
+async def fetch_remote_catalog() -> list[dict]:
+    """Page through the remote ExerciseDB catalog (EXERCICES_API_URL)."""
+    base_url = os.getenv("EXERCICES_API_URL")
+    if not base_url:
+        return []
+
+    entries = []
+    async with httpx.AsyncClient(timeout=10) as client:
+        for page in range(REMOTE_MAX_PAGES):
+            response = await client.get(
+                f"{base_url}/exercises",
+                params={"offset": page * REMOTE_PAGE_SIZE, "limit": REMOTE_PAGE_SIZE},
+            )
+            response.raise_for_status()
+            payload = response.json()
+            for item in payload.get("data", []):
+                entry = _remote_to_entry(item)
+                if entry:
+                    entries.append(entry)
+            if not (payload.get("metadata") or {}).get("nextPage"):
+                break
+    return entries
+
+
+# ---------------------------------------------------------------------------
+# Database sync
+# ---------------------------------------------------------------------------
+
+def _entry_to_row(entry: dict) -> dict:
+    is_bodyweight = entry.get("equipment") == "Bodyweight"
+    return {
+        "exercice_name": entry["name"][:50],
+        "muscle": entry["muscle"],
+        "target": entry["target"],
+        "difficulty": entry.get("difficulty") or "intermediate",
+        "exercise_type": entry.get("type") or "strength",
+        "equipment": entry.get("equipment"),
+        "body_zones": entry.get("body_zones") or [],
+        "is_bodyweight": is_bodyweight,
+        "weight_required": not is_bodyweight and entry.get("type") != "duration",
+        "description": (entry.get("description") or "")[:255],
+        "video_url": entry.get("video_url"),
+    }
+
+
+def _row_to_exercise(row: Exercice) -> dict:
+    return {
+        "id": row.id,
+        "name": row.exercice_name,
+        "muscle": row.muscle,
+        "target": row.target,
+        "difficulty": row.difficulty,
+        "type": row.exercise_type,
+        "equipment": row.equipment,
+        "body_zones": row.body_zones or [],
+        "is_bodyweight": row.is_bodyweight,
+        "description": row.description,
+        "video_url": row.video_url,
+    }
+
+
+async def sync_exercise_catalog(session: AsyncSession, entries: list[dict]) -> int:
+    """Insert the catalog entries missing from the `exercice` table (by name), in one batch."""
+    result = await session.execute(select(Exercice.exercice_name))
+    known = {name.lower() for name in result.scalars().all()}
+
+    rows = []
+    for entry in entries:
+        row = _entry_to_row(entry)
+        if row["exercice_name"].lower() not in known:
+            known.add(row["exercice_name"].lower())
+            rows.append(row)
+
+    if rows:
+        await session.execute(insert(Exercice), rows)
+        await session.commit()
+    return len(rows)
+
+
+async def reload_exercise_index(session: AsyncSession) -> int:
+    result = await session.execute(select(Exercice).order_by(Exercice.id))
+    return exercise_index.load([_row_to_exercise(row) for row in result.scalars().all()])
+
+
+async def init_exercise_catalog(session: AsyncSession) -> int:
+    """Startup: make sure the bundled catalog is in the table, then build the index."""
+    await sync_exercise_catalog(session, load_bundled_catalog())
+    return await reload_exercise_index(session)
+
+
+async def refresh_exercise_catalog(session: AsyncSession) -> int:
+    """Scheduled refresh: optionally merge the remote catalog, then rebuild the index."""
+    if EXERCISE_CATALOG_REMOTE_SYNC:
+        try:
+            added = await sync_exercise_catalog(session, await fetch_remote_catalog())
+            print(f"[Exercise catalog] Imported {added} exercise(s) from the remote catalog")
+        except Exception as e:
+            await session.rollback()
+            print(f"[Exercise catalog] Remote sync failed, keeping the local catalog: {e}")
+    return await reload_exercise_index(session)
@@ -0,0 +1,90 @@
+"""
+Inverted index for forum search.
+
+Forum titles, descriptions and messages are split into normalized terms
+(lowercase, no accents, no stop words) stored in `forum_search_terms` with a
+weight per field, so a search is an indexed lookup on the query terms grouped
+by forum. The write paths in app/model.py keep the table in sync; this module
+only holds the text processing: tokenizing, weighting and snippets.
+"""
+
+import re
+import unicodedata
+from collections import Counter
+
+TERM_MAX_LENGTH = 40
+MIN_TERM_LENGTH = 2
+MAX_QUERY_TERMS = 8
+
+# A title hit outweighs a description hit, which outweighs a message hit
+TITLE_WEIGHT = 5
+DESCRIPTION_WEIGHT = 2
+MESSAGE_WEIGHT = 1
+
+SNIPPET_LENGTH = 160
+
+STOP_WORDS = {
+    # English
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "do", "for", "from", "has", "have",
+    "how", "i", "if", "in", "is", "it", "me", "my", "no", "not", "of", "on", "or", "so", "that",
+    "the", "this", "to", "was", "we", "what", "with", "you", "your",
+    # French
+    "au", "aux", "avec", "ce", "ces", "dans", "de", "des", "du", "elle", "en", "est", "et", "il",
+    "je", "la", "le", "les", "leur", "mais", "mes", "mon", "ne", "nous", "ou", "par", "pas",
+    "pour", "qu", "que", "qui", "sa", "se", "ses", "son", "sur", "ta", "te", "tu", "un", "une",
+    "vous",
+}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _fold(text: str) -> str:
+    """Lowercase without accents ("Échauffement" -> "echauffement")."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def _fold_aligned(text: str) -> str:
+    """Same folding as `_fold`, one output character per input character (for positions)."""
+    return "".join((unicodedata.normalize("NFKD", c)[:1] or c).lower()[:1] or c for c in text)
+
+
+def tokenize(text: str) -> list[str]:
+    """Search terms of `text`, in order, repeats kept."""
+    return [
+        word[:TERM_MAX_LENGTH]
+        for word in _WORD_RE.findall(_fold(text))
+        if len(word) >= MIN_TERM_LENGTH and word not in STOP_WORDS
+    ]
+
+
+def query_terms(query: str) -> list[str]:
+    """Distinct terms of a search query, first MAX_QUERY_TERMS only."""
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+def weighted_terms(*fields: tuple[str | None, int]) -> dict[str, int]:
+    """term -> weight for (text, field weight) pairs: occurrences times the field weight."""
+    weights: Counter = Counter()
+    for text, field_weight in fields:
+        for term, occurrences in Counter(tokenize(text or "")).items():
+            weights[term] += occurrences * field_weight
+    return dict(weights)
+
+
+def make_snippet(text: str, terms: list[str], length: int = SNIPPET_LENGTH) -> str:
+    """Excerpt of `text` around the first query term found, or its start."""
+    text = " ".join((text or "").split())
+    if len(text) <= length:
+        return text
+
+    folded = _fold_aligned(text)
+    positions = [m.start() for term in terms for m in [re.search(rf"\b{re.escape(term)}", folded)] if m]
+    if not positions:
+        return text[:length].rstrip() + "…"
+
+    start = max(0, min(positions) - length // 3)
+    end = min(len(text), start + length)
+    start = max(0, end - length)
+    snippet = text[start:end].strip()
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(text) else "")
@@ -3,12 +3,18 @@ from sqlalchemy.orm import relationship, selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.schemas import *
-from sqlalchemy import select, func, asc, update, and_, delete, desc, or_
+from sqlalchemy import select, func, asc, update, and_, delete, desc, or_, insert, case
 from fastapi import HTTPException, status
 from fastapi.responses import JSONResponse
 from app.middleware import create_access_token
+from app.cache import TTLCache
+from app.forum_search import (
+    DESCRIPTION_WEIGHT, MESSAGE_WEIGHT, TITLE_WEIGHT, make_snippet, query_terms, tokenize, weighted_terms,
+)
+from app.recurrence import format_weekdays, occurrences, parse_weekdays, until_for_count
+from pydantic import ValidationError
 from datetime import datetime, date, timedelta
-import secrets, json, math, os, random
+import secrets, json, math, os, random, heapq, re, unicodedata, base64, hashlib
 
 
 # ---------------------------------------------------------------------------
@@ -26,6 +32,61 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     return R * c
 
 
+def distances_from(lat, lon, points):
+    """Haversine distance (km) from (lat, lon) to every (lat, lon) of `points`, origin terms computed once."""
+    R = 6371.0
+    lat0 = math.radians(lat)
+    cos_lat0 = math.cos(lat0)
+    distances = []
+    for lat2, lon2 in points:
+        lat2_rad = math.radians(lat2)
+        a = math.sin((lat2_rad - lat0) / 2)**2 + cos_lat0 * math.cos(lat2_rad) * math.sin(math.radians(lon2 - lon) / 2)**2
+        distances.append(2 * R * math.asin(min(1.0, math.sqrt(a))))
+    return distances
+
+
+def normalize_city(city):
+    """Search key for a city name: "Saint-Étienne " -> "saint etienne"."""
+    if not city:
+        return None
+    decomposed = unicodedata.normalize("NFKD", city)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return re.sub(r"[\s\-'’]+", " ", stripped).strip().lower() or None
+
+
+def _city_prefix_clause(city: str):
+    """Prefix match on the indexed city_key (usable as an index range scan, unlike '%city%')."""
+    key = (normalize_city(city) or "").replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return Users.city_key.like(f"{key}%", escape="\\")
+
+
+# ---------------------------------------------------------------------------
+# Keyset pagination
+# ---------------------------------------------------------------------------
+
+def _encode_cursor(ts: datetime, row_id: int) -> str:
+    """Opaque (timestamp, id) position for keyset pagination."""
+    raw = f"{ts.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, row_id = raw.split("|")
+        return datetime.fromisoformat(ts), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _keyset_clause(ts_column, id_column, cursor: str, descending: bool):
+    """Rows strictly after `cursor` in (ts_column, id_column) order."""
+    ts, row_id = _decode_cursor(cursor)
+    if descending:
+        return or_(ts_column < ts, and_(ts_column == ts, id_column < row_id))
+    return or_(ts_column > ts, and_(ts_column == ts, id_column > row_id))
+
+
 # ---------------------------------------------------------------------------
 # Users
 # ---------------------------------------------------------------------------
@@ -99,6 +160,7 @@ async def register_user(session: AsyncSession, user_data: dict):
         weight=user_data.get("weight"),
         unique_code=generated_code,
         city=user_data.get("city"),
+        city_key=normalize_city(user_data.get("city")),
         latitude=user_data.get("latitude") if role_str == 'coach' else None,
         longitude=user_data.get("longitude") if role_str == 'coach' else None,
         goal=user_data.get("goal") if role_str == 'client' else None,
@@ -112,8 +174,15 @@ async def register_user(session: AsyncSession, user_data: dict):
     new_user.password = user_data["password"]
     try:
         session.add(new_user)
+        if new_user.coach_id is not None:
+            await session.flush()
+            await _bump_coach_stats(session, new_user.coach_id, active_clients=1)
+        if new_user.role == "coach":
+            await _bump_versions(session, "coaches")
         await session.commit()
         await session.refresh(new_user)
+        if new_user.role == "coach":
+            invalidate_coach_directory()
 
         # TEMPORARY SEED DATA — DELETE THESE 2 LINES WHEN DONE TESTING
         if new_user.role == "client":
@@ -172,38 +241,32 @@ async def seed_demo_workouts(session: AsyncSession, user_id: int):
         ]),
     ]
 
+    seed_workouts = []
     for day_offset in range(30, 0, -1):
         workout_date = today - timedelta(days=day_offset)
         plan_name, difficulty, exercises = demo_plans[day_offset % len(demo_plans)]
-
-        workout = Workout(
-            user_id=user_id,
+        seed_workouts.append((user_id, WorkoutCreate(
             name=plan_name,
             difficulty=difficulty,
             scheduled_date=workout_date,
-            is_completed=True,
-        )
-        session.add(workout)
-        await session.flush()
+            exercises=[WorkoutExerciseCreate(rest_time=60, **exo) for exo in exercises],
+        )))
 
-        for exo in exercises:
-            session.add(WorkoutExercise(
-                workout_id=workout.id,
-                name=exo["name"],
-                muscle=exo["muscle"],
-                num_sets=exo["num_sets"],
-                rest_time=60,
-                sets_details=exo["sets_details"],
-            ))
-
-        session.add(WorkoutRating(
-            workout_id=workout.id,
-            user_id=user_id,
-            overall_rating=random.randint(2, 5),
-            perceived_difficulty=random.choice(["too_easy", "just_right", "just_right", "hard", "too_hard"]),
-            energy_level=random.choice(["fresh", "fresh", "normal", "normal", "tired", "exhausted"]),
-            feedback_text=None,
-        ))
+    report = await _insert_workouts_batch(session, seed_workouts, is_completed=True, commit=False)
+
+    rating_rows = [
+        {
+            "workout_id": item["workout_id"],
+            "user_id": user_id,
+            "overall_rating": random.randint(2, 5),
+            "perceived_difficulty": random.choice(["too_easy", "just_right", "just_right", "hard", "too_hard"]),
+            "energy_level": random.choice(["fresh", "fresh", "normal", "normal", "tired", "exhausted"]),
+            "feedback_text": None,
+        }
+        for item in report["created"]
+    ]
+    if rating_rows:
+        await session.execute(insert(WorkoutRating), rating_rows)
 
     await session.commit()
 # ============================================================
@@ -264,6 +327,7 @@ async def update_user_description(session: AsyncSession, user_id: int, descripti
         raise HTTPException(status_code=404, detail="User not found")
 
     user.description = description
+    await _bump_versions(session, "profile", [user_id])
 
     session.add(user)
     await session.commit()
@@ -284,10 +348,20 @@ async def update_user_profile(session: AsyncSession, user_id: int, update_data:
         value = getattr(update_data, field, None)
         if value is not None:
             setattr(user, field, value)
+    if update_data.city is not None:
+        user.city_key = normalize_city(user.city)
+    await _bump_versions(session, "profile", [user_id])
+    if user.role == "coach":
+        await _bump_versions(session, "coaches")
+    if update_data.firstname is not None or update_data.lastname is not None:
+        # forum lists show author names
+        await _bump_versions(session, "forums")
 
     session.add(user)
     await session.commit()
     await session.refresh(user)
+    if user.role == "coach":
+        invalidate_coach_directory()
     return {"message": "Profile updated successfully"}
 
 
@@ -313,20 +387,6 @@ async def get_dashboard_stats(session: AsyncSession, current_user):
         result_user = await session.execute(select(Users).where(Users.id == user_id))
         user = result_user.scalars().first()
 
-        goal = 2500.0
-        goal_proteins = 150.0
-        goal_carbs = 250.0
-        goal_fats = 70.0
-
-        if user:
-            try:
-                if user.daily_caloric_needs: goal = float(user.daily_caloric_needs)
-                if user.goal_proteins: goal_proteins = float(user.goal_proteins)
-                if user.goal_carbs: goal_carbs = float(user.goal_carbs)
-                if user.goal_fats: goal_fats = float(user.goal_fats)
-            except:
-                pass
-
         today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
 
         result_meals = await session.execute(
@@ -336,35 +396,7 @@ async def get_dashboard_stats(session: AsyncSession, current_user):
         )
         today_meals = result_meals.scalars().all()
 
-        cals = 0.0
-        prots = 0.0
-        carbs = 0.0
-        fats = 0.0
-
-        for m in today_meals:
-            if m.is_consumed:
-                cals += float(m.total_calories or 0)
-                prots += float(m.total_proteins or 0)
-                carbs += float(m.total_carbohydrates or 0)
-                fats += float(m.total_lipids or 0)
-
-        remaining = max(0.0, goal - cals)
-        progress = min(1.0, cals / goal) if goal > 0 else 0.0
-
-        data = {
-            "daily_caloric_goal": goal,
-            "calories_consumed": cals,
-            "calories_remaining": remaining,
-            "proteins_consumed": prots,
-            "carbs_consumed": carbs,
-            "fats_consumed": fats,
-            "progress_percentage": progress,
-            "goal_proteins": goal_proteins,
-            "goal_carbs": goal_carbs,
-            "goal_fats": goal_fats
-        }
-
-        return JSONResponse(content=data, status_code=200)
+        return JSONResponse(content=_dashboard_values(user, today_meals), status_code=200)
 
     except Exception as e:
         import traceback
@@ -372,6 +404,51 @@ async def get_dashboard_stats(session: AsyncSession, current_user):
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
 
+def _dashboard_values(user: Users | None, today_meals) -> dict:
+    """Daily goals and consumed totals (consumed meals only) for the home dashboard."""
+    goal = 2500.0
+    goal_proteins = 150.0
+    goal_carbs = 250.0
+    goal_fats = 70.0
+
+    if user:
+        try:
+            if user.daily_caloric_needs: goal = float(user.daily_caloric_needs)
+            if user.goal_proteins: goal_proteins = float(user.goal_proteins)
+            if user.goal_carbs: goal_carbs = float(user.goal_carbs)
+            if user.goal_fats: goal_fats = float(user.goal_fats)
+        except:
+            pass
+
+    cals = 0.0
+    prots = 0.0
+    carbs = 0.0
+    fats = 0.0
+
+    for m in today_meals:
+        if m.is_consumed:
+            cals += float(m.total_calories or 0)
+            prots += float(m.total_proteins or 0)
+            carbs += float(m.total_carbohydrates or 0)
+            fats += float(m.total_lipids or 0)
+
+    remaining = max(0.0, goal - cals)
+    progress = min(1.0, cals / goal) if goal > 0 else 0.0
+
+    return {
+        "daily_caloric_goal": goal,
+        "calories_consumed": cals,
+        "calories_remaining": remaining,
+        "proteins_consumed": prots,
+        "carbs_consumed": carbs,
+        "fats_consumed": fats,
+        "progress_percentage": progress,
+        "goal_proteins": goal_proteins,
+        "goal_carbs": goal_carbs,
+        "goal_fats": goal_fats
+    }
+
+
 async def update_my_goals(session: AsyncSession, current_user, goal_data: UserGoalUpdate):
     user_id = None
     if hasattr(current_user, 'id'): user_id = current_user.id
@@ -386,6 +463,7 @@ async def update_my_goals(session: AsyncSession, current_user, goal_data: UserGo
         raise HTTPException(status_code=404, detail="User not found")
 
     user.daily_caloric_needs = goal_data.daily_caloric_needs
+    await _bump_versions(session, "profile", [user_id])
 
     await session.commit()
     return {"message": "Goal updated", "new_goal": user.daily_caloric_needs}
@@ -402,6 +480,7 @@ async def update_user_macro_goals(session: AsyncSession, user_id: int, goal_data
     if goal_data.goal_proteins is not None: user.goal_proteins = goal_data.goal_proteins
     if goal_data.goal_carbs is not None: user.goal_carbs = goal_data.goal_carbs
     if goal_data.goal_fats is not None: user.goal_fats = goal_data.goal_fats
+    await _bump_versions(session, "profile", [user_id])
 
     await session.commit()
     return {"message": "Goals updated successfully"}
@@ -428,7 +507,7 @@ async def unassign_my_coach(session: AsyncSession, user_id: int):
     if user.coach_id is None:
         raise HTTPException(status_code=400, detail="You don't have a coach assigned")
 
-    user.coach_id = None
+    await _set_client_coach(session, user, None)
 
     try:
         await session.commit()
@@ -442,14 +521,171 @@ async def unassign_my_coach(session: AsyncSession, user_id: int):
 # Meals
 # ---------------------------------------------------------------------------
 
-async def create_meal(session: AsyncSession, user_id: int, meal_data: dict):
+# meal_items column -> keys of the aliment "macros" object (the front sends "fibers")
+MEAL_ITEM_NUTRIENTS = {
+    "energy": ("energy", "calories"),
+    "proteins": ("proteins",),
+    "carbohydrates": ("carbohydrates",),
+    "sugars": ("sugars",),
+    "lipids": ("lipids",),
+    "saturated_fats": ("saturated_fats",),
+    "fiber": ("fibers", "fiber"),
+    "salt": ("salt",),
+}
+TOP_FOODS_LIMIT = 10
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _parse_aliments(aliments) -> list:
+    """Aliments as a list of dicts, whether stored as JSON text or sent as a list."""
+    if isinstance(aliments, str):
+        try:
+            aliments = json.loads(aliments)
+        except (json.JSONDecodeError, TypeError):
+            return []
+    if isinstance(aliments, dict):
+        aliments = [aliments]
+    return [a for a in aliments or [] if isinstance(a, dict)]
+
+
+def food_key(code, name) -> str:
+    """Grouping key of a food: its API code when known, else its folded name."""
+    code = str(code).strip() if code not in (None, "") else ""
+    return (code or " ".join(str(name or "").lower().split()))[:150]
+
+
+def _meal_item_rows(meal_id: int, user_id: int, aliments) -> list[dict]:
+    rows = []
+    for position, aliment in enumerate(_parse_aliments(aliments)):
+        name = str(aliment.get("name") or "").strip()[:255]
+        code = aliment.get("code")
+        macros = aliment.get("macros") or {}
+        rows.append({
+            "meal_id": meal_id,
+            "user_id": user_id,
+            "position": position,
+            "food_key": food_key(code, name),
+            "food_code": str(code)[:100] if code not in (None, "") else None,
+            "name": name,
+            "image": str(aliment["image"])[:500] if aliment.get("image") else None,
+            "grams": _to_float(aliment.get("weight")),
+            **{
+                column: next((_to_float(macros[k]) for k in keys if k in macros), 0.0)
+                for column, keys in MEAL_ITEM_NUTRIENTS.items()
+            },
+        })
+    return rows
+
+
+async def _replace_meal_items(session: AsyncSession, meal_id: int, user_id: int, aliments):
+    """Rewrite the normalized items of a meal from its aliments."""
+    await session.execute(delete(MealItem).where(MealItem.meal_id == meal_id))
+    rows = _meal_item_rows(meal_id, user_id, aliments)
+    if rows:
+        await session.execute(insert(MealItem), rows)
+
+
+def _meal_item_as_aliment(item) -> dict:
+    """Aliment in the format the apps send (weight in grams, nutrients under "macros")."""
+    return {
+        "name": item.name,
+        "image": item.image,
+        "code": item.food_code,
+        "weight": item.grams,
+        "macros": {
+            "energy": item.energy,
+            "proteins": item.proteins,
+            "carbohydrates": item.carbohydrates,
+            "sugars": item.sugars,
+            "lipids": item.lipids,
+            "saturated_fats": item.saturated_fats,
+            "fibers": item.fiber,
+            "salt": item.salt,
+        },
+    }
+
+
+async def backfill_meal_items(session: AsyncSession, batch_size: int = 500) -> int:
+    """
+    Build meal_items for meals that have aliments but no items yet. Returns the
+    number of meals that got items: meals without any aliment never get a row,
+    so they are skipped here rather than re-read and counted on every startup.
+    """
+    processed = 0
+    last_id = 0
+    while True:
+        has_items = select(MealItem.id).where(MealItem.meal_id == Meal.id).exists()
+        result = await session.execute(
+            select(Meal.id, Meal.user_id, Meal.aliments)
+            .where(Meal.id > last_id, ~has_items, Meal.aliments.is_not(None), Meal.aliments.not_in(("", "[]", "{}")))
+            .order_by(Meal.id)
+            .limit(batch_size)
+        )
+        batch = result.all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+        rows = [row for meal in batch for row in _meal_item_rows(meal.id, meal.user_id, meal.aliments)]
+        if rows:
+            await session.execute(insert(MealItem), rows)
+        await session.commit()
+        processed += len({row["meal_id"] for row in rows})
+    return processed
+
+
+async def get_top_foods(session: AsyncSession, user_id: int, days: int = 30, limit: int = TOP_FOODS_LIMIT):
+    """Most logged foods of the last `days` days, with quantities and energy."""
+    since = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)
+    result = await session.execute(
+        select(
+            MealItem.food_key,
+            func.max(MealItem.name).label("name"),
+            func.max(MealItem.food_code).label("code"),
+            func.max(MealItem.image).label("image"),
+            func.count(MealItem.id).label("times"),
+            func.sum(MealItem.grams).label("grams"),
+            func.sum(MealItem.energy).label("energy"),
+            func.sum(MealItem.proteins).label("proteins"),
+        )
+        .join(Meal, Meal.id == MealItem.meal_id)
+        .where(MealItem.user_id == user_id, Meal.user_id == user_id, Meal.hourtime >= since)
+        .group_by(MealItem.food_key)
+        .order_by(desc("times"), desc("grams"))
+        .limit(limit)
+    )
+    return {
+        "days": days,
+        "foods": [
+            {
+                "food_key": row.food_key,
+                "name": row.name,
+                "code": row.code,
+                "image": row.image,
+                "times": row.times,
+                "total_grams": round(row.grams or 0, 1),
+                "total_energy": round(row.energy or 0, 1),
+                "total_proteins": round(row.proteins or 0, 1),
+            }
+            for row in result.all()
+        ],
+    }
+
+
+def _meal_from_data(user_id: int, meal_data: dict) -> Meal:
+    """New Meal from an app payload (/addMeal, /sync)."""
     aliments_data = meal_data.get('aliments')
     if isinstance(aliments_data, (list, dict)):
         aliments_json = json.dumps(aliments_data)
     else:
         aliments_json = aliments_data
 
-    new_meal = Meal(
+    return Meal(
         user_id=user_id,
         name=meal_data['name'],
         description=meal_data.get('description'),
@@ -467,7 +703,53 @@ async def create_meal(session: AsyncSession, user_id: int, meal_data: dict):
         is_consumed=meal_data.get('is_consumed', False)
     )
 
+
+def _meal_update_values(meal_data: dict) -> dict:
+    """Column values of an /updateMeal payload (app field names mapped, aliments serialized)."""
+    values = dict(meal_data)
+    if 'hourtime' in values and isinstance(values['hourtime'], str):
+        clean_date = values['hourtime'].replace('Z', '+00:00')
+        values['hourtime'] = datetime.fromisoformat(clean_date)
+
+    values.pop('total_fats', None)
+
+    if 'total_fibers' in values:
+        values['total_fiber'] = values.pop('total_fibers')
+
+    if isinstance(values.get('aliments'), (list, dict)):
+        values['aliments'] = json.dumps(values['aliments'])
+    return values
+
+
+def _meal_to_dict(meal: Meal) -> dict:
+    return {
+        "id": meal.id,
+        "user_id": meal.user_id,
+        "client_uuid": meal.client_uuid,
+        "name": meal.name,
+        "description": meal.description,
+        "meal_type": meal.meal_type,
+        "hourtime": meal.hourtime.isoformat(),
+        "total_calories": meal.total_calories,
+        "total_proteins": meal.total_proteins,
+        "total_carbohydrates": meal.total_carbohydrates,
+        "total_sugars": meal.total_sugars,
+        "total_lipids": meal.total_lipids,
+        "total_saturated_fats": meal.total_saturated_fats,
+        "total_fiber": meal.total_fiber,
+        "total_salt": meal.total_salt,
+        "aliments": meal.aliments,
+        "is_consumed": meal.is_consumed,
+    }
+
+
+async def create_meal(session: AsyncSession, user_id: int, meal_data: dict):
+    new_meal = _meal_from_data(user_id, meal_data)
+
     session.add(new_meal)
+    await session.flush()
+    await _replace_meal_items(session, new_meal.id, user_id, meal_data.get('aliments'))
+    await _log_changes(session, "meal", [(user_id, new_meal.id)])
     await session.commit()
     await session.refresh(new_meal)
     return new_meal
@@ -482,6 +764,8 @@ async def delete_meal(session: AsyncSession, meal_id):
     if not meal:
         raise HTTPException(status_code=404, detail="Meal not found.")
 
+    await session.execute(delete(MealItem).where(MealItem.meal_id == meal_id))
+    await _log_changes(session, "meal", [(meal.user_id, meal.id)], op="delete")
     await session.delete(meal)
     await session.commit()
 
@@ -489,23 +773,21 @@ async def delete_meal(session: AsyncSession, meal_id):
 
 
 async def update_meal(session, meal_id, meal_data):
-    if 'hourtime' in meal_data and isinstance(meal_data['hourtime'], str):
-        clean_date = meal_data['hourtime'].replace('Z', '+00:00')
-        meal_data['hourtime'] = datetime.fromisoformat(clean_date)
-
-    meal_data.pop('total_fats', None)
-
-    if 'total_fibers' in meal_data:
-        meal_data['total_fiber'] = meal_data.pop('total_fibers')
+    values = _meal_update_values(meal_data)
 
     stmt = (
         update(Meal)
         .where(Meal.id == meal_id)
-        .values(**meal_data)
+        .values(**values)
         .execution_options(synchronize_session="fetch")
     )
 
     await session.execute(stmt)
+    owner_id = (await session.execute(select(Meal.user_id).where(Meal.id == meal_id))).scalar()
+    if owner_id is not None:
+        if 'aliments' in values:
+            await _replace_meal_items(session, meal_id, owner_id, meal_data.get('aliments'))
+        await _log_changes(session, "meal", [(owner_id, meal_id)])
     await session.commit()
 
     return {"message": "Meal updated successfully"}
@@ -525,24 +807,7 @@ async def get_meals_by_user(session: AsyncSession, user_id: int):
 
     meals = result.scalars().all()
 
-    meal_list = []
-    for meal in meals:
-        meal_list.append({
-            "id": meal.id,
-            "user_id": meal.user_id,
-            "name": meal.name,
-            "hourtime": meal.hourtime.isoformat(),
-            "total_calories": meal.total_calories,
-            "total_proteins": meal.total_proteins,
-            "total_carbohydrates": meal.total_carbohydrates,
-            "total_sugars": meal.total_sugars,
-            "total_lipids": meal.total_lipids,
-            "total_saturated_fats": meal.total_saturated_fats,
-            "total_fiber": meal.total_fiber,
-            "total_salt": meal.total_salt,
-            "aliments": meal.aliments,
-            "is_consumed": meal.is_consumed,
-        })
+    meal_list = [_meal_to_dict(meal) for meal in meals]
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -558,6 +823,7 @@ async def toggle_meal_consume(session: AsyncSession, meal_id: int, user_id: int)
         raise HTTPException(status_code=404, detail="Meal not found")
 
     meal.is_consumed = not meal.is_consumed
+    await _log_changes(session, "meal", [(user_id, meal_id)])
 
     await session.commit()
     await session.refresh(meal)
@@ -568,55 +834,214 @@ async def toggle_meal_consume(session: AsyncSession, meal_id: int, user_id: int)
 # Workouts
 # ---------------------------------------------------------------------------
 
-async def create_full_workout(session: AsyncSession, user_id: int, workout_data: WorkoutCreate, is_ai_generated: bool = False):
+async def _add_workout(session: AsyncSession, user_id: int, workout_data: WorkoutCreate,
+                       is_ai_generated: bool = False, coach_id: int = None, client_uuid: str = None) -> Workout:
+    """Add a workout and its exercises to the session (flushed, not committed)."""
+    new_workout = Workout(
+        user_id=user_id,
+        name=workout_data.name,
+        description=workout_data.description,
+        difficulty=workout_data.difficulty,
+        scheduled_date=workout_data.scheduled_date,
+        is_ai_generated=is_ai_generated,
+        coach_id=coach_id,
+        client_uuid=client_uuid,
+    )
+    session.add(new_workout)
+
+    await session.flush()
+
+    per_exercise = []
+    for exo in workout_data.exercises:
+        sets_data = [s.model_dump() for s in exo.sets_details] if exo.sets_details else []
+        metrics = exercise_metrics(exo.muscle, exo.num_sets, exo.rest_time, sets_data)
+        per_exercise.append(metrics)
+
+        new_exercise = WorkoutExercise(
+            workout_id=new_workout.id,
+            name=exo.name,
+            muscle=exo.muscle,
+            num_sets=exo.num_sets,
+            rest_time=exo.rest_time,
+            sets_details=sets_data,
+            **metrics,
+        )
+        session.add(new_exercise)
+    _set_fields(new_workout, workout_metrics(per_exercise))
+    await _log_changes(session, "workout", [(user_id, new_workout.id)])
+    return new_workout
+
+
+async def create_full_workout(session: AsyncSession, user_id: int, workout_data: WorkoutCreate, is_ai_generated: bool = False, coach_id: int = None):
     try:
-        new_workout = Workout(
+        new_workout = await _add_workout(session, user_id, workout_data, is_ai_generated=is_ai_generated, coach_id=coach_id)
+
+        if coach_id is not None:
+            await _bump_coach_stats(session, coach_id, workouts_created=1)
+
+        await session.commit()
+
+        return JSONResponse(
+            status_code=status.HTTP_201_CREATED,
+            content={"message": "Workout scheduled successfully", "workout_id": new_workout.id}
+        )
+
+    except Exception as e:
+        await session.rollback()
+        print(f"Error creating workout: {e}")
+        raise HTTPException(status_code=500, detail="Could not save workout.")
+
+
+def _to_workout_create(data) -> WorkoutCreate:
+    """Accept a WorkoutCreate, a GeneratedWorkout or a raw (AI) workout dict."""
+    if isinstance(data, WorkoutCreate):
+        return data
+    if isinstance(data, dict):
+        data = GeneratedWorkout.model_validate(data)
+    return WorkoutCreate.model_validate(data.model_dump())
+
+
+async def _insert_workouts_batch(session: AsyncSession, items: list, is_ai_generated: bool = False,
+                                 is_completed: bool = False, commit: bool = True, coach_id: int = None) -> dict:
+    """
+    Insert (user_id, workout) pairs and all their exercises in one transaction:
+    one batched INSERT for the workouts, one executemany for the exercises.
+
+    Items that fail validation are skipped and reported; if the batch itself fails
+    nothing is written and every item is reported as failed.
+    """
+    failed = []
+    valid = []
+    for index, (user_id, data) in enumerate(items):
+        try:
+            valid.append((index, user_id, _to_workout_create(data)))
+        except Exception as e:
+            name = data.get("name") if isinstance(data, dict) else getattr(data, "name", None)
+            failed.append({"index": index, "name": name, "error": str(e)})
+
+    if not valid:
+        return {"created": [], "failed": failed}
+
+    exercise_rows_per_workout = []
+    for _, _, workout_data in valid:
+        rows = []
+        for exo in workout_data.exercises:
+            sets_data = [s.model_dump() for s in exo.sets_details] if exo.sets_details else []
+            rows.append({
+                "name": exo.name,
+                "muscle": exo.muscle,
+                "num_sets": exo.num_sets,
+                "rest_time": exo.rest_time,
+                "sets_details": sets_data,
+                **exercise_metrics(exo.muscle, exo.num_sets, exo.rest_time, sets_data),
+            })
+        exercise_rows_per_workout.append(rows)
+
+    workouts = [
+        Workout(
             user_id=user_id,
             name=workout_data.name,
             description=workout_data.description,
             difficulty=workout_data.difficulty,
             scheduled_date=workout_data.scheduled_date,
             is_ai_generated=is_ai_generated,
+            is_completed=is_completed,
+            coach_id=coach_id,
+            **workout_metrics(rows),
         )
-        session.add(new_workout)
+        for (_, user_id, workout_data), rows in zip(valid, exercise_rows_per_workout)
+    ]
 
+    try:
+        session.add_all(workouts)
         await session.flush()
 
-        for exo in workout_data.exercises:
-            sets_data = [s.model_dump() for s in exo.sets_details] if exo.sets_details else []
+        exercise_rows = [
+            {"workout_id": workout.id, **row}
+            for workout, rows in zip(workouts, exercise_rows_per_workout)
+            for row in rows
+        ]
+        if exercise_rows:
+            await session.execute(insert(WorkoutExercise), exercise_rows)
 
-            new_exercise = WorkoutExercise(
-                workout_id=new_workout.id,
-                name=exo.name,
-                muscle=exo.muscle,
-                num_sets=exo.num_sets,
-                rest_time=exo.rest_time,
-                sets_details=sets_data
-            )
-            session.add(new_exercise)
+        if is_completed:
+            progress_rows = [
+                progress
+                for workout, rows in zip(workouts, exercise_rows_per_workout)
+                for progress in _progress_rows(workout.user_id, workout.id, workout.scheduled_date,
+                                               [(row["name"], row["sets_details"]) for row in rows])
+            ]
+            await _insert_progress(session, progress_rows)
+            await _merge_personal_records(session, progress_rows)
 
-        await session.commit()
+        if coach_id is not None:
+            await _bump_coach_stats(session, coach_id, workouts_created=len(workouts))
 
-        return JSONResponse(
-            status_code=status.HTTP_201_CREATED,
-            content={"message": "Workout scheduled successfully", "workout_id": new_workout.id}
-        )
+        await _log_changes(session, "workout", [(workout.user_id, workout.id) for workout in workouts])
+
+        if commit:
+            await session.commit()
 
     except Exception as e:
         await session.rollback()
-        print(f"Error creating workout: {e}")
-        raise HTTPException(status_code=500, detail="Could not save workout.")
+        print(f"Error creating workouts in bulk: {e}")
+        failed.extend({"index": index, "name": workout_data.name, "error": "Could not save workout."}
+                      for index, _, workout_data in valid)
+        return {"created": [], "failed": sorted(failed, key=lambda f: f["index"])}
+
+    created = [
+        {"index": index, "user_id": user_id, "workout_id": workout.id, "name": workout.name}
+        for workout, (index, user_id, _) in zip(workouts, valid)
+    ]
+    return {"created": created, "failed": failed}
 
 
-async def get_user_workouts(session: AsyncSession, user_id: int):
+async def create_workouts_bulk(session: AsyncSession, user_id: int, workouts_data: list, is_ai_generated: bool = False):
+    """Create many workouts for one user in a single transaction, reporting per-item failures."""
+    return await _insert_workouts_batch(session, [(user_id, w) for w in workouts_data], is_ai_generated=is_ai_generated)
+
+
+WORKOUT_CALENDAR_PAGE_SIZE = 100
+
+
+def _scheduled_window(date_from: date | None, date_to: date | None) -> list:
+    """Range predicates on scheduled_date for the days [date_from, date_to], both optional."""
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="'from' must be on or before 'to'")
+    clauses = []
+    if date_from:
+        clauses.append(Workout.scheduled_date >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        clauses.append(Workout.scheduled_date < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+    return clauses
+
+
+async def get_user_workouts(session: AsyncSession, user_id: int, date_from: date = None, date_to: date = None,
+                            include_scheduled: bool = False):
+    """
+    The user's workouts, oldest first. With include_scheduled, schedule
+    occurrences not started yet are mixed in; they have no id (id is None), so
+    only clients that handle them opt in.
+    """
+    window = _scheduled_window(date_from, date_to)
     try:
         stmt = select(Workout)\
-            .where(Workout.user_id == user_id)\
+            .where(Workout.user_id == user_id, *window)\
             .options(selectinload(Workout.exercises), selectinload(Workout.rating))\
             .order_by(Workout.scheduled_date.asc())
 
         result = await session.execute(stmt)
-        workouts = result.scalars().all()
+        workouts = list(result.scalars().all())
+
+        if not include_scheduled:
+            return workouts
+
+        # Schedule occurrences not started yet, in the window (default: the next few weeks)
+        window_start = date_from or (date_to - timedelta(days=SCHEDULE_DEFAULT_HORIZON_DAYS) if date_to else date.today())
+        window_end = date_to or window_start + timedelta(days=SCHEDULE_DEFAULT_HORIZON_DAYS)
+        virtual = await _virtual_workouts(session, [user_id], window_start, window_end)
+        if virtual:
+            workouts = sorted(workouts + virtual, key=lambda w: _naive(w.scheduled_date))
         return workouts
 
     except Exception as e:
@@ -624,33 +1049,245 @@ async def get_user_workouts(session: AsyncSession, user_id: int):
         raise HTTPException(status_code=500, detail="Could not fetch workouts.")
 
 
-async def update_full_workout(session: AsyncSession, workout_id: int, workout_data: dict):
-    result = await session.execute(select(Workout).where(Workout.id == workout_id))
-    workout = result.scalars().first()
+async def get_workout_calendar(session: AsyncSession, user_id: int, date_from: date = None, date_to: date = None,
+                               cursor: str = None, limit: int = WORKOUT_CALENDAR_PAGE_SIZE):
+    """
+    Lightweight listing for calendars: id, name, date, completion and exercise
+    count, keyset-paginated on (scheduled_date, id). Exercises and ratings are
+    fetched per workout with get_workout_detail.
+    """
+    query = (
+        select(Workout.id, Workout.name, Workout.scheduled_date, Workout.is_completed,
+               Workout.is_ai_generated, Workout.exercise_count)
+        .where(Workout.user_id == user_id, *_scheduled_window(date_from, date_to))
+        .order_by(Workout.scheduled_date.asc(), Workout.id.asc())
+    )
+    if cursor:
+        query = query.where(_keyset_clause(Workout.scheduled_date, Workout.id, cursor, descending=False))
 
+    rows = (await session.execute(query.limit(limit + 1))).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return {
+        "workouts": [
+            {
+                "id": row.id,
+                "name": row.name,
+                "scheduled_date": row.scheduled_date.isoformat() if row.scheduled_date else None,
+                "is_completed": bool(row.is_completed),
+                "is_ai_generated": bool(row.is_ai_generated),
+                "exercise_count": row.exercise_count or 0,
+            }
+            for row in rows
+        ],
+        "next_cursor": _encode_cursor(rows[-1].scheduled_date, rows[-1].id) if has_more else None,
+    }
+
+
+async def get_workout_detail(session: AsyncSession, workout_id: int, user_id: int):
+    result = await session.execute(
+        select(Workout)
+        .where(Workout.id == workout_id, Workout.user_id == user_id)
+        .options(selectinload(Workout.exercises), selectinload(Workout.rating))
+    )
+    workout = result.scalars().first()
     if not workout:
         raise HTTPException(status_code=404, detail="Workout not found")
+    return workout
 
-    workout.name = workout_data.get('name', workout.name)
-    workout.difficulty = workout_data.get('difficulty', workout.difficulty)
 
-    await session.execute(
-        WorkoutExercise.__table__.delete().where(WorkoutExercise.workout_id == workout_id)
+EXERCISE_FIELDS = ("name", "muscle", "num_sets", "rest_time", "sets_details")
+
+
+def _exercise_changes(exercise: WorkoutExercise, exo: dict) -> dict:
+    """Fields of `exo` that differ from the stored exercise."""
+    return {
+        field: exo[field]
+        for field in EXERCISE_FIELDS
+        if field in exo and exo[field] is not None and getattr(exercise, field) != exo[field]
+    }
+
+
+def _new_exercise(workout_id: int, exo: dict) -> WorkoutExercise:
+    missing = [field for field in ("name", "muscle", "num_sets") if exo.get(field) is None]
+    if missing:
+        raise HTTPException(status_code=422, detail=f"New exercise is missing: {', '.join(missing)}")
+    exercise = WorkoutExercise(
+        workout_id=workout_id,
+        name=exo['name'],
+        muscle=exo['muscle'],
+        num_sets=exo['num_sets'],
+        rest_time=exo.get('rest_time') or 60,
+        sets_details=exo.get('sets_details') or [],
     )
+    _set_fields(exercise, exercise_metrics(exercise.muscle, exercise.num_sets, exercise.rest_time, exercise.sets_details))
+    return exercise
 
-    for exo in workout_data.get('exercises', []):
-        new_exercise = WorkoutExercise(
-            workout_id=workout.id,
-            name=exo['name'],
-            muscle=exo['muscle'],
-            num_sets=exo['num_sets'],
-            rest_time=exo.get('rest_time', 60),
-            sets_details=exo['sets_details']
+
+def workout_patch_payload(patch: WorkoutPatch) -> dict:
+    """PATCH body as a dict of the fields actually sent; set details are kept whole."""
+    data = patch.model_dump(exclude_unset=True)
+    for exo, model in zip(data.get('exercises') or [], patch.exercises or []):
+        if model.sets_details is not None:
+            exo['sets_details'] = [s.model_dump() for s in model.sets_details]
+    return data
+
+
+async def require_client_coach(session: AsyncSession, client_id: int, coach_id: int):
+    """404 if the client does not exist, 403 unless coach_id coaches them."""
+    row = (await session.execute(select(Users.coach_id).where(Users.id == client_id))).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Client not found")
+    if row.coach_id != coach_id:
+        raise HTTPException(status_code=403, detail="Not authorized to edit this client's workouts")
+
+
+async def require_workout_coach(session: AsyncSession, workout_id: int, coach_id: int):
+    """404 if the workout does not exist, 403 unless its owner is coached by coach_id."""
+    row = (await session.execute(
+        select(Users.coach_id).join(Workout, Workout.user_id == Users.id).where(Workout.id == workout_id)
+    )).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Workout not found")
+    if row.coach_id != coach_id:
+        raise HTTPException(status_code=403, detail="Not authorized to edit this client's workouts")
+
+
+async def update_full_workout(session: AsyncSession, workout_id: int, workout_data: dict, partial: bool = False,
+                              commit: bool = True):
+    """
+    Apply an edit as a diff against the stored exercises: changed exercises are
+    updated in place (only their changed columns), new ones inserted, dropped
+    ones deleted; untouched rows are not written.
+
+    Exercises are matched by `id`. In a full update (PUT) `exercises` is the
+    complete list and entries without an id are matched by position with the
+    stored exercises no other entry claimed; stored exercises left unmatched
+    are deleted. In a partial update (PATCH) only the listed exercises are
+    touched, entries without an id are added and `removed_exercise_ids` are
+    deleted. Without `exercises` the exercises are left as they are.
+    """
+    result = await session.execute(
+        select(Workout).where(Workout.id == workout_id).options(selectinload(Workout.exercises))
+    )
+    workout = result.scalars().first()
+
+    if not workout:
+        raise HTTPException(status_code=404, detail="Workout not found")
+
+    for field in ("name", "difficulty") + (("description",) if partial else ()):
+        if workout_data.get(field) is not None:
+            setattr(workout, field, workout_data[field])
+
+    stored = sorted(workout.exercises, key=lambda e: e.id)
+    by_id = {exercise.id: exercise for exercise in stored}
+    payload = workout_data.get('exercises')
+    removed_ids = set(workout_data.get('removed_exercise_ids') or [])
+
+    unknown = [exo['id'] for exo in payload or [] if exo.get('id') is not None and exo['id'] not in by_id]
+    unknown += [exercise_id for exercise_id in removed_ids if exercise_id not in by_id]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Exercise(s) {sorted(set(unknown))} not found in this workout")
+    if any(exo.get('id') in removed_ids for exo in payload or []):
+        raise HTTPException(status_code=400, detail="An exercise cannot be both updated and removed")
+
+    kept: dict[int, WorkoutExercise] = {e.id: e for e in stored if e.id not in removed_ids}
+    final: list[WorkoutExercise] = []
+    inserted, updated = [], 0
+
+    if payload is not None:
+        claimed = {exo['id'] for exo in payload if exo.get('id') is not None}
+        unclaimed = [e for e in kept.values() if e.id not in claimed] if not partial else []
+        matched = set()
+
+        for exo in payload:
+            if exo.get('id') is not None:
+                exercise = kept.get(exo['id'])
+            else:
+                exercise = unclaimed.pop(0) if unclaimed else None
+
+            if exercise is None:
+                exercise = _new_exercise(workout.id, exo)
+                session.add(exercise)
+                inserted.append(exercise)
+            else:
+                matched.add(exercise.id)
+                changes = _exercise_changes(exercise, exo)
+                if changes:
+                    _set_fields(exercise, changes)
+                    _set_fields(exercise, exercise_metrics(exercise.muscle, exercise.num_sets,
+                                                           exercise.rest_time, exercise.sets_details))
+                    updated += 1
+            final.append(exercise)
+
+        if partial:
+            final = [e for e in kept.values() if e.id not in matched] + final
+        else:
+            removed_ids |= {e.id for e in unclaimed}
+            final = [e for e in final if e.id not in removed_ids]
+    else:
+        final = list(kept.values())
+
+    for exercise_id in removed_ids:
+        await session.delete(by_id[exercise_id])
+
+    if inserted or updated or removed_ids:
+        _set_fields(workout, workout_metrics([
+            {field: getattr(e, field) or 0 for field in WORKOUT_METRIC_FIELDS} for e in final
+        ]))
+
+        if workout.is_completed:
+            # Replace this workout's series rows, then recompute every record it fed or now feeds
+            affected = (await _drop_workout_progress(session, [workout.id])).get(workout.user_id, set())
+            rows = _progress_rows(workout.user_id, workout.id, workout.scheduled_date,
+                                  [(e.name, e.sets_details) for e in final])
+            await _insert_progress(session, rows)
+            await _rebuild_personal_records(
+                session, workout.user_id, affected | {row["exercise_key"] for row in rows},
+                names={row["exercise_key"]: row["exercise_name"] for row in rows},
+            )
+
+    await _log_changes(session, "workout", [(workout.user_id, workout.id)])
+    if commit:
+        await session.commit()
+    return {
+        "message": "Workout updated successfully",
+        "exercises": {"inserted": len(inserted), "updated": updated, "deleted": len(removed_ids)},
+    }
+
+
+async def _coach_workout_totals(session: AsyncSession, workout_ids, with_workouts: bool = True) -> dict[int, dict]:
+    """
+    coach_id -> what the given coach-authored workouts count for in the coach's
+    stats (workouts_created, rating_sum, rating_count), read before deleting them.
+    """
+    totals: dict[int, dict] = {}
+    if not workout_ids:
+        return totals
+    if with_workouts:
+        rows = await session.execute(
+            select(Workout.coach_id, func.count(Workout.id))
+            .where(Workout.id.in_(workout_ids), Workout.coach_id.is_not(None))
+            .group_by(Workout.coach_id)
         )
-        session.add(new_exercise)
+        for coach_id, workouts in rows.all():
+            totals.setdefault(coach_id, {})["workouts_created"] = workouts
+    rows = await session.execute(
+        select(Workout.coach_id, func.coalesce(func.sum(WorkoutRating.overall_rating), 0), func.count(WorkoutRating.id))
+        .join(Workout, WorkoutRating.workout_id == Workout.id)
+        .where(WorkoutRating.workout_id.in_(workout_ids), Workout.coach_id.is_not(None))
+        .group_by(Workout.coach_id)
+    )
+    for coach_id, rating_sum, rating_count in rows.all():
+        totals.setdefault(coach_id, {}).update(rating_sum=int(rating_sum), rating_count=rating_count)
+    return totals
 
-    await session.commit()
-    return {"message": "Workout updated successfully"}
+
+async def _subtract_coach_stats(session: AsyncSession, totals: dict[int, dict]):
+    """Take deleted workouts / ratings / posts out of the coaches' stats; call once the deletion is flushed."""
+    for coach_id, counts in totals.items():
+        await _bump_coach_stats(session, coach_id, **{field: -count for field, count in counts.items()})
 
 
 async def delete_full_workout(session: AsyncSession, workout_id: int):
@@ -660,17 +1297,24 @@ async def delete_full_workout(session: AsyncSession, workout_id: int):
     if not workout:
         raise HTTPException(status_code=404, detail="Workout not found")
 
+    await _forget_workout_progress(session, [workout_id])
+    await _forget_schedule_occurrence(session, workout)
+    await _log_changes(session, "workout", [(workout.user_id, workout_id)], op="delete")
     await session.execute(
         WorkoutExercise.__table__.delete().where(WorkoutExercise.workout_id == workout_id)
     )
 
+    coach_totals = await _coach_workout_totals(session, [workout_id])
     await session.delete(workout)
+    if coach_totals:
+        await session.flush()
+        await _subtract_coach_stats(session, coach_totals)
     await session.commit()
 
     return {"message": "Workout deleted successfully"}
 
 
-async def delete_workout_for_user(session: AsyncSession, workout_id: int, user_id: int):
+async def delete_workout_for_user(session: AsyncSession, workout_id: int, user_id: int, commit: bool = True):
     result = await session.execute(
         select(Workout).where(Workout.id == workout_id, Workout.user_id == user_id)
     )
@@ -679,13 +1323,22 @@ async def delete_workout_for_user(session: AsyncSession, workout_id: int, user_i
     if not workout:
         raise HTTPException(status_code=404, detail="Workout not found")
 
+    await _forget_workout_progress(session, [workout_id])
+    await _forget_schedule_occurrence(session, workout)
+    await _log_changes(session, "workout", [(user_id, workout_id)], op="delete")
+    coach_totals = await _coach_workout_totals(session, [workout_id])
     await session.delete(workout)
-    await session.commit()
+    if coach_totals:
+        await session.flush()
+        await _subtract_coach_stats(session, coach_totals)
+    if commit:
+        await session.commit()
 
     return {"message": "Workout deleted"}
 
 
-async def toggle_workout_complete(session: AsyncSession, workout_id: int, user_id: int, rating_data: dict = None):
+async def toggle_workout_complete(session: AsyncSession, workout_id: int, user_id: int, rating_data: dict = None,
+                                  commit: bool = True):
     result = await session.execute(
         select(Workout).where(Workout.id == workout_id, Workout.user_id == user_id)
     )
@@ -697,6 +1350,7 @@ async def toggle_workout_complete(session: AsyncSession, workout_id: int, user_i
     if not (workout.is_completed or False):
         # Completing the workout — create rating if provided
         workout.is_completed = True
+        await _record_workout_progress(session, [workout])
         if rating_data:
             rating = WorkoutRating(
                 workout_id=workout_id,
@@ -707,15 +1361,24 @@ async def toggle_workout_complete(session: AsyncSession, workout_id: int, user_i
                 feedback_text=rating_data.get("feedback_text"),
             )
             session.add(rating)
+            if workout.coach_id is not None:
+                await session.flush()
+                await _bump_coach_stats(session, workout.coach_id,
+                                        rating_sum=rating.overall_rating or 0, rating_count=1)
     else:
         # Uncompleting the workout — delete associated rating
         workout.is_completed = False
+        await _forget_workout_progress(session, [workout_id])
+        ratings = await _coach_workout_totals(session, [workout_id], with_workouts=False)
         await session.execute(
             delete(WorkoutRating).where(WorkoutRating.workout_id == workout_id)
         )
+        await _subtract_coach_stats(session, ratings)
+    await _log_changes(session, "workout", [(user_id, workout_id)])
 
-    await session.commit()
-    await session.refresh(workout)
+    if commit:
+        await session.commit()
+        await session.refresh(workout)
 
     return workout
 
@@ -734,6 +1397,8 @@ async def update_workout_rating(session: AsyncSession, workout_id: int, user_id:
         select(WorkoutRating).where(WorkoutRating.workout_id == workout_id)
     )
     rating = result.scalars().first()
+    previous = rating.overall_rating if rating else None
+    is_new = rating is None
 
     if rating:
         rating.overall_rating = rating_data["overall_rating"]
@@ -751,6 +1416,16 @@ async def update_workout_rating(session: AsyncSession, workout_id: int, user_id:
         )
         session.add(rating)
 
+    if workout.coach_id is not None:
+        # flushed first: a missing stats row is computed with the new rating included
+        await session.flush()
+        await _bump_coach_stats(
+            session, workout.coach_id,
+            rating_sum=rating_data["overall_rating"] - (previous or 0),
+            rating_count=1 if is_new else 0,
+        )
+    await _log_changes(session, "workout", [(user_id, workout_id)])
+
     await session.commit()
     await session.refresh(rating)
     return rating
@@ -760,8 +1435,8 @@ async def auto_complete_daily_workouts(session: AsyncSession):
     today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
     today_end = today_start + timedelta(days=1)
 
-    stmt = (
-        update(Workout)
+    result = await session.execute(
+        select(Workout)
         .where(
             and_(
                 Workout.scheduled_date >= today_start,
@@ -769,57 +1444,318 @@ async def auto_complete_daily_workouts(session: AsyncSession):
                 Workout.is_completed == False
             )
         )
+    )
+    workouts = result.scalars().all()
+    if not workouts:
+        return 0
+
+    await session.execute(
+        update(Workout)
+        .where(Workout.id.in_([w.id for w in workouts]))
         .values(is_completed=True)
     )
-    result = await session.execute(stmt)
+    await _record_workout_progress(session, workouts)
+    await _log_changes(session, "workout", [(w.user_id, w.id) for w in workouts])
     await session.commit()
-    return result.rowcount
+    return len(workouts)
 
 
 # ---------------------------------------------------------------------------
-# Calories burned estimation
+# Workout schedules (recurring workouts, expanded on read)
 # ---------------------------------------------------------------------------
 
-# MET values by muscle group (moderate intensity strength training)
-MUSCLE_MET = {
-    "chest": 6.0,
-    "back": 6.0,
-    "legs": 6.5,
-    "shoulders": 5.0,
-    "arms": 4.5,
-    "abs": 4.0,
-    "cardio": 8.0,
-    "full body": 6.0,
-}
-DEFAULT_MET = 5.0
+# Range of virtual occurrences listed when no date window is given
+SCHEDULE_DEFAULT_HORIZON_DAYS = 28
 
 
-def _estimate_exercise_calories(exercise, user_weight_kg: float) -> float:
-    """
-    Estimate calories burned for a single exercise.
+def _schedule_dates(schedule: WorkoutSchedule, window_start: date, window_end: date) -> list[date]:
+    return occurrences(
+        schedule.freq, schedule.interval, schedule.starts_at.date(), parse_weekdays(schedule.weekdays),
+        schedule.until, window_start, window_end,
+        excluded={date.fromisoformat(day) for day in schedule.excluded_dates or []},
+    )
 
-    For strength exercises (reps > 0):
-      active_time = sets × reps × 4s per rep
-      total_time  = active_time + rest between sets
-      calories    = (total_minutes / 60) × MET × weight_kg
 
-    For duration exercises (duration > 0):
-      total_time  = sets × duration
-      calories    = (total_minutes / 60) × MET × weight_kg
-    """
-    met = MUSCLE_MET.get((exercise.muscle or "").lower(), DEFAULT_MET)
-    sets_details = exercise.sets_details or []
-    num_sets = exercise.num_sets or len(sets_details) or 1
-    rest_time = exercise.rest_time or 60
+def _virtual_workout(schedule: WorkoutSchedule, day: date) -> Workout:
+    """Unsaved Workout standing for an occurrence; never added to the session."""
+    return Workout(
+        user_id=schedule.user_id,
+        name=schedule.name,
+        description=schedule.description,
+        difficulty=schedule.difficulty,
+        scheduled_date=datetime.combine(day, schedule.starts_at.time()),
+        is_completed=False,
+        is_ai_generated=False,
+        coach_id=schedule.coach_id,
+        schedule_id=schedule.id,
+        occurrence_date=day,
+        exercises=[
+            WorkoutExercise(name=exo["name"], muscle=exo["muscle"], num_sets=exo["num_sets"],
+                            rest_time=exo.get("rest_time"), sets_details=exo.get("sets_details") or [])
+            for exo in schedule.exercises or []
+        ],
+    )
 
-    total_seconds = 0
 
-    if sets_details:
+async def _virtual_workouts(session: AsyncSession, user_ids: list[int], window_start: date, window_end: date) -> list[Workout]:
+    """Occurrences of the users' schedules in [window_start, window_end] that have no Workout row yet."""
+    if not user_ids:
+        return []
+    result = await session.execute(
+        select(WorkoutSchedule).where(
+            WorkoutSchedule.user_id.in_(user_ids),
+            WorkoutSchedule.starts_at < datetime.combine(window_end + timedelta(days=1), datetime.min.time()),
+            or_(WorkoutSchedule.until.is_(None), WorkoutSchedule.until >= window_start),
+        )
+    )
+    schedules = result.scalars().all()
+    if not schedules:
+        return []
+
+    materialized = set((await session.execute(
+        select(Workout.schedule_id, Workout.occurrence_date).where(
+            Workout.schedule_id.in_([schedule.id for schedule in schedules]),
+            Workout.occurrence_date >= window_start,
+            Workout.occurrence_date <= window_end,
+        )
+    )).all())
+
+    return [
+        _virtual_workout(schedule, day)
+        for schedule in schedules
+        for day in _schedule_dates(schedule, window_start, window_end)
+        if (schedule.id, day) not in materialized
+    ]
+
+
+def _schedule_to_dict(schedule: WorkoutSchedule) -> dict:
+    return {
+        "id": schedule.id,
+        "user_id": schedule.user_id,
+        "name": schedule.name,
+        "description": schedule.description,
+        "difficulty": schedule.difficulty,
+        "exercises": schedule.exercises,
+        "freq": schedule.freq,
+        "interval": schedule.interval,
+        "weekdays": parse_weekdays(schedule.weekdays),
+        "starts_at": schedule.starts_at,
+        "until": schedule.until,
+        "excluded_dates": sorted(schedule.excluded_dates or []),
+    }
+
+
+async def create_workout_schedule(session: AsyncSession, user_id: int, data: WorkoutScheduleCreate, coach_id: int = None):
+    weekdays = data.weekdays if data.freq == "weekly" else None
+    if weekdays and any(day < 0 or day > 6 for day in weekdays):
+        raise HTTPException(status_code=400, detail="Weekdays go from 0 (Monday) to 6 (Sunday)")
+
+    starts_at = data.starts_at.replace(tzinfo=None)
+    until = data.until
+    if data.count:
+        last = until_for_count(data.freq, data.interval, starts_at.date(), weekdays or [], data.count)
+        until = min(until, last) if until else last
+    if until and until < starts_at.date():
+        raise HTTPException(status_code=400, detail="'until' must be on or after the start date")
+
+    schedule = WorkoutSchedule(
+        user_id=user_id,
+        coach_id=coach_id,
+        name=data.name,
+        description=data.description,
+        difficulty=data.difficulty,
+        exercises=[exo.model_dump() for exo in data.exercises],
+        freq=data.freq,
+        interval=data.interval,
+        weekdays=format_weekdays(weekdays),
+        starts_at=starts_at,
+        until=until,
+        excluded_dates=[],
+    )
+    session.add(schedule)
+    await _bump_versions(session, "workouts", [user_id])
+    await session.commit()
+    await session.refresh(schedule)
+    return _schedule_to_dict(schedule)
+
+
+async def get_workout_schedules(session: AsyncSession, user_id: int):
+    result = await session.execute(
+        select(WorkoutSchedule).where(WorkoutSchedule.user_id == user_id).order_by(WorkoutSchedule.id)
+    )
+    return [_schedule_to_dict(schedule) for schedule in result.scalars().all()]
+
+
+async def _get_user_schedule(session: AsyncSession, schedule_id: int, user_id: int) -> WorkoutSchedule:
+    result = await session.execute(
+        select(WorkoutSchedule).where(WorkoutSchedule.id == schedule_id, WorkoutSchedule.user_id == user_id)
+    )
+    schedule = result.scalars().first()
+    if not schedule:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    return schedule
+
+
+async def delete_workout_schedule(session: AsyncSession, schedule_id: int, user_id: int):
+    """Stop a schedule. Workouts already started from it are kept as plain workouts."""
+    schedule = await _get_user_schedule(session, schedule_id, user_id)
+    await session.execute(
+        update(Workout).where(Workout.schedule_id == schedule_id).values(schedule_id=None, occurrence_date=None)
+    )
+    await session.delete(schedule)
+    await _bump_versions(session, "workouts", [user_id])
+    await session.commit()
+    return {"message": "Schedule deleted"}
+
+
+async def start_schedule_occurrence(session: AsyncSession, user_id: int, schedule_id: int, day: date,
+                                    complete: bool = False):
+    """
+    Materialize an occurrence into a Workout row (idempotent), optionally
+    marking it completed. Returns the workout with its exercises.
+    """
+    schedule = await _get_user_schedule(session, schedule_id, user_id)
+
+    existing = select(Workout.id).where(Workout.schedule_id == schedule_id, Workout.occurrence_date == day)
+    workout_id = (await session.execute(existing)).scalar()
+
+    if workout_id is None:
+        if day not in _schedule_dates(schedule, day, day):
+            raise HTTPException(status_code=404, detail=f"The schedule has no occurrence on {day.isoformat()}")
+
+        rows = [
+            {
+                "name": exo["name"],
+                "muscle": exo["muscle"],
+                "num_sets": exo["num_sets"],
+                "rest_time": exo.get("rest_time") or 60,
+                "sets_details": exo.get("sets_details") or [],
+                **exercise_metrics(exo["muscle"], exo["num_sets"], exo.get("rest_time"), exo.get("sets_details")),
+            }
+            for exo in schedule.exercises or []
+        ]
+        try:
+            async with session.begin_nested():
+                workout = Workout(
+                    user_id=user_id,
+                    name=schedule.name,
+                    description=schedule.description,
+                    difficulty=schedule.difficulty,
+                    scheduled_date=datetime.combine(day, schedule.starts_at.time()),
+                    coach_id=schedule.coach_id,
+                    schedule_id=schedule_id,
+                    occurrence_date=day,
+                    **workout_metrics(rows),
+                )
+                session.add(workout)
+                await session.flush()
+                if rows:
+                    await session.execute(insert(WorkoutExercise), [{"workout_id": workout.id, **row} for row in rows])
+                await _log_changes(session, "workout", [(user_id, workout.id)])
+            workout_id = workout.id
+            if schedule.coach_id is not None:
+                await _bump_coach_stats(session, schedule.coach_id, workouts_created=1)
+        except IntegrityError:
+            # Started concurrently (another device): use that row
+            workout_id = (await session.execute(existing)).scalar()
+        await session.commit()
+
+    if complete:
+        completed = (await session.execute(select(Workout.is_completed).where(Workout.id == workout_id))).scalar()
+        if not completed:
+            await toggle_workout_complete(session, workout_id, user_id)
+
+    return await get_workout_detail(session, workout_id, user_id)
+
+
+async def skip_schedule_occurrence(session: AsyncSession, user_id: int, schedule_id: int, day: date):
+    """Remove one occurrence from a schedule (EXDATE)."""
+    schedule = await _get_user_schedule(session, schedule_id, user_id)
+    started = (await session.execute(
+        select(Workout.id).where(Workout.schedule_id == schedule_id, Workout.occurrence_date == day)
+    )).scalar()
+    if started is not None:
+        raise HTTPException(status_code=409, detail="This occurrence was already started, delete the workout instead")
+
+    _exclude_occurrence(schedule, day)
+    await _bump_versions(session, "workouts", [user_id])
+    await session.commit()
+    return {"message": "Occurrence skipped"}
+
+
+def _exclude_occurrence(schedule: WorkoutSchedule, day: date):
+    excluded = set(schedule.excluded_dates or [])
+    excluded.add(day.isoformat())
+    schedule.excluded_dates = sorted(excluded)
+
+
+async def _forget_schedule_occurrence(session: AsyncSession, workout: Workout):
+    """A deleted materialized workout must not come back as a virtual occurrence."""
+    if workout.schedule_id is not None and workout.occurrence_date is not None:
+        schedule = await session.get(WorkoutSchedule, workout.schedule_id)
+        if schedule is not None:
+            _exclude_occurrence(schedule, workout.occurrence_date)
+
+
+# ---------------------------------------------------------------------------
+# Calories burned estimation
+# ---------------------------------------------------------------------------
+
+# MET values by muscle group (moderate intensity strength training)
+MUSCLE_MET = {
+    "chest": 6.0,
+    "back": 6.0,
+    "legs": 6.5,
+    "shoulders": 5.0,
+    "arms": 4.5,
+    "abs": 4.0,
+    "cardio": 8.0,
+    "full body": 6.0,
+}
+DEFAULT_MET = 5.0
+
+
+# Body weight the stored calorie estimates are computed for. The MET formula is
+# linear in weight, so reads scale them to the user's weight.
+REFERENCE_WEIGHT_KG = 70.0
+
+WORKOUT_METRIC_FIELDS = ("total_reps", "total_volume", "duration_seconds", "calories_ref")
+
+
+def exercise_metrics(muscle: str, num_sets: int, rest_time: int, sets_details) -> dict:
+    """
+    Metrics of a single exercise, stored on write.
+
+    For strength sets (reps > 0):
+      set_time    = reps × 4s per rep, × (1 + weight/200) with a load
+    For duration sets (duration > 0):
+      set_time    = duration
+    Each set is followed by rest_time; without set details, 30s per set + rest.
+      calories    = (total_minutes / 60) × MET × REFERENCE_WEIGHT_KG
+    """
+    met = MUSCLE_MET.get((muscle or "").lower(), DEFAULT_MET)
+    if isinstance(sets_details, str):
+        try:
+            sets_details = json.loads(sets_details)
+        except (json.JSONDecodeError, TypeError):
+            sets_details = []
+    sets_details = sets_details or []
+    num_sets = num_sets or len(sets_details) or 1
+    rest_time = rest_time or 60
+
+    total_seconds = 0
+    total_reps = 0
+    total_volume = 0.0
+
+    if sets_details:
         for s in sets_details:
             reps = s.get("reps", 0) or 0
             duration = s.get("duration", 0) or 0
             weight = s.get("weight", 0) or 0
 
+            total_reps += reps
+            total_volume += reps * weight
+
             if duration > 0:
                 total_seconds += duration
             elif reps > 0:
@@ -835,10 +1771,54 @@ def _estimate_exercise_calories(exercise, user_weight_kg: float) -> float:
         # Fallback: estimate 30s per set + rest
         total_seconds = num_sets * (30 + rest_time)
 
-    total_minutes = total_seconds / 60
     # MET formula: kcal = MET × weight_kg × time_hours
-    calories = met * user_weight_kg * (total_minutes / 60)
-    return round(calories, 1)
+    calories = met * REFERENCE_WEIGHT_KG * (total_seconds / 3600)
+    return {
+        "total_reps": int(total_reps),
+        "total_volume": round(total_volume, 2),
+        "duration_seconds": int(round(total_seconds)),
+        "calories_ref": round(calories, 2),
+    }
+
+
+def workout_metrics(per_exercise: list[dict]) -> dict:
+    """Workout totals from its exercises' metrics."""
+    totals = {field: sum(m[field] for m in per_exercise) for field in WORKOUT_METRIC_FIELDS}
+    totals["total_volume"] = round(totals["total_volume"], 2)
+    totals["calories_ref"] = round(totals["calories_ref"], 2)
+    totals["exercise_count"] = len(per_exercise)
+    return totals
+
+
+def _set_fields(obj, values: dict):
+    for field, value in values.items():
+        setattr(obj, field, value)
+
+
+async def backfill_workout_metrics(session: AsyncSession, batch_size: int = 200) -> int:
+    """Compute the stored metrics of workouts written before they existed. Returns the number updated."""
+    updated = 0
+    while True:
+        result = await session.execute(
+            select(Workout)
+            .where(Workout.calories_ref.is_(None))
+            .options(selectinload(Workout.exercises))
+            .order_by(Workout.id)
+            .limit(batch_size)
+        )
+        batch = result.scalars().all()
+        if not batch:
+            break
+        for workout in batch:
+            per_exercise = []
+            for exo in workout.exercises:
+                metrics = exercise_metrics(exo.muscle, exo.num_sets, exo.rest_time, exo.sets_details)
+                _set_fields(exo, metrics)
+                per_exercise.append(metrics)
+            _set_fields(workout, workout_metrics(per_exercise))
+        await session.commit()
+        updated += len(batch)
+    return updated
 
 
 async def get_daily_calories_burned(session: AsyncSession, user_id: int):
@@ -853,7 +1833,11 @@ async def get_daily_calories_burned(session: AsyncSession, user_id: int):
     today_end = today_start + timedelta(days=1)
 
     result = await session.execute(
-        select(Workout)
+        select(
+            func.count(Workout.id),
+            func.coalesce(func.sum(Workout.exercise_count), 0),
+            func.coalesce(func.sum(Workout.calories_ref), 0),
+        )
         .where(
             and_(
                 Workout.user_id == user_id,
@@ -862,23 +1846,283 @@ async def get_daily_calories_burned(session: AsyncSession, user_id: int):
                 Workout.is_completed == True,
             )
         )
-        .options(selectinload(Workout.exercises))
     )
-    workouts = result.scalars().all()
+    workout_count, exercise_count, calories_ref = result.one()
+    return _calories_burned_values(user_weight, workout_count, exercise_count, calories_ref)
 
-    total_calories = 0.0
-    exercise_count = 0
-    workout_count = len(workouts)
 
-    for w in workouts:
-        for ex in w.exercises:
-            total_calories += _estimate_exercise_calories(ex, user_weight)
-            exercise_count += 1
+def _calories_burned_values(user_weight: float, workout_count: int, exercise_count, calories_ref) -> dict:
+    """Stored reference calories scaled to the user's weight."""
+    total_calories = float(calories_ref) * user_weight / REFERENCE_WEIGHT_KG
 
     return {
         "calories_burned": round(total_calories),
         "workout_count": workout_count,
-        "exercise_count": exercise_count,
+        "exercise_count": int(exercise_count),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Personal records & progression
+# ---------------------------------------------------------------------------
+
+PROGRESS_COLUMNS = ("user_id", "workout_id", "exercise_key", "performed_at", "best_weight", "best_e1rm", "volume", "total_reps")
+
+
+def exercise_key(name: str) -> str:
+    """Records key of an exercise name: "  Bench  Press" -> "bench press"."""
+    return " ".join((name or "").lower().split())[:100]
+
+
+def estimated_one_rep_max(weight: float, reps: int) -> float:
+    """Epley formula: weight × (1 + reps / 30); a single is the weight itself."""
+    if weight <= 0 or reps <= 0:
+        return 0.0
+    if reps == 1:
+        return float(weight)
+    return weight * (1 + reps / 30)
+
+
+def _naive(dt: datetime | None) -> datetime | None:
+    return dt.replace(tzinfo=None) if dt is not None and dt.tzinfo else dt
+
+
+def _progress_rows(user_id: int, workout_id: int, performed_at: datetime, exercises) -> list[dict]:
+    """One progress row per distinct exercise of a completed workout; `exercises` are (name, sets_details) pairs."""
+    rows: dict[str, dict] = {}
+    for name, sets_details in exercises:
+        key = exercise_key(name)
+        if not key:
+            continue
+        if isinstance(sets_details, str):
+            try:
+                sets_details = json.loads(sets_details)
+            except (json.JSONDecodeError, TypeError):
+                sets_details = []
+
+        row = rows.setdefault(key, {
+            "user_id": user_id, "workout_id": workout_id, "exercise_key": key, "exercise_name": name.strip()[:100],
+            "performed_at": _naive(performed_at), "best_weight": 0.0, "best_e1rm": 0.0, "volume": 0.0, "total_reps": 0,
+        })
+        for s in sets_details or []:
+            reps = s.get("reps", 0) or 0
+            weight = s.get("weight", 0) or 0
+            if reps > 0:
+                row["best_weight"] = max(row["best_weight"], float(weight))
+                row["best_e1rm"] = max(row["best_e1rm"], round(estimated_one_rep_max(weight, reps), 2))
+            row["volume"] = round(row["volume"] + reps * weight, 2)
+            row["total_reps"] += int(reps)
+    return list(rows.values())
+
+
+async def _merge_personal_records(session: AsyncSession, rows: list[dict]):
+    """Fold new progress rows into the records: bests can only go up, so no series scan is needed."""
+    by_user: dict[int, list[dict]] = {}
+    for row in rows:
+        by_user.setdefault(row["user_id"], []).append(row)
+
+    for user_id, user_rows in by_user.items():
+        result = await session.execute(
+            select(PersonalRecord).where(
+                PersonalRecord.user_id == user_id,
+                PersonalRecord.exercise_key.in_({row["exercise_key"] for row in user_rows}),
+            )
+        )
+        records = {record.exercise_key: record for record in result.scalars().all()}
+
+        for row in user_rows:
+            record = records.get(row["exercise_key"])
+            if record is None:
+                record = PersonalRecord(
+                    user_id=user_id, exercise_key=row["exercise_key"], exercise_name=row["exercise_name"],
+                    best_weight=0.0, best_e1rm=0.0, best_volume=0.0, sessions=0,
+                )
+                session.add(record)
+                records[row["exercise_key"]] = record
+
+            record.best_weight = max(record.best_weight or 0, row["best_weight"])
+            record.best_e1rm = max(record.best_e1rm or 0, row["best_e1rm"])
+            record.best_volume = max(record.best_volume or 0, row["volume"])
+            record.sessions = (record.sessions or 0) + 1
+            last = _naive(record.last_performed_at)
+            if last is None or row["performed_at"] >= last:
+                record.last_performed_at = row["performed_at"]
+                record.exercise_name = row["exercise_name"]
+
+
+async def _insert_progress(session: AsyncSession, rows: list[dict]):
+    if rows:
+        await session.execute(insert(ExerciseProgress), [{col: row[col] for col in PROGRESS_COLUMNS} for row in rows])
+
+
+async def _record_workout_progress(session: AsyncSession, workouts: list[Workout]):
+    """Add the progress rows of newly completed workouts and raise the records they beat."""
+    if not workouts:
+        return
+    result = await session.execute(
+        select(WorkoutExercise.workout_id, WorkoutExercise.name, WorkoutExercise.sets_details)
+        .where(WorkoutExercise.workout_id.in_([w.id for w in workouts]))
+        .order_by(WorkoutExercise.id)
+    )
+    exercises_by_workout: dict[int, list] = {}
+    for workout_id, name, sets_details in result.all():
+        exercises_by_workout.setdefault(workout_id, []).append((name, sets_details))
+
+    rows = [
+        row
+        for w in workouts
+        for row in _progress_rows(w.user_id, w.id, w.scheduled_date, exercises_by_workout.get(w.id, []))
+    ]
+    await _insert_progress(session, rows)
+    await _merge_personal_records(session, rows)
+
+
+async def _drop_workout_progress(session: AsyncSession, workout_ids: list[int]) -> dict[int, set[str]]:
+    """Remove the progress rows of workouts; returns the exercise keys touched, per user."""
+    if not workout_ids:
+        return {}
+    result = await session.execute(
+        select(ExerciseProgress.user_id, ExerciseProgress.exercise_key)
+        .where(ExerciseProgress.workout_id.in_(workout_ids))
+    )
+    affected: dict[int, set[str]] = {}
+    for user_id, key in result.all():
+        affected.setdefault(user_id, set()).add(key)
+    if affected:
+        await session.execute(delete(ExerciseProgress).where(ExerciseProgress.workout_id.in_(workout_ids)))
+    return affected
+
+
+async def _rebuild_personal_records(session: AsyncSession, user_id: int, keys: set[str], names: dict[str, str] = None):
+    """
+    Recompute the records of `keys` from the progress series, after rows were
+    removed or replaced (a best cannot be decremented). Records left without
+    any session are deleted.
+    """
+    if not keys:
+        return
+    await session.flush()
+    result = await session.execute(
+        select(
+            ExerciseProgress.exercise_key,
+            func.max(ExerciseProgress.best_weight),
+            func.max(ExerciseProgress.best_e1rm),
+            func.max(ExerciseProgress.volume),
+            func.max(ExerciseProgress.performed_at),
+            func.count(ExerciseProgress.id),
+        )
+        .where(ExerciseProgress.user_id == user_id, ExerciseProgress.exercise_key.in_(keys))
+        .group_by(ExerciseProgress.exercise_key)
+    )
+    stats = {row[0]: row[1:] for row in result.all()}
+
+    records_result = await session.execute(
+        select(PersonalRecord).where(PersonalRecord.user_id == user_id, PersonalRecord.exercise_key.in_(keys))
+    )
+    records = {record.exercise_key: record for record in records_result.scalars().all()}
+
+    for key in keys:
+        record = records.get(key)
+        if key not in stats:
+            if record is not None:
+                await session.delete(record)
+            continue
+        if record is None:
+            record = PersonalRecord(user_id=user_id, exercise_key=key, exercise_name=(names or {}).get(key, key))
+            session.add(record)
+        best_weight, best_e1rm, best_volume, last_performed_at, sessions = stats[key]
+        record.best_weight = best_weight or 0
+        record.best_e1rm = best_e1rm or 0
+        record.best_volume = best_volume or 0
+        record.last_performed_at = last_performed_at
+        record.sessions = sessions
+        if names and key in names:
+            record.exercise_name = names[key]
+
+
+async def _forget_workout_progress(session: AsyncSession, workout_ids: list[int]):
+    """Workouts uncompleted or deleted: drop their series rows and recompute the records they fed."""
+    for user_id, keys in (await _drop_workout_progress(session, workout_ids)).items():
+        await _rebuild_personal_records(session, user_id, keys)
+
+
+async def backfill_exercise_progress(session: AsyncSession, batch_size: int = 200) -> int:
+    """Build the progress series of completed workouts that have none. Returns the number of workouts processed."""
+    processed = 0
+    last_id = 0
+    while True:
+        has_progress = select(ExerciseProgress.id).where(ExerciseProgress.workout_id == Workout.id).exists()
+        result = await session.execute(
+            select(Workout)
+            .where(Workout.id > last_id, Workout.is_completed == True, ~has_progress)
+            .order_by(Workout.id)
+            .limit(batch_size)
+        )
+        batch = result.scalars().all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+        await _record_workout_progress(session, batch)
+        await session.commit()
+        processed += len(batch)
+    return processed
+
+
+def _record_to_dict(record: PersonalRecord) -> dict:
+    return {
+        "exercise_key": record.exercise_key,
+        "exercise_name": record.exercise_name,
+        "best_weight": record.best_weight,
+        "best_e1rm": record.best_e1rm,
+        "best_volume": record.best_volume,
+        "sessions": record.sessions,
+        "last_performed_at": record.last_performed_at.isoformat() if record.last_performed_at else None,
+    }
+
+
+async def get_personal_records(session: AsyncSession, user_id: int):
+    result = await session.execute(
+        select(PersonalRecord)
+        .where(PersonalRecord.user_id == user_id)
+        .order_by(desc(PersonalRecord.last_performed_at))
+    )
+    return [_record_to_dict(record) for record in result.scalars().all()]
+
+
+async def get_exercise_progression(session: AsyncSession, user_id: int, exercise: str,
+                                   date_from: date = None, date_to: date = None):
+    """
+    Progression curve of one exercise: the record plus one point per session,
+    as parallel arrays (dates, best_weight, best_e1rm, volume, reps).
+    """
+    key = exercise_key(exercise)
+    record = await session.get(PersonalRecord, (user_id, key))
+    if record is None:
+        raise HTTPException(status_code=404, detail="No completed session for this exercise")
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="'from' must be on or before 'to'")
+
+    query = (
+        select(ExerciseProgress.performed_at, ExerciseProgress.best_weight, ExerciseProgress.best_e1rm,
+               ExerciseProgress.volume, ExerciseProgress.total_reps)
+        .where(ExerciseProgress.user_id == user_id, ExerciseProgress.exercise_key == key)
+        .order_by(ExerciseProgress.performed_at, ExerciseProgress.id)
+    )
+    if date_from:
+        query = query.where(ExerciseProgress.performed_at >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        query = query.where(ExerciseProgress.performed_at < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+    points = (await session.execute(query)).all()
+
+    return {
+        "record": _record_to_dict(record),
+        "series": {
+            "dates": [p.performed_at.date().isoformat() for p in points],
+            "best_weight": [p.best_weight for p in points],
+            "best_e1rm": [p.best_e1rm for p in points],
+            "volume": [p.volume for p in points],
+            "reps": [p.total_reps for p in points],
+        },
     }
 
 
@@ -886,24 +2130,131 @@ async def get_daily_calories_burned(session: AsyncSession, user_id: int):
 # Coaches
 # ---------------------------------------------------------------------------
 
-async def get_all_coaches(session: AsyncSession):
+COACH_STATS_FIELDS = ("active_clients", "workouts_created", "forum_posts", "rating_sum", "rating_count")
+
+
+async def _compute_coach_stats(session: AsyncSession, coach_id: int) -> dict:
+    """
+    Stats recomputed from the source tables, used to create a coach's missing
+    stats row. They are live counts: the write paths also decrement the
+    counters when workouts, ratings or forum posts are deleted, so a row seeded
+    here and a row tracked from the start agree.
+    """
+    active_clients = (await session.execute(
+        select(func.count(Users.id)).where(Users.coach_id == coach_id)
+    )).scalar() or 0
+    workouts_created = (await session.execute(
+        select(func.count(Workout.id)).where(Workout.coach_id == coach_id)
+    )).scalar() or 0
+    forum_posts = (await session.execute(
+        select(func.count(ForumMessage.id)).where(ForumMessage.user_id == coach_id)
+    )).scalar() or 0
+    rating_sum, rating_count = (await session.execute(
+        select(func.coalesce(func.sum(WorkoutRating.overall_rating), 0), func.count(WorkoutRating.id))
+        .join(Workout, WorkoutRating.workout_id == Workout.id)
+        .where(Workout.coach_id == coach_id)
+    )).one()
+    return {
+        "coach_id": coach_id,
+        "active_clients": active_clients,
+        "workouts_created": workouts_created,
+        "forum_posts": forum_posts,
+        "rating_sum": int(rating_sum or 0),
+        "rating_count": rating_count,
+    }
+
+
+async def _bump_coach_stats(session: AsyncSession, coach_id: int, **deltas):
+    """
+    Apply counter deltas (e.g. active_clients=1) to a coach's stats row inside the
+    caller's transaction. A missing row is created from the source tables, which
+    already include the caller's pending change.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
     result = await session.execute(
-        select(Users).where(Users.role == 'coach')
+        update(CoachStats)
+        .where(CoachStats.coach_id == coach_id)
+        .values({field: getattr(CoachStats, field) + delta for field, delta in deltas.items()})
     )
-    coaches = result.scalars().all()
+    if result.rowcount:
+        return
 
-    return [
-        {
-            "id": coach.id,
-            "firstname": coach.firstname,
-            "lastname": coach.lastname,
-            "email": coach.email,
-            "gender": coach.gender,
-            "age": coach.age,
-            "speciality": "General"
-        }
-        for coach in coaches
-    ]
+    try:
+        async with session.begin_nested():
+            session.add(CoachStats(**await _compute_coach_stats(session, coach_id)))
+    except IntegrityError:
+        # created concurrently: apply the deltas to that row instead
+        await session.execute(
+            update(CoachStats)
+            .where(CoachStats.coach_id == coach_id)
+            .values({field: getattr(CoachStats, field) + delta for field, delta in deltas.items()})
+        )
+
+
+async def _set_client_coach(session: AsyncSession, client: Users, coach_id: int | None):
+    """Single place where a client's coach changes, so active_clients stays in sync."""
+    previous = client.coach_id
+    if previous == coach_id:
+        return
+    client.coach_id = coach_id
+    if previous is not None:
+        await _bump_coach_stats(session, previous, active_clients=-1)
+    if coach_id is not None:
+        await _bump_coach_stats(session, coach_id, active_clients=1)
+
+
+COACH_DIRECTORY_PAGE_SIZE = 20
+COACH_DIRECTORY_CACHE_TTL = 60
+
+# Directory pages by (after_id, limit); cleared whenever a coach registers, edits
+# or deletes their profile. The TTL bounds staleness across workers.
+_coach_directory_cache = TTLCache(ttl_seconds=COACH_DIRECTORY_CACHE_TTL, max_entries=256)
+
+
+def invalidate_coach_directory():
+    _coach_directory_cache.clear()
+
+
+async def get_all_coaches(session: AsyncSession, after_id: int = None, limit: int = COACH_DIRECTORY_PAGE_SIZE):
+    """One page of the coach directory, ordered by id; pass the returned next_cursor as after_id."""
+    cache_key = (after_id, limit)
+    cached = _coach_directory_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    stmt = (
+        select(Users.id, Users.firstname, Users.lastname, Users.email, Users.gender, Users.age)
+        .where(Users.role == 'coach')
+        .order_by(Users.id)
+        .limit(limit + 1)
+    )
+    if after_id is not None:
+        stmt = stmt.where(Users.id > after_id)
+
+    rows = (await session.execute(stmt)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    page = {
+        "coaches": [
+            {
+                "id": coach.id,
+                "firstname": coach.firstname,
+                "lastname": coach.lastname,
+                "email": coach.email,
+                "gender": coach.gender,
+                "age": coach.age,
+                "speciality": "General"
+            }
+            for coach in rows
+        ],
+        "next_cursor": rows[-1].id if has_more else None,
+    }
+    _coach_directory_cache.set(cache_key, page)
+    return page
 
 
 async def assign_coach_to_client(session: AsyncSession, client_id: int, coach_id: int):
@@ -919,8 +2270,8 @@ async def assign_coach_to_client(session: AsyncSession, client_id: int, coach_id
     if not coach or coach.role != 'coach':
         raise HTTPException(status_code=400, detail="Invalid coach ID")
 
-    client.coach_id = coach_id
     try:
+        await _set_client_coach(session, client, coach_id)
         await session.commit()
         return {"message": "Coach assigned successfully", "coach": f"{coach.firstname} {coach.lastname}"}
     except Exception as e:
@@ -949,25 +2300,28 @@ async def get_clients_by_coach_id(session: AsyncSession, coach_id: int):
 
 
 async def get_coach_dashboard_stats(session: AsyncSession, coach_id: int):
-    today = date.today()
+    """Today's calories for every client of the coach, in one grouped query."""
+    day_start = datetime.combine(date.today(), datetime.min.time())
+    day_end = day_start + timedelta(days=1)
 
-    clients_result = await session.execute(select(Users).where(Users.coach_id == coach_id))
-    clients = clients_result.scalars().all()
+    # Range predicate on hourtime (not func.date) so ix_meals_user_hourtime is usable
+    calories_today = func.coalesce(func.sum(Meal.total_calories), 0).label("calories_today")
+    result = await session.execute(
+        select(Users.id, Users.firstname, Users.lastname, Users.daily_caloric_needs, calories_today)
+        .outerjoin(Meal, and_(
+            Meal.user_id == Users.id,
+            Meal.hourtime >= day_start,
+            Meal.hourtime < day_end,
+        ))
+        .where(Users.coach_id == coach_id)
+        .group_by(Users.id, Users.firstname, Users.lastname, Users.daily_caloric_needs)
+        .order_by(Users.id)
+    )
 
     dashboard_data = []
 
-    for client in clients:
-        meals_result = await session.execute(
-            select(func.sum(Meal.total_calories))
-            .where(
-                and_(
-                    Meal.user_id == client.id,
-                    func.date(Meal.hourtime) == today
-                )
-            )
-        )
-        total_calories_today = meals_result.scalar() or 0
-
+    for client in result.all():
+        total_calories_today = client.calories_today or 0
         target = client.daily_caloric_needs or 2000
 
         dashboard_data.append({
@@ -999,9 +2353,8 @@ async def assign_client_by_code(session: AsyncSession, coach_id: int, unique_cod
     if not coach or coach.role != 'coach':
         raise HTTPException(status_code=400, detail="Invalid coach ID")
 
-    client.coach_id = coach_id
-
     try:
+        await _set_client_coach(session, client, coach_id)
         await session.commit()
         return {
             "message": "Client ajouté avec succès",
@@ -1027,9 +2380,8 @@ async def unassign_client(session: AsyncSession, coach_id: int, client_id: int):
             detail="Client not found or not assigned to this coach."
         )
 
-    client.coach_id = None
-
     try:
+        await _set_client_coach(session, client, None)
         await session.commit()
         return {"message": "Client unassigned successfully"}
     except Exception as e:
@@ -1120,13 +2472,17 @@ async def get_coach_home_summary(session: AsyncSession, coach_id: int):
             "pending_requests": 0,
         }
 
+    # Scheduled occurrences never started count as planned, not completed
+    start_30 = today - timedelta(days=30)
+    virtual = await _virtual_workouts(session, client_ids, start_30, today)
+
     # --- This-week workouts (all clients) ---
     wo_result = await session.execute(
         select(Workout)
         .where(Workout.user_id.in_(client_ids), func.date(Workout.scheduled_date) >= week_start, func.date(Workout.scheduled_date) <= today)
         .options(selectinload(Workout.rating))
     )
-    week_workouts = wo_result.scalars().all()
+    week_workouts = list(wo_result.scalars().all()) + [w for w in virtual if w.occurrence_date >= week_start]
     week_total = len(week_workouts)
     week_completed = sum(1 for w in week_workouts if w.is_completed)
 
@@ -1152,13 +2508,12 @@ async def get_coach_home_summary(session: AsyncSession, coach_id: int):
     clients_week_workouts.sort(key=lambda x: x["completed"], reverse=True)
 
     # --- Last 30 days workouts for trends ---
-    start_30 = today - timedelta(days=30)
     wo_30_result = await session.execute(
         select(Workout)
         .where(Workout.user_id.in_(client_ids), func.date(Workout.scheduled_date) >= start_30, func.date(Workout.scheduled_date) <= today)
         .options(selectinload(Workout.rating))
     )
-    workouts_30 = wo_30_result.scalars().all()
+    workouts_30 = list(wo_30_result.scalars().all()) + virtual
 
     # Avg rating (last 30d)
     rated = [w for w in workouts_30 if w.rating]
@@ -1220,11 +2575,7 @@ async def get_coach_home_summary(session: AsyncSession, coach_id: int):
     leaderboard.sort(key=lambda x: x["sessions_per_week"], reverse=True)
 
     # --- Unread messages ---
-    unread_result = await session.execute(
-        select(func.count(Message.id))
-        .where(Message.receiver_id == coach_id, Message.is_read == False)
-    )
-    unread_messages = unread_result.scalar() or 0
+    unread_messages = await _unread_total(session, coach_id)
 
     # --- Pending requests ---
     pending_result = await session.execute(
@@ -1233,33 +2584,24 @@ async def get_coach_home_summary(session: AsyncSession, coach_id: int):
     )
     pending_requests = pending_result.scalar() or 0
 
-    # --- Recent activity (notification messages from clients) ---
+    # --- Recent activity (client notifications) ---
     notif_result = await session.execute(
-        select(Message)
-        .where(Message.receiver_id == coach_id, Message.content.like('%"_notification"%'))
-        .order_by(desc(Message.timestamp))
+        select(Notification)
+        .where(Notification.recipient_id == coach_id)
+        .order_by(desc(Notification.created_at))
         .limit(20)
     )
-    notif_msgs = notif_result.scalars().all()
-
     client_map = {c.id: f"{c.firstname} {c.lastname}" for c in clients}
-    recent_activity = []
-    for msg in notif_msgs:
-        try:
-            data = json.loads(msg.content)
-            if data.get("_notification"):
-                recent_activity.append({
-                    "id": msg.id,
-                    "client_id": msg.sender_id,
-                    "client_name": client_map.get(msg.sender_id, data.get("client_name", "Unknown")),
-                    "type": data.get("type", ""),
-                    "label": data.get("label", ""),
-                    "date": data.get("date"),
-                    "timestamp": msg.timestamp.isoformat() if msg.timestamp else None,
-                    "is_read": msg.is_read,
-                })
-        except (json.JSONDecodeError, AttributeError):
-            continue
+    recent_activity = [{
+        "id": notif.id,
+        "client_id": notif.sender_id,
+        "client_name": client_map.get(notif.sender_id, "Unknown"),
+        "type": notif.type,
+        "label": notif.label,
+        "date": str(notif.activity_date) if notif.activity_date else None,
+        "timestamp": notif.created_at.isoformat() if notif.created_at else None,
+        "is_read": notif.is_read,
+    } for notif in notif_result.scalars().all()]
 
     return {
         "kpi": {
@@ -1338,6 +2680,16 @@ async def get_client_details_full(session: AsyncSession, client_id: int, target_
     )
     meals = result_meals.scalars().all()
 
+    items_by_meal: dict[int, list] = {}
+    if meals:
+        result_items = await session.execute(
+            select(MealItem)
+            .where(MealItem.meal_id.in_([m.id for m in meals]))
+            .order_by(MealItem.meal_id, MealItem.position)
+        )
+        for item in result_items.scalars().all():
+            items_by_meal.setdefault(item.meal_id, []).append(_meal_item_as_aliment(item))
+
     result_workouts = await session.execute(
         select(Workout)
         .where(Workout.user_id == client_id, func.date(Workout.scheduled_date) == query_date)
@@ -1375,7 +2727,7 @@ async def get_client_details_full(session: AsyncSession, client_id: int, target_
                 "name": m.name if hasattr(m, 'name') else m.aliment_name,
                 "calories": m.total_calories,
                 "is_consumed": m.is_consumed,
-                "aliments": json.loads(m.aliments) if m.aliments else []
+                "aliments": items_by_meal.get(m.id, [])
             } for m in meals
         ],
         "workouts_today": [
@@ -1416,7 +2768,7 @@ async def get_client_statistics(session: AsyncSession, client_id: int, days: int
             func.date(Workout.scheduled_date) >= start_date,
             func.date(Workout.scheduled_date) <= end_date,
         )
-        .options(selectinload(Workout.rating), selectinload(Workout.exercises))
+        .options(selectinload(Workout.rating))
     )
     workouts = wo_result.scalars().all()
 
@@ -1438,33 +2790,21 @@ async def get_client_statistics(session: AsyncSession, client_id: int, days: int
         if e in energy_dist:
             energy_dist[e] += 1
 
-    # Muscle group distribution (count exercises per muscle)
+    # Muscle group distribution (count exercises per muscle, completed workouts)
+    completed_ids = [w.id for w in workouts if w.is_completed]
     muscle_dist: dict[str, int] = {}
-    for w in workouts:
-        if w.is_completed:
-            for exo in w.exercises:
-                m = (exo.muscle or "other").lower()
-                muscle_dist[m] = muscle_dist.get(m, 0) + 1
-
-    # Compute total volume per workout (sum of reps * weight across all exercises/sets)
-    def calc_workout_volume(workout):
-        vol = 0
-        for exo in workout.exercises:
-            sets = exo.sets_details
-            if isinstance(sets, str):
-                try:
-                    sets = json.loads(sets)
-                except Exception:
-                    sets = []
-            if not sets:
-                continue
-            for s in sets:
-                reps = s.get("reps", 0) or 0
-                weight = s.get("weight", 0) or 0
-                vol += reps * weight
-        return vol
+    if completed_ids:
+        muscle_result = await session.execute(
+            select(WorkoutExercise.muscle, func.count(WorkoutExercise.id))
+            .where(WorkoutExercise.workout_id.in_(completed_ids))
+            .group_by(WorkoutExercise.muscle)
+        )
+        for muscle, count in muscle_result.all():
+            m = (muscle or "other").lower()
+            muscle_dist[m] = muscle_dist.get(m, 0) + count
 
-    total_volume = sum(calc_workout_volume(w) for w in workouts if w.is_completed)
+    # Total volume (sum of reps * weight), stored per workout on write
+    total_volume = sum(w.total_volume or 0 for w in workouts if w.is_completed)
 
     # Weekly buckets
     weekly = {}
@@ -1477,7 +2817,7 @@ async def get_client_statistics(session: AsyncSession, client_id: int, days: int
         weekly[key]["total"] += 1
         if w.is_completed:
             weekly[key]["completed"] += 1
-            weekly[key]["volume"] += calc_workout_volume(w)
+            weekly[key]["volume"] += w.total_volume or 0
         if w.rating:
             weekly[key]["ratings"].append(w.rating.overall_rating)
 
@@ -1603,7 +2943,7 @@ async def remove_client_from_coach(session: AsyncSession, coach_id: int, client_
     if not client:
         raise HTTPException(status_code=404, detail="Client not found or not associated with this coach.")
 
-    client.coach_id = None
+    await _set_client_coach(session, client, None)
     await session.commit()
 
     return {"message": "Client successfully removed from your team."}
@@ -1624,6 +2964,8 @@ async def delete_meal_by_coach(session: AsyncSession, meal_id: int):
         )
 
     try:
+        await session.execute(delete(MealItem).where(MealItem.meal_id == meal_id))
+        await _log_changes(session, "meal", [(meal.user_id, meal.id)], op="delete")
         await session.delete(meal)
         await session.commit()
         return {"message": "Meal successfully deleted"}
@@ -1654,6 +2996,8 @@ async def update_meal_by_coach(session: AsyncSession, meal_id: int, meal_data: M
         meal.carbohydrates = meal_data.total_carbohydrates
         meal.lipids = meal_data.total_lipids
         meal.aliments = json.dumps(meal_data.aliments)
+        await _replace_meal_items(session, meal.id, meal.user_id, meal_data.aliments)
+        await _log_changes(session, "meal", [(meal.user_id, meal.id)])
 
         await session.commit()
         await session.refresh(meal)
@@ -1692,6 +3036,9 @@ async def create_meal_for_client(session: AsyncSession, client_id: int, meal_dat
         )
 
         session.add(new_meal)
+        await session.flush()
+        await _replace_meal_items(session, new_meal.id, client_id, meal_data.aliments)
+        await _log_changes(session, "meal", [(client_id, new_meal.id)])
         await session.commit()
         await session.refresh(new_meal)
 
@@ -1710,76 +3057,334 @@ async def create_meal_for_client(session: AsyncSession, client_id: int, meal_dat
 
 
 # ---------------------------------------------------------------------------
-# Coach search
+# Coach templates (one workout / meal applied to many clients and dates)
 # ---------------------------------------------------------------------------
 
-async def search_coaches_by_city(session: AsyncSession, city: str = None):
-    stmt = select(Users).where(Users.role == 'coach')
+# Upper bound of clients × dates written by one apply call
+TEMPLATE_MAX_ITEMS = 2000
 
-    if city:
-        stmt = stmt.where(Users.city.ilike(f"%{city}%"))
 
-    result = await session.execute(stmt)
-    coaches = result.scalars().all()
+async def _require_coach(session: AsyncSession, coach_id: int):
+    role = (await session.execute(select(Users.role).where(Users.id == coach_id))).scalar()
+    if role != "coach":
+        raise HTTPException(status_code=403, detail="Only coaches can manage templates.")
 
-    return [
-        {
-            "id": coach.id,
-            "firstname": coach.firstname,
-            "lastname": coach.lastname,
-            "city": coach.city
-        }
-        for coach in coaches
+
+def _template_to_dict(template: CoachTemplate) -> dict:
+    return {
+        "id": template.id,
+        "kind": template.kind,
+        "name": template.name,
+        "payload": template.payload,
+        "created_at": template.created_at.isoformat() if template.created_at else None,
+    }
+
+
+async def create_coach_template(session: AsyncSession, coach_id: int, data: CoachTemplateCreate):
+    await _require_coach(session, coach_id)
+    body = data.workout if data.kind == "workout" else data.meal
+    other = data.meal if data.kind == "workout" else data.workout
+    if body is None or other is not None:
+        raise HTTPException(status_code=422, detail=f"A {data.kind} template needs exactly the '{data.kind}' field.")
+
+    template = CoachTemplate(coach_id=coach_id, kind=data.kind, name=body.name, payload=body.model_dump())
+    session.add(template)
+    await session.commit()
+    await session.refresh(template)
+    return _template_to_dict(template)
+
+
+async def get_coach_templates(session: AsyncSession, coach_id: int, kind: str = None):
+    query = select(CoachTemplate).where(CoachTemplate.coach_id == coach_id)
+    if kind:
+        query = query.where(CoachTemplate.kind == kind)
+    result = await session.execute(query.order_by(CoachTemplate.id))
+    return [_template_to_dict(template) for template in result.scalars().all()]
+
+
+async def _get_coach_template(session: AsyncSession, template_id: int, coach_id: int) -> CoachTemplate:
+    result = await session.execute(
+        select(CoachTemplate).where(CoachTemplate.id == template_id, CoachTemplate.coach_id == coach_id)
+    )
+    template = result.scalars().first()
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return template
+
+
+async def delete_coach_template(session: AsyncSession, template_id: int, coach_id: int):
+    template = await _get_coach_template(session, template_id, coach_id)
+    await session.delete(template)
+    await session.commit()
+    return {"message": "Template deleted"}
+
+
+async def _insert_meals_batch(session: AsyncSession, coach_payload: dict, items: list[tuple[int, datetime]]) -> list[int]:
+    """One meal per (client_id, hourtime): batched meal rows, then one executemany for their items."""
+    aliments = coach_payload.get("aliments") or []
+    meals = [
+        Meal(
+            user_id=client_id,
+            name=coach_payload["name"],
+            total_calories=coach_payload["total_calories"],
+            total_proteins=coach_payload["total_proteins"],
+            total_carbohydrates=coach_payload["total_carbohydrates"],
+            total_lipids=coach_payload["total_lipids"],
+            hourtime=hourtime,
+            aliments=json.dumps(aliments),
+            is_consumed=False,
+        )
+        for client_id, hourtime in items
     ]
+    session.add_all(meals)
+    await session.flush()
 
+    item_rows = [row for meal in meals for row in _meal_item_rows(meal.id, meal.user_id, aliments)]
+    if item_rows:
+        await session.execute(insert(MealItem), item_rows)
+    await _log_changes(session, "meal", [(meal.user_id, meal.id) for meal in meals])
+    return [meal.id for meal in meals]
 
-async def search_coaches_near_location(session: AsyncSession, city: str = None, lat: float = None, lon: float = None):
-    query = select(Users).where(Users.role == 'coach')
 
-    if city:
-        query = query.where(Users.city.ilike(f"%{city}%"))
+async def apply_coach_template(session: AsyncSession, coach_id: int, template_id: int, data: TemplateApplyRequest):
+    """
+    Write the template for every (client, date) pair in one transaction and
+    report per client. Clients that are not the coach's are reported as
+    failed; nothing is written if the batch itself fails.
+    """
+    template = await _get_coach_template(session, template_id, coach_id)
 
-    result = await session.execute(query)
-    coaches = result.scalars().all()
+    requested = list(dict.fromkeys(data.client_ids))
+    dates = sorted(set(data.dates))
+    if len(requested) * len(dates) > TEMPLATE_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {TEMPLATE_MAX_ITEMS} items per call (clients × dates), split the request.",
+        )
+
+    own = set((await session.execute(
+        select(Users.id).where(Users.id.in_(requested), Users.coach_id == coach_id)
+    )).scalars().all())
+    client_ids = [client_id for client_id in requested if client_id in own]
+
+    report = {client_id: {"client_id": client_id, "created_ids": [], "error": None} for client_id in requested}
+    for client_id in requested:
+        if client_id not in own:
+            report[client_id]["error"] = "Not one of your clients."
+
+    if client_ids:
+        if template.kind == "workout":
+            per_date = [WorkoutCreate(**template.payload, scheduled_date=when) for when in dates]
+            items = [(client_id, workout) for client_id in client_ids for workout in per_date]
+            result = await _insert_workouts_batch(session, items, coach_id=coach_id)
+            for created in result["created"]:
+                report[created["user_id"]]["created_ids"].append(created["workout_id"])
+            for failed in result["failed"]:
+                report[items[failed["index"]][0]]["error"] = failed["error"]
+        else:
+            items = [(client_id, when) for client_id in client_ids for when in dates]
+            try:
+                meal_ids = await _insert_meals_batch(session, template.payload, items)
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                print(f"Error applying meal template {template_id}: {e}")
+                for client_id in client_ids:
+                    report[client_id]["error"] = "Could not save meals."
+            else:
+                for (client_id, _), meal_id in zip(items, meal_ids):
+                    report[client_id]["created_ids"].append(meal_id)
+
+    results = list(report.values())
+    return {
+        "template_id": template_id,
+        "kind": template.kind,
+        "created": sum(len(r["created_ids"]) for r in results),
+        "failed_clients": sum(1 for r in results if r["error"]),
+        "results": results,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Coach search
+# ---------------------------------------------------------------------------
 
-    response_data = []
+async def search_coaches_by_city(session: AsyncSession, city: str = None):
+    stmt = select(Users).where(Users.role == 'coach')
 
-    for coach in coaches:
-        dist = calculate_distance(lat, lon, coach.latitude, coach.longitude)
-        dist_rounded = round(dist, 1) if dist is not None else None
+    if city:
+        stmt = stmt.where(_city_prefix_clause(city))
 
-        response_data.append({
+    result = await session.execute(stmt)
+    coaches = result.scalars().all()
+
+    return [
+        {
             "id": coach.id,
             "firstname": coach.firstname,
             "lastname": coach.lastname,
-            "city": coach.city,
-            "distance": dist_rounded,
-            "latitude": coach.latitude,
-            "longitude": coach.longitude
-        })
+            "city": coach.city
+        }
+        for coach in coaches
+    ]
+
+
+async def search_cities(session: AsyncSession, prefix: str, limit: int = 10):
+    """City autocomplete: coach cities starting with `prefix` (accent/case-insensitive), most coaches first."""
+    if not normalize_city(prefix):
+        return []
+    stmt = (
+        select(Users.city_key, func.min(Users.city).label("city"), func.count(Users.id).label("coach_count"))
+        .where(Users.role == 'coach', _city_prefix_clause(prefix))
+        .group_by(Users.city_key)
+        .order_by(desc("coach_count"), Users.city_key)
+        .limit(limit)
+    )
+    rows = (await session.execute(stmt)).all()
+    return [{"city": row.city, "coach_count": row.coach_count} for row in rows]
+
+
+async def backfill_city_keys(session: AsyncSession, batch_size: int = 500):
+    """Fill city_key for users created before it existed; returns the number of rows updated."""
+    updated = 0
+    while True:
+        result = await session.execute(
+            select(Users.id, Users.city)
+            .where(Users.city.isnot(None), Users.city_key.is_(None))
+            .limit(batch_size)
+        )
+        rows = result.all()
+        if not rows:
+            break
+        ids_by_key = {}
+        for row in rows:
+            # an unnormalizable city (blank) gets "" so it is not picked up again
+            ids_by_key.setdefault(normalize_city(row.city) or "", []).append(row.id)
+        for key, ids in ids_by_key.items():
+            await session.execute(update(Users).where(Users.id.in_(ids)).values(city_key=key))
+        await session.commit()
+        updated += len(rows)
+    return updated
+
+
+COACH_SEARCH_DEFAULT_LIMIT = 50
+COACH_SEARCH_START_RADIUS_KM = 25.0
+EARTH_HALF_CIRCUMFERENCE_KM = 20038.0
+KM_PER_DEGREE_LAT = 111.32
+
+COACH_SEARCH_COLUMNS = (Users.id, Users.firstname, Users.lastname, Users.city, Users.latitude, Users.longitude)
+
+
+def _coach_search_row(row, distance):
+    return {
+        "id": row.id,
+        "firstname": row.firstname,
+        "lastname": row.lastname,
+        "city": row.city,
+        "distance": round(distance, 1) if distance is not None else None,
+        "latitude": row.latitude,
+        "longitude": row.longitude,
+    }
+
+
+def _bounding_box_clause(lat: float, lon: float, radius_km: float):
+    """Range predicates on the indexed coordinates covering a radius_km circle (antimeridian aware)."""
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    cos_lat = math.cos(math.radians(lat))
+    dlon = 180.0 if cos_lat < 1e-6 else min(180.0, dlat / cos_lat)
+
+    lat_clause = Users.latitude.between(lat - dlat, lat + dlat)
+    if dlon >= 180.0:
+        return and_(lat_clause, Users.longitude.isnot(None))
+
+    min_lon, max_lon = lon - dlon, lon + dlon
+    if min_lon < -180.0:
+        lon_clause = or_(Users.longitude >= min_lon + 360.0, Users.longitude <= max_lon)
+    elif max_lon > 180.0:
+        lon_clause = or_(Users.longitude >= min_lon, Users.longitude <= max_lon - 360.0)
+    else:
+        lon_clause = Users.longitude.between(min_lon, max_lon)
+    return and_(lat_clause, lon_clause)
 
-    if lat is not None and lon is not None:
-        response_data.sort(key=lambda x: x["distance"] if x["distance"] is not None else float('inf'))
+
+async def _coaches_within(session: AsyncSession, lat: float, lon: float, radius_km: float, city: str = None):
+    """(distance, row) of the coaches at most radius_km away: bounding-box prefilter, exact haversine after."""
+    stmt = select(*COACH_SEARCH_COLUMNS).where(Users.role == 'coach', _bounding_box_clause(lat, lon, radius_km))
+    if city:
+        stmt = stmt.where(_city_prefix_clause(city))
+
+    rows = (await session.execute(stmt)).all()
+    distances = distances_from(lat, lon, [(row.latitude, row.longitude) for row in rows])
+    return [(d, row) for d, row in zip(distances, rows) if d <= radius_km]
+
+
+async def search_coaches_near_location(session: AsyncSession, city: str = None, lat: float = None, lon: float = None,
+                                       radius_km: float = None, limit: int = COACH_SEARCH_DEFAULT_LIMIT):
+    """
+    Coaches ordered by distance from (lat, lon), at most `limit`.
+
+    With radius_km, only coaches inside that radius are returned. Without it the
+    search radius grows from COACH_SEARCH_START_RADIUS_KM until `limit` coaches
+    are found (k nearest), then coaches without coordinates fill the rest.
+    Without a position, coaches are returned by id.
+    """
+    if lat is None or lon is None:
+        stmt = select(*COACH_SEARCH_COLUMNS).where(Users.role == 'coach')
+        if city:
+            stmt = stmt.where(_city_prefix_clause(city))
+        rows = (await session.execute(stmt.order_by(Users.id).limit(limit))).all()
+        return [_coach_search_row(row, None) for row in rows]
+
+    if radius_km is not None:
+        found = await _coaches_within(session, lat, lon, radius_km, city)
+    else:
+        radius = COACH_SEARCH_START_RADIUS_KM
+        while True:
+            found = await _coaches_within(session, lat, lon, radius, city)
+            if len(found) >= limit or radius >= EARTH_HALF_CIRCUMFERENCE_KM:
+                break
+            radius *= 4
+
+    nearest = heapq.nsmallest(limit, found, key=lambda item: (item[0], item[1].id))
+    response_data = [_coach_search_row(row, dist) for dist, row in nearest]
+
+    if radius_km is None and len(response_data) < limit:
+        stmt = select(*COACH_SEARCH_COLUMNS).where(
+            Users.role == 'coach',
+            or_(Users.latitude.is_(None), Users.longitude.is_(None)),
+        )
+        if city:
+            stmt = stmt.where(_city_prefix_clause(city))
+        rows = (await session.execute(stmt.order_by(Users.id).limit(limit - len(response_data)))).all()
+        response_data += [_coach_search_row(row, None) for row in rows]
 
     return response_data
 
 
 async def get_coach_public_profile(session: AsyncSession, coach_id: int):
     coach_req = await session.execute(
-        select(Users).where(
+        select(Users.id, Users.firstname, Users.lastname, Users.description, Users.city).where(
             and_(
                 Users.id == coach_id,
                 Users.role == 'coach'
             )
         )
     )
-    coach = coach_req.scalars().first()
+    coach = coach_req.first()
 
     if not coach:
         raise HTTPException(status_code=404, detail="Coach not found.")
 
-    clients_req = await session.execute(select(func.count(Users.id)).where(Users.coach_id == coach_id))
-    active_clients = clients_req.scalar() or 0
+    stats = await session.get(CoachStats, coach_id)
+    if stats is None:
+        # never touched by a write path yet: create the row once from the source tables
+        stats = CoachStats(**await _compute_coach_stats(session, coach_id))
+        session.add(stats)
+        try:
+            await session.commit()
+        except IntegrityError:
+            await session.rollback()
+            stats = await session.get(CoachStats, coach_id)
 
     return {
         "id": coach.id,
@@ -1788,9 +3393,11 @@ async def get_coach_public_profile(session: AsyncSession, coach_id: int):
         "description": coach.description,
         "city": coach.city,
         "stats": {
-            "active_clients": active_clients,
-            "workouts_created": 154,
-            "forum_posts": 28
+            "active_clients": stats.active_clients,
+            "workouts_created": stats.workouts_created,
+            "forum_posts": stats.forum_posts,
+            "average_rating": round(stats.rating_sum / stats.rating_count, 1) if stats.rating_count else None,
+            "ratings_count": stats.rating_count,
         },
         "certifications": [
             "NASM Certified Personal Trainer",
@@ -1914,8 +3521,7 @@ async def respond_to_coach_invitation(session: AsyncSession, invitation_id: int,
     if response_data.status == 'accepted':
         client_req = await session.execute(select(Users).where(Users.id == client_id))
         client = client_req.scalars().first()
-        client.coach_id = invitation.coach_id
-        session.add(client)
+        await _set_client_coach(session, client, invitation.coach_id)
 
         await session.execute(
             update(CoachInvitation)
@@ -2036,11 +3642,8 @@ async def respond_to_client_coach_request(session: AsyncSession, request_id: int
         raise HTTPException(status_code=404, detail="Demande introuvable.")
 
     if status_val == 'accepted':
-        await session.execute(
-            update(Users)
-            .where(Users.id == req.client_id)
-            .values(coach_id=coach_id)
-        )
+        client = await session.get(Users, req.client_id)
+        await _set_client_coach(session, client, coach_id)
 
         await session.execute(
             delete(ClientCoachRequest)
@@ -2094,12 +3697,177 @@ async def get_coach_pending_client_requests(session: AsyncSession, coach_id: int
 # Messages
 # ---------------------------------------------------------------------------
 
+async def _bump_unread(session: AsyncSession, receiver_id: int, sender_id: int, delta: int):
+    """
+    Apply a delta to the (receiver, sender) unread counter inside the caller's
+    transaction, creating the row on the first unread message.
+    """
+    if not delta:
+        return
+
+    key = and_(UnreadCounter.receiver_id == receiver_id, UnreadCounter.sender_id == sender_id)
+    result = await session.execute(
+        update(UnreadCounter).where(key).values(count=UnreadCounter.count + delta)
+    )
+    if result.rowcount or delta < 0:
+        return
+
+    try:
+        async with session.begin_nested():
+            session.add(UnreadCounter(receiver_id=receiver_id, sender_id=sender_id, count=delta))
+    except IntegrityError:
+        # created concurrently: apply the delta to that row instead
+        await session.execute(
+            update(UnreadCounter).where(key).values(count=UnreadCounter.count + delta)
+        )
+
+
+async def _unread_total(session: AsyncSession, receiver_id: int) -> int:
+    result = await session.execute(
+        select(func.coalesce(func.sum(UnreadCounter.count), 0))
+        .where(UnreadCounter.receiver_id == receiver_id)
+    )
+    return int(result.scalar() or 0)
+
+
+async def repair_unread_counters(session: AsyncSession) -> int:
+    """Recompute the counters from messages and notifications, fix the rows that drifted. Returns the number fixed."""
+    actual_result = await session.execute(
+        select(Message.receiver_id, Message.sender_id, func.count(Message.id))
+        .where(Message.is_read == False)
+        .group_by(Message.receiver_id, Message.sender_id)
+    )
+    actual = {(receiver_id, sender_id): count for receiver_id, sender_id, count in actual_result.all()}
+    notif_result = await session.execute(
+        select(Notification.recipient_id, Notification.sender_id, func.count(Notification.id))
+        .where(Notification.is_read == False)
+        .group_by(Notification.recipient_id, Notification.sender_id)
+    )
+    for receiver_id, sender_id, count in notif_result.all():
+        actual[(receiver_id, sender_id)] = actual.get((receiver_id, sender_id), 0) + count
+
+    stored_result = await session.execute(
+        select(UnreadCounter.receiver_id, UnreadCounter.sender_id, UnreadCounter.count)
+    )
+    stored = {(receiver_id, sender_id): count for receiver_id, sender_id, count in stored_result.all()}
+
+    fixed = 0
+    for (receiver_id, sender_id), count in stored.items():
+        expected = actual.get((receiver_id, sender_id), 0)
+        if count != expected:
+            await session.execute(
+                update(UnreadCounter)
+                .where(UnreadCounter.receiver_id == receiver_id, UnreadCounter.sender_id == sender_id)
+                .values(count=expected)
+            )
+            fixed += 1
+
+    missing = [
+        {"receiver_id": receiver_id, "sender_id": sender_id, "count": count}
+        for (receiver_id, sender_id), count in actual.items()
+        if (receiver_id, sender_id) not in stored
+    ]
+    if missing:
+        await session.execute(insert(UnreadCounter), missing)
+        fixed += len(missing)
+
+    await session.commit()
+    return fixed
+
+
+NOTIFICATION_LABELS = {
+    "meal_created": "New Meal",
+    "meal_updated": "Meal Updated",
+    "workout_updated": "Workout Updated",
+    "profile_updated": "Profile Updated",
+}
+
+
+def _notification_as_message(notif: Notification, client_name: str) -> dict:
+    """
+    A notification in the chat's message format: the app renders contents
+    carrying the `_notification` flag as activity cards. Negative ids keep them
+    apart from real message ids.
+    """
+    return {
+        "id": -notif.id,
+        "sender_id": notif.sender_id,
+        "receiver_id": notif.recipient_id,
+        "content": json.dumps({
+            "_notification": True,
+            "type": notif.type,
+            "label": notif.label,
+            "client_name": client_name,
+            "date": str(notif.activity_date) if notif.activity_date else None,
+        }),
+        "timestamp": notif.created_at,
+        "is_read": notif.is_read,
+    }
+
+
+async def migrate_message_notifications(session: AsyncSession, batch_size: int = 500) -> int:
+    """
+    Move notifications stored as JSON in `messages` (before the notifications
+    table existed) to `notifications`, keeping their time and read state.
+    Unread counters are unchanged: both tables count toward them.
+    """
+    migrated = 0
+    last_id = 0
+    while True:
+        result = await session.execute(
+            select(Message)
+            .where(Message.id > last_id, Message.content.like('%"_notification"%'))
+            .order_by(Message.id)
+            .limit(batch_size)
+        )
+        batch = result.scalars().all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        rows, moved_ids = [], []
+        for msg in batch:
+            try:
+                data = json.loads(msg.content)
+            except (json.JSONDecodeError, TypeError):
+                continue
+            if not isinstance(data, dict) or not data.get("_notification"):
+                continue
+            try:
+                activity_date = date.fromisoformat(data["date"]) if data.get("date") else None
+            except (TypeError, ValueError):
+                activity_date = None
+            rows.append({
+                "recipient_id": msg.receiver_id,
+                "sender_id": msg.sender_id,
+                "type": str(data.get("type") or "")[:50],
+                "label": str(data.get("label") or "")[:255],
+                "activity_date": activity_date,
+                "is_read": bool(msg.is_read),
+                "created_at": msg.timestamp,
+            })
+            moved_ids.append(msg.id)
+
+        if rows:
+            await session.execute(insert(Notification), rows)
+            await session.execute(delete(Message).where(Message.id.in_(moved_ids)))
+            await session.commit()
+            migrated += len(rows)
+
+    return migrated
+
+
 async def get_conversations(session: AsyncSession, user_id: int):
     clients_req = await session.execute(
         select(Users).where(Users.coach_id == user_id)
     )
     clients = clients_req.scalars().all()
 
+    unread_req = await session.execute(
+        select(UnreadCounter.sender_id, UnreadCounter.count).where(UnreadCounter.receiver_id == user_id)
+    )
+    unread_by_sender = dict(unread_req.all())
+
     conversations = []
 
     for client in clients:
@@ -2116,33 +3884,29 @@ async def get_conversations(session: AsyncSession, user_id: int):
         )
         last_msg = last_msg_req.scalars().first()
 
-        # Parse notification messages for display
+        last_notif_req = await session.execute(
+            select(Notification)
+            .where(Notification.recipient_id == user_id, Notification.sender_id == client.id)
+            .order_by(desc(Notification.created_at))
+            .limit(1)
+        )
+        last_notif = last_notif_req.scalars().first()
+
         display_msg = "No messages yet"
+        last_time = None
         if last_msg:
-            try:
-                data = json.loads(last_msg.content)
-                if data.get("_notification"):
-                    labels = {"meal_created": "New Meal", "meal_updated": "Meal Updated", "workout_updated": "Workout Updated", "profile_updated": "Profile Updated"}
-                    display_msg = f"{labels.get(data.get('type', ''), 'Update')}: {data.get('label', '')}"
-                else:
-                    display_msg = last_msg.content
-            except (json.JSONDecodeError, TypeError):
-                display_msg = last_msg.content
-
-        # Count unread messages from this client
-        unread_req = await session.execute(
-            select(func.count(Message.id))
-            .where(Message.sender_id == client.id, Message.receiver_id == user_id, Message.is_read == False)
-        )
-        unread = unread_req.scalar() or 0
+            display_msg, last_time = last_msg.content, last_msg.timestamp
+        if last_notif and (last_time is None or last_notif.created_at >= last_time):
+            display_msg = f"{NOTIFICATION_LABELS.get(last_notif.type, 'Update')}: {last_notif.label}"
+            last_time = last_notif.created_at
 
         conversations.append({
             "client_id": client.id,
             "client_firstname": client.firstname,
             "client_lastname": client.lastname,
             "last_message": display_msg,
-            "last_message_time": last_msg.timestamp if last_msg else None,
-            "unread_count": unread,
+            "last_message_time": last_time,
+            "unread_count": unread_by_sender.get(client.id, 0),
         })
 
     conversations.sort(key=lambda x: x["last_message_time"] or datetime.min, reverse=True)
@@ -2160,7 +3924,30 @@ async def get_chat_history(session: AsyncSession, current_user_id: int, other_us
         )
         .order_by(Message.timestamp.asc())
     )
-    return req.scalars().all()
+    messages = req.scalars().all()
+
+    notif_req = await session.execute(
+        select(Notification, Users.firstname, Users.lastname)
+        .join(Users, Users.id == Notification.sender_id)
+        .where(
+            or_(
+                and_(Notification.sender_id == current_user_id, Notification.recipient_id == other_user_id),
+                and_(Notification.sender_id == other_user_id, Notification.recipient_id == current_user_id)
+            )
+        )
+        .order_by(Notification.created_at.asc())
+    )
+    notifications = [
+        _notification_as_message(notif, f"{firstname} {lastname}")
+        for notif, firstname, lastname in notif_req.all()
+    ]
+    if not notifications:
+        return messages
+
+    return sorted(
+        [*messages, *notifications],
+        key=lambda m: (m["timestamp"] if isinstance(m, dict) else m.timestamp) or datetime.min,
+    )
 
 
 async def send_message(session: AsyncSession, current_user_id: int, message_data: MessageCreate):
@@ -2170,11 +3957,62 @@ async def send_message(session: AsyncSession, current_user_id: int, message_data
         content=message_data.content
     )
     session.add(new_msg)
+    await _bump_unread(session, message_data.receiver_id, current_user_id, 1)
     await session.commit()
     await session.refresh(new_msg)
     return new_msg
 
 
+async def broadcast_message(session: AsyncSession, coach_id: int, broadcast: MessageBroadcast):
+    """
+    Send the same message to many clients: one multi-row insert for the
+    messages, one UPDATE for the existing unread counters and one insert for the
+    missing ones, whatever the roster size.
+    """
+    coach = (await session.execute(select(Users.role).where(Users.id == coach_id))).scalar()
+    if coach != "coach":
+        raise HTTPException(status_code=403, detail="Only coaches can broadcast messages.")
+
+    query = select(Users.id).where(Users.coach_id == coach_id)
+    if broadcast.client_ids is not None:
+        query = query.where(Users.id.in_(broadcast.client_ids))
+    if broadcast.goal:
+        query = query.where(Users.goal == broadcast.goal)
+    client_ids = (await session.execute(query.order_by(Users.id))).scalars().all()
+    if not client_ids:
+        return {"sent": 0, "client_ids": []}
+
+    await session.execute(insert(Message), [
+        {"sender_id": coach_id, "receiver_id": client_id, "content": broadcast.content}
+        for client_id in client_ids
+    ])
+
+    counted = set((await session.execute(
+        select(UnreadCounter.receiver_id)
+        .where(UnreadCounter.sender_id == coach_id, UnreadCounter.receiver_id.in_(client_ids))
+    )).scalars().all())
+    if counted:
+        await session.execute(
+            update(UnreadCounter)
+            .where(UnreadCounter.sender_id == coach_id, UnreadCounter.receiver_id.in_(counted))
+            .values(count=UnreadCounter.count + 1)
+        )
+    missing = [client_id for client_id in client_ids if client_id not in counted]
+    if missing:
+        try:
+            async with session.begin_nested():
+                await session.execute(insert(UnreadCounter), [
+                    {"receiver_id": client_id, "sender_id": coach_id, "count": 1} for client_id in missing
+                ])
+        except IntegrityError:
+            # some rows were created concurrently: fall back to one upsert per client
+            for client_id in missing:
+                await _bump_unread(session, client_id, coach_id, 1)
+
+    await session.commit()
+    return {"sent": len(client_ids), "client_ids": client_ids}
+
+
 async def get_coach_needs_attention(session: AsyncSession, coach_id: int):
     pending_invites_req = await session.execute(
         select(func.count(CoachInvitation.id))
@@ -2187,16 +4025,7 @@ async def get_coach_needs_attention(session: AsyncSession, coach_id: int):
     )
     pending_invites_count = pending_invites_req.scalar() or 0
 
-    unread_messages_req = await session.execute(
-        select(func.count(Message.id))
-        .where(
-            and_(
-                Message.receiver_id == coach_id,
-                Message.is_read == False
-            )
-        )
-    )
-    unread_messages_count = unread_messages_req.scalar() or 0
+    unread_messages_count = await _unread_total(session, coach_id)
 
     return {
         "pending_invitations": pending_invites_count,
@@ -2206,16 +4035,7 @@ async def get_coach_needs_attention(session: AsyncSession, coach_id: int):
 
 
 async def get_unread_message_count(session: AsyncSession, user_id: int):
-    result = await session.execute(
-        select(func.count(Message.id))
-        .where(
-            and_(
-                Message.receiver_id == user_id,
-                Message.is_read == False
-            )
-        )
-    )
-    return {"unread_count": result.scalar() or 0}
+    return {"unread_count": await _unread_total(session, user_id)}
 
 
 async def mark_messages_read(session: AsyncSession, current_user_id: int, other_user_id: int):
@@ -2230,7 +4050,17 @@ async def mark_messages_read(session: AsyncSession, current_user_id: int, other_
         )
         .values(is_read=True)
     )
-    await session.execute(stmt)
+    result = await session.execute(stmt)
+    notif_result = await session.execute(
+        update(Notification)
+        .where(
+            Notification.sender_id == other_user_id,
+            Notification.recipient_id == current_user_id,
+            Notification.is_read == False
+        )
+        .values(is_read=True)
+    )
+    await _bump_unread(session, current_user_id, other_user_id, -(result.rowcount + notif_result.rowcount))
     await session.commit()
     return {"message": "Messages marqués comme lus"}
 
@@ -2242,18 +4072,15 @@ async def notify_coach(session: AsyncSession, client_id: int, notification):
     if not client or not client.coach_id:
         raise HTTPException(status_code=400, detail="No coach assigned")
 
-    content = json.dumps({
-        "_notification": True,
-        "type": notification.type,
-        "label": notification.label,
-        "client_name": f"{client.firstname} {client.lastname}",
-        "date": str(date.today()),
-    })
-
-    msg = Message(sender_id=client_id, receiver_id=client.coach_id, content=content)
-    session.add(msg)
+    session.add(Notification(
+        recipient_id=client.coach_id,
+        sender_id=client_id,
+        type=notification.type,
+        label=notification.label,
+        activity_date=date.today(),
+    ))
+    await _bump_unread(session, client.coach_id, client_id, 1)
     await session.commit()
-    await session.refresh(msg)
     return {"message": "Coach notified"}
 
 
@@ -2279,6 +4106,17 @@ def _forum_row_to_dict(forum, author, msg_count: int, is_fav: bool) -> dict:
     }
 
 
+async def _coach_post_totals(session: AsyncSession, *where) -> dict[int, dict]:
+    """coach_id -> {"forum_posts": n} for the messages matching `where`, read before deleting them."""
+    rows = await session.execute(
+        select(ForumMessage.user_id, func.count(ForumMessage.id))
+        .join(Users, ForumMessage.user_id == Users.id)
+        .where(Users.role == "coach", *where)
+        .group_by(ForumMessage.user_id)
+    )
+    return {coach_id: {"forum_posts": posts} for coach_id, posts in rows.all()}
+
+
 async def _count_messages(session: AsyncSession, forum_id: int) -> int:
     res = await session.execute(
         select(func.count(ForumMessage.id)).where(ForumMessage.forum_id == forum_id)
@@ -2286,6 +4124,182 @@ async def _count_messages(session: AsyncSession, forum_id: int) -> int:
     return res.scalar() or 0
 
 
+async def _forum_counts_and_favorites(session: AsyncSession, user_id: int, forum_ids: list[int]) -> tuple[dict, set]:
+    """Message counts and the user's favorites for a page of forums, in two grouped queries."""
+    if not forum_ids:
+        return {}, set()
+    count_res = await session.execute(
+        select(ForumMessage.forum_id, func.count(ForumMessage.id))
+        .where(ForumMessage.forum_id.in_(forum_ids))
+        .group_by(ForumMessage.forum_id)
+    )
+    fav_res = await session.execute(
+        select(ForumFavorite.forum_id)
+        .where(ForumFavorite.user_id == user_id, ForumFavorite.forum_id.in_(forum_ids))
+    )
+    return dict(count_res.all()), set(fav_res.scalars().all())
+
+
+FORUM_MESSAGES_PAGE_SIZE = 50
+FORUM_SEARCH_PAGE_SIZE = 15
+
+
+def _forum_text_rows(forum: Forum) -> list[dict]:
+    terms = weighted_terms((forum.title, TITLE_WEIGHT), (forum.description, DESCRIPTION_WEIGHT))
+    return [
+        {"term": term, "forum_id": forum.id, "message_id": None, "weight": weight}
+        for term, weight in terms.items()
+    ]
+
+
+def _forum_message_rows(msg: ForumMessage) -> list[dict]:
+    terms = weighted_terms((msg.content, MESSAGE_WEIGHT))
+    return [
+        {"term": term, "forum_id": msg.forum_id, "message_id": msg.id, "weight": weight}
+        for term, weight in terms.items()
+    ]
+
+
+async def _index_forum_text(session: AsyncSession, forum: Forum):
+    """(Re)index a forum's title and description; its messages' rows are left alone."""
+    await session.execute(
+        delete(ForumSearchTerm).where(ForumSearchTerm.forum_id == forum.id, ForumSearchTerm.message_id.is_(None))
+    )
+    rows = _forum_text_rows(forum)
+    if rows:
+        await session.execute(insert(ForumSearchTerm), rows)
+
+
+async def _index_forum_message(session: AsyncSession, msg: ForumMessage):
+    rows = _forum_message_rows(msg)
+    if rows:
+        await session.execute(insert(ForumSearchTerm), rows)
+
+
+async def backfill_forum_search_index(session: AsyncSession, batch_size: int = 500) -> int:
+    """
+    Index the forums and messages that have no search terms yet, one insert per
+    page. Returns how many of them got terms (text made only of stop words
+    gets none).
+    """
+    indexed = 0
+    for model, rows_for, has_terms in (
+        (Forum, _forum_text_rows,
+         select(ForumSearchTerm.id).where(ForumSearchTerm.forum_id == Forum.id, ForumSearchTerm.message_id.is_(None))),
+        (ForumMessage, _forum_message_rows,
+         select(ForumSearchTerm.id).where(ForumSearchTerm.message_id == ForumMessage.id)),
+    ):
+        last_id = 0
+        while True:
+            batch = (await session.execute(
+                select(model).where(model.id > last_id, ~has_terms.exists()).order_by(model.id).limit(batch_size)
+            )).scalars().all()
+            if not batch:
+                break
+            last_id = batch[-1].id
+            rows = [row for item in batch for row in rows_for(item)]
+            if rows:
+                await session.execute(insert(ForumSearchTerm), rows)
+            await session.commit()
+            indexed += len({(row["forum_id"], row["message_id"]) for row in rows})
+    return indexed
+
+
+async def search_forums(session: AsyncSession, user_id: int, q: str, page: int = 1, page_size: int = FORUM_SEARCH_PAGE_SIZE):
+    """
+    Forums matching the query, public ones plus the user's own. Ranked by the
+    number of distinct query terms matched, then by the summed term weights
+    (title > description > messages), then by recent activity. Each result
+    carries a snippet from its best matching message, or from its description.
+    """
+    terms = query_terms(q)
+    if not terms:
+        return JSONResponse(status_code=200, content={
+            "query": q, "terms": [], "results": [], "page": page, "page_size": page_size, "has_more": False,
+        })
+
+    matched = func.count(func.distinct(ForumSearchTerm.term)).label("matched")
+    score = func.sum(ForumSearchTerm.weight).label("score")
+    ranked = (await session.execute(
+        select(ForumSearchTerm.forum_id, matched, score)
+        .join(Forum, Forum.id == ForumSearchTerm.forum_id)
+        .where(
+            ForumSearchTerm.term.in_(terms),
+            or_(Forum.status == 'public', Forum.user_id == user_id),
+        )
+        .group_by(ForumSearchTerm.forum_id, Forum.last_activity_at)
+        .order_by(desc(matched), desc(score), desc(Forum.last_activity_at), desc(ForumSearchTerm.forum_id))
+        .offset((page - 1) * page_size)
+        .limit(page_size + 1)
+    )).all()
+    has_more = len(ranked) > page_size
+    ranked = ranked[:page_size]
+    forum_ids = [row.forum_id for row in ranked]
+
+    forums = {}
+    if forum_ids:
+        rows = await session.execute(
+            select(Forum, Users).join(Users, Forum.user_id == Users.id).where(Forum.id.in_(forum_ids))
+        )
+        forums = {forum.id: (forum, author) for forum, author in rows.all()}
+
+    # Best matching message per forum, for the snippet
+    best_message: dict[int, int] = {}
+    if forum_ids:
+        msg_scores = await session.execute(
+            select(ForumSearchTerm.forum_id, ForumSearchTerm.message_id, func.sum(ForumSearchTerm.weight).label("score"))
+            .where(
+                ForumSearchTerm.forum_id.in_(forum_ids),
+                ForumSearchTerm.message_id.is_not(None),
+                ForumSearchTerm.term.in_(terms),
+            )
+            .group_by(ForumSearchTerm.forum_id, ForumSearchTerm.message_id)
+            .order_by(desc("score"), desc(ForumSearchTerm.message_id))
+        )
+        for forum_id, message_id, _ in msg_scores.all():
+            best_message.setdefault(forum_id, message_id)
+
+    message_texts = {}
+    if best_message:
+        msg_rows = await session.execute(
+            select(ForumMessage.id, ForumMessage.content).where(ForumMessage.id.in_(best_message.values()))
+        )
+        message_texts = dict(msg_rows.all())
+
+    counts, favorites = await _forum_counts_and_favorites(session, user_id, forum_ids)
+
+    results = []
+    for row in ranked:
+        if row.forum_id not in forums:
+            continue
+        forum, author = forums[row.forum_id]
+        message_id = best_message.get(forum.id)
+        if forum.description and set(tokenize(forum.description)).intersection(terms):
+            snippet_source, snippet_text = "description", forum.description
+        elif message_id:
+            snippet_source, snippet_text = "message", message_texts.get(message_id, "")
+        else:
+            snippet_source, snippet_text = "title", forum.description or forum.title
+
+        results.append({
+            **_forum_row_to_dict(forum, author, counts.get(forum.id, 0), forum.id in favorites),
+            "score": int(row.score),
+            "matched_terms": row.matched,
+            "snippet": make_snippet(snippet_text, terms),
+            "snippet_source": snippet_source,
+            "message_id": message_id,
+        })
+
+    return JSONResponse(status_code=200, content={
+        "query": q,
+        "terms": terms,
+        "results": results,
+        "page": page,
+        "page_size": page_size,
+        "has_more": has_more,
+    })
+
+
 async def _is_favorited(session: AsyncSession, user_id: int, forum_id: int) -> bool:
     res = await session.execute(
         select(ForumFavorite).where(
@@ -2306,6 +4320,9 @@ async def create_forum(session: AsyncSession, user_id: int, forum_data: ForumCre
         last_activity_at=datetime.utcnow(),
     )
     session.add(forum)
+    await session.flush()
+    await _index_forum_text(session, forum)
+    await _bump_versions(session, "forums")
     await session.commit()
     await session.refresh(forum)
 
@@ -2313,50 +4330,66 @@ async def create_forum(session: AsyncSession, user_id: int, forum_data: ForumCre
     return JSONResponse(status_code=201, content=_forum_row_to_dict(forum, author, 0, False))
 
 
-async def get_public_forums(session: AsyncSession, user_id: int, page: int = 1, page_size: int = 15, topic: str | None = None, sort: str = "recent"):
-    offset = (page - 1) * page_size
-
+async def get_public_forums(session: AsyncSession, user_id: int, page: int = 1, page_size: int = 15, topic: str | None = None, sort: str = "recent", cursor: str | None = None):
+    """
+    Keyset-paginated public forums: pass the previous page's `next_cursor` as
+    `cursor`. `page` without a cursor is still accepted for older app builds
+    (offset). No COUNT is run, so `total_pages` only tells whether a next page
+    exists (page + 1 when there is one).
+    """
     filters = [Forum.status == 'public']
     if topic:
         filters.append(Forum.topic == topic)
 
-    total_res = await session.execute(
-        select(func.count(Forum.id)).where(*filters)
-    )
-    total = total_res.scalar() or 0
-
-    order = desc(Forum.last_activity_at)
     if sort == "oldest":
-        order = asc(Forum.created_at)
-    elif sort == "popular":
-        order = desc(Forum.last_activity_at)
+        sort_column, descending = Forum.created_at, False
+    else:  # "recent", "popular"
+        sort_column, descending = Forum.last_activity_at, True
+    direction = desc if descending else asc
 
-    result = await session.execute(
+    query = (
         select(Forum, Users)
         .join(Users, Forum.user_id == Users.id)
         .where(*filters)
-        .order_by(order)
-        .offset(offset)
-        .limit(page_size)
+        .order_by(direction(sort_column), direction(Forum.id))
     )
-    rows = result.all()
+    if cursor:
+        query = query.where(_keyset_clause(sort_column, Forum.id, cursor, descending))
+    elif page > 1:
+        query = query.offset((page - 1) * page_size)
+
+    rows = (await session.execute(query.limit(page_size + 1))).all()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    counts, favorites = await _forum_counts_and_favorites(session, user_id, [forum.id for forum, _ in rows])
+    forums = [
+        _forum_row_to_dict(forum, author, counts.get(forum.id, 0), forum.id in favorites)
+        for forum, author in rows
+    ]
 
-    forums = []
-    for forum, author in rows:
-        msg_count = await _count_messages(session, forum.id)
-        is_fav = await _is_favorited(session, user_id, forum.id)
-        forums.append(_forum_row_to_dict(forum, author, msg_count, is_fav))
+    next_cursor = None
+    if has_more:
+        last_forum = rows[-1][0]
+        next_cursor = _encode_cursor(getattr(last_forum, sort_column.key), last_forum.id)
 
     return JSONResponse(status_code=200, content={
         "forums": forums,
-        "total": total,
         "page": page,
         "page_size": page_size,
-        "total_pages": math.ceil(total / page_size) if total > 0 else 1,
+        "has_more": has_more,
+        "next_cursor": next_cursor,
+        "total_pages": page + 1 if has_more else page,
     })
 
 
-async def get_forum_with_messages(session: AsyncSession, forum_id: int, user_id: int):
+async def get_forum_with_messages(session: AsyncSession, forum_id: int, user_id: int, before: str | None = None,
+                                  after: str | None = None, limit: int = FORUM_MESSAGES_PAGE_SIZE):
+    """
+    A forum and one page of its messages, oldest first. Without a cursor the page
+    holds the latest `limit` messages; `before=older_cursor` loads the previous
+    page and `after=newer_cursor` the messages posted since (live threads).
+    """
     res = await session.execute(
         select(Forum, Users)
         .join(Users, Forum.user_id == Users.id)
@@ -2372,14 +4405,34 @@ async def get_forum_with_messages(session: AsyncSession, forum_id: int, user_id:
 
     is_fav = await _is_favorited(session, user_id, forum_id)
 
-    msg_res = await session.execute(
+    query = (
         select(ForumMessage, Users)
         .join(Users, ForumMessage.user_id == Users.id)
         .where(ForumMessage.forum_id == forum_id)
-        .order_by(asc(ForumMessage.created_at))
     )
+    if after:
+        query = (
+            query.where(_keyset_clause(ForumMessage.created_at, ForumMessage.id, after, descending=False))
+            .order_by(asc(ForumMessage.created_at), asc(ForumMessage.id))
+        )
+    else:
+        if before:
+            query = query.where(_keyset_clause(ForumMessage.created_at, ForumMessage.id, before, descending=True))
+        query = query.order_by(desc(ForumMessage.created_at), desc(ForumMessage.id))
+
+    rows = (await session.execute(query.limit(limit + 1))).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not after:
+        rows.reverse()
+
+    older_cursor = None
+    if has_more and not after:
+        older_cursor = _encode_cursor(rows[0][0].created_at, rows[0][0].id)
+    newer_cursor = _encode_cursor(rows[-1][0].created_at, rows[-1][0].id) if rows else after
+
     messages = []
-    for msg, msg_author in msg_res.all():
+    for msg, msg_author in rows:
         messages.append({
             "id": msg.id,
             "forum_id": msg.forum_id,
@@ -2405,6 +4458,10 @@ async def get_forum_with_messages(session: AsyncSession, forum_id: int, user_id:
         "author_role": author.role,
         "is_favorite": is_fav,
         "messages": messages,
+        "older_cursor": older_cursor,
+        "newer_cursor": newer_cursor,
+        "has_older": older_cursor is not None,
+        "has_newer": bool(after) and has_more,
     })
 
 
@@ -2416,13 +4473,17 @@ async def post_forum_message(session: AsyncSession, forum_id: int, user_id: int,
     if forum.status != 'public' and forum.user_id != user_id:
         raise HTTPException(status_code=403, detail="This forum is not public")
 
+    author = await session.get(Users, user_id)
     msg = ForumMessage(forum_id=forum_id, user_id=user_id, content=message_data.content)
     session.add(msg)
+    await session.flush()
+    await _index_forum_message(session, msg)
     forum.last_activity_at = datetime.utcnow()
+    if author.role == "coach":
+        await _bump_coach_stats(session, user_id, forum_posts=1)
+    await _bump_versions(session, "forums")
     await session.commit()
     await session.refresh(msg)
-
-    author = await session.get(Users, user_id)
     return JSONResponse(status_code=201, content={
         "id": msg.id,
         "forum_id": msg.forum_id,
@@ -2443,6 +4504,7 @@ async def toggle_forum_favorite(session: AsyncSession, user_id: int, forum_id: i
         )
     )
     existing = res.scalars().first()
+    await _bump_versions(session, "forum_favorites", [user_id])
     if existing:
         await session.delete(existing)
         await session.commit()
@@ -2547,6 +4609,9 @@ async def update_forum(session: AsyncSession, forum_id: int, user_id: int, updat
     if update_data.status is not None:
         forum.status = update_data.status
 
+    if update_data.title is not None or update_data.description is not None:
+        await _index_forum_text(session, forum)
+    await _bump_versions(session, "forums")
     await session.commit()
     return JSONResponse(status_code=200, content={"message": "Forum updated successfully"})
 
@@ -2559,7 +4624,12 @@ async def delete_forum(session: AsyncSession, forum_id: int, user_id: int):
     if forum.user_id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this forum")
 
+    await session.execute(delete(ForumSearchTerm).where(ForumSearchTerm.forum_id == forum_id))
+    coach_posts = await _coach_post_totals(session, ForumMessage.forum_id == forum_id)
     await session.delete(forum)
+    await session.flush()
+    await _subtract_coach_stats(session, coach_posts)
+    await _bump_versions(session, "forums")
     await session.commit()
     return JSONResponse(status_code=200, content={"message": "Forum deleted successfully"})
 
@@ -2581,7 +4651,12 @@ async def delete_forum_message(session: AsyncSession, forum_id: int, message_id:
     if user_id != forum.user_id and user_id != msg.user_id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this message")
 
+    await session.execute(delete(ForumSearchTerm).where(ForumSearchTerm.message_id == message_id))
+    coach_posts = await _coach_post_totals(session, ForumMessage.id == message_id)
     await session.delete(msg)
+    await session.flush()
+    await _subtract_coach_stats(session, coach_posts)
+    await _bump_versions(session, "forums")
     await session.commit()
     return JSONResponse(status_code=200, content={"message": "Message deleted successfully"})
 
@@ -2591,8 +4666,17 @@ async def cleanup_inactive_forums(session: AsyncSession) -> int:
     res = await session.execute(select(Forum).where(Forum.last_activity_at < cutoff))
     inactive = res.scalars().all()
     count = len(inactive)
+    coach_posts = {}
+    if inactive:
+        inactive_ids = [forum.id for forum in inactive]
+        await session.execute(delete(ForumSearchTerm).where(ForumSearchTerm.forum_id.in_(inactive_ids)))
+        coach_posts = await _coach_post_totals(session, ForumMessage.forum_id.in_(inactive_ids))
     for forum in inactive:
         await session.delete(forum)
+    if inactive:
+        await session.flush()
+        await _subtract_coach_stats(session, coach_posts)
+        await _bump_versions(session, "forums")
     await session.commit()
     return count
 
@@ -2624,6 +4708,420 @@ async def get_user_public_profile(session: AsyncSession, user_id: int):
     })
 
 
+# ---------------------------------------------------------------------------
+# Sync (offline mutation batches, change feed)
+# ---------------------------------------------------------------------------
+
+SYNC_PULL_LIMIT = 500
+# Change log / applied mutation ids older than this are pruned; an app whose
+# cursor is older has to reload everything (reset=True)
+SYNC_RETENTION_DAYS = 30
+
+# /sync "update" may only set these meal columns (app names are mapped by _meal_update_values)
+SYNC_MEAL_FIELDS = {
+    "name", "description", "total_calories", "total_proteins", "total_carbohydrates", "total_sugars",
+    "total_lipids", "total_saturated_fats", "total_fiber", "total_salt", "aliments", "meal_type",
+    "hourtime", "is_consumed",
+}
+
+
+async def _log_changes(session: AsyncSession, entity: str, pairs, op: str = "upsert"):
+    """Append (user_id, entity_id) writes to the change feed, in the caller's transaction."""
+    rows = [{"user_id": user_id, "entity": entity, "entity_id": entity_id, "op": op} for user_id, entity_id in pairs]
+    if rows:
+        await session.execute(insert(ChangeLog), rows)
+        await _bump_versions(session, f"{entity}s", {row["user_id"] for row in rows})
+
+
+async def _latest_change_id(session: AsyncSession, user_id: int) -> int:
+    return (await session.execute(
+        select(func.max(ChangeLog.id)).where(ChangeLog.user_id == user_id)
+    )).scalar() or 0
+
+
+async def _sync_target(session: AsyncSession, model, user_id: int, mutation: SyncMutationIn):
+    """Row a mutation targets, by server id or by the app's client_uuid; None if it does not exist."""
+    if mutation.id is not None:
+        clause = model.id == mutation.id
+    elif mutation.client_uuid:
+        clause = model.client_uuid == mutation.client_uuid
+    else:
+        raise HTTPException(status_code=422, detail="'id' or 'client_uuid' is required")
+    result = await session.execute(select(model).where(model.user_id == user_id, clause))
+    return result.scalars().first()
+
+
+async def _sync_meal(session: AsyncSession, user_id: int, mutation: SyncMutationIn) -> int | None:
+    if mutation.op == "create":
+        if mutation.client_uuid:
+            existing = await _sync_target(session, Meal, user_id, mutation)
+            if existing:
+                return existing.id
+        try:
+            meal = _meal_from_data(user_id, mutation.data)
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            raise HTTPException(status_code=422, detail=f"Invalid meal: {e}")
+        meal.client_uuid = mutation.client_uuid
+        session.add(meal)
+        await session.flush()
+        await _replace_meal_items(session, meal.id, user_id, mutation.data.get('aliments'))
+        await _log_changes(session, "meal", [(user_id, meal.id)])
+        return meal.id
+
+    meal = await _sync_target(session, Meal, user_id, mutation)
+    if meal is None:
+        if mutation.op == "delete":
+            return None  # already gone
+        raise HTTPException(status_code=404, detail="Meal not found")
+
+    if mutation.op == "update":
+        try:
+            values = _meal_update_values(mutation.data)
+        except (TypeError, ValueError) as e:
+            raise HTTPException(status_code=422, detail=f"Invalid meal: {e}")
+        unknown = set(values) - SYNC_MEAL_FIELDS
+        if unknown:
+            raise HTTPException(status_code=422, detail=f"Cannot update: {', '.join(sorted(unknown))}")
+        _set_fields(meal, values)
+        if 'aliments' in values:
+            await _replace_meal_items(session, meal.id, user_id, mutation.data.get('aliments'))
+    elif mutation.op == "toggle_consume":
+        # An explicit target state keeps a replayed offline toggle from flipping back
+        meal.is_consumed = bool(mutation.data.get("is_consumed", not meal.is_consumed))
+    elif mutation.op == "delete":
+        await session.execute(delete(MealItem).where(MealItem.meal_id == meal.id))
+        await _log_changes(session, "meal", [(user_id, meal.id)], op="delete")
+        await session.delete(meal)
+        return meal.id
+    else:
+        raise HTTPException(status_code=400, detail=f"'{mutation.op}' does not apply to meals")
+
+    await _log_changes(session, "meal", [(user_id, meal.id)])
+    return meal.id
+
+
+async def _sync_workout(session: AsyncSession, user_id: int, mutation: SyncMutationIn) -> int | None:
+    if mutation.op == "create":
+        if mutation.client_uuid:
+            existing = await _sync_target(session, Workout, user_id, mutation)
+            if existing:
+                return existing.id
+        try:
+            workout_data = WorkoutCreate.model_validate(mutation.data)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=f"Invalid workout: {e.errors()[0]['msg']}")
+        workout = await _add_workout(session, user_id, workout_data, client_uuid=mutation.client_uuid)
+        return workout.id
+
+    workout = await _sync_target(session, Workout, user_id, mutation)
+    if workout is None:
+        if mutation.op == "delete":
+            return None  # already gone
+        raise HTTPException(status_code=404, detail="Workout not found")
+
+    if mutation.op == "update":
+        try:
+            patch = WorkoutPatch.model_validate(mutation.data)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=f"Invalid workout: {e.errors()[0]['msg']}")
+        await update_full_workout(session, workout.id, workout_patch_payload(patch), partial=True, commit=False)
+    elif mutation.op == "toggle_complete":
+        target = mutation.data.get("is_completed")
+        if target is None or bool(target) != bool(workout.is_completed):
+            await toggle_workout_complete(session, workout.id, user_id, rating_data=mutation.data.get("rating"),
+                                          commit=False)
+    elif mutation.op == "delete":
+        await delete_workout_for_user(session, workout.id, user_id, commit=False)
+    else:
+        raise HTTPException(status_code=400, detail=f"'{mutation.op}' does not apply to workouts")
+    return workout.id
+
+
+async def apply_sync_batch(session: AsyncSession, user_id: int, batch: SyncRequest):
+    """
+    Apply a batch of offline mutations in one transaction, in order. Each
+    mutation runs in a savepoint: a failing one is reported and skipped, the
+    others are kept. Mutation ids already applied (batch re-sent after a lost
+    response) are reported as duplicates and not applied again. Returns the
+    per-mutation results and the change cursor to pull from.
+    """
+    mutation_ids = [m.mutation_id for m in batch.mutations]
+    applied = {
+        row.mutation_id: row.entity_id
+        for row in (await session.execute(
+            select(SyncMutation).where(SyncMutation.user_id == user_id, SyncMutation.mutation_id.in_(mutation_ids))
+        )).scalars().all()
+    } if mutation_ids else {}
+
+    results = []
+    for mutation in batch.mutations:
+        result = {"mutation_id": mutation.mutation_id, "entity": mutation.entity, "client_uuid": mutation.client_uuid}
+        if mutation.mutation_id in applied:
+            results.append({**result, "status": "duplicate", "id": applied[mutation.mutation_id]})
+            continue
+        try:
+            async with session.begin_nested():
+                apply = _sync_meal if mutation.entity == "meal" else _sync_workout
+                entity_id = await apply(session, user_id, mutation)
+                session.add(SyncMutation(user_id=user_id, mutation_id=mutation.mutation_id,
+                                         entity=mutation.entity, entity_id=entity_id))
+                await session.flush()
+        except HTTPException as e:
+            results.append({**result, "status": "error", "status_code": e.status_code, "error": e.detail})
+            continue
+        except IntegrityError:
+            results.append({**result, "status": "error", "status_code": 409, "error": "Conflicting write"})
+            continue
+        applied[mutation.mutation_id] = entity_id
+        results.append({**result, "status": "applied", "id": entity_id})
+
+    await session.commit()
+    return {"results": results, "cursor": await _latest_change_id(session, user_id)}
+
+
+async def get_sync_changes(session: AsyncSession, user_id: int, cursor: int = 0, limit: int = SYNC_PULL_LIMIT):
+    """
+    Meals and workouts written since `cursor` (by this device, another one, or
+    the coach), latest state only. `reset` means changes after the cursor may
+    have been pruned and the app must reload everything.
+    """
+    # Pruning removes the oldest ids first: a gap between the cursor and the
+    # oldest id left (or an emptied log) means changes were lost to the app
+    oldest = (await session.execute(select(func.min(ChangeLog.id)))).scalar()
+    if cursor and (oldest is None or cursor < oldest - 1):
+        return {"reset": True, "cursor": await _latest_change_id(session, user_id), "has_more": False,
+                "meals": [], "workouts": [], "deleted": {"meal": [], "workout": []}}
+
+    rows = (await session.execute(
+        select(ChangeLog.id, ChangeLog.entity, ChangeLog.entity_id, ChangeLog.op)
+        .where(ChangeLog.user_id == user_id, ChangeLog.id > cursor)
+        .order_by(ChangeLog.id)
+        .limit(limit + 1)
+    )).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    latest: dict[tuple[str, int], str] = {}
+    for row in rows:
+        latest[(row.entity, row.entity_id)] = row.op
+    upserted = {entity: [i for (e, i), op in latest.items() if e == entity and op == "upsert"] for entity in ("meal", "workout")}
+    deleted = {entity: [i for (e, i), op in latest.items() if e == entity and op == "delete"] for entity in ("meal", "workout")}
+
+    meals = []
+    if upserted["meal"]:
+        meals = (await session.execute(
+            select(Meal).where(Meal.user_id == user_id, Meal.id.in_(upserted["meal"])).order_by(Meal.id)
+        )).scalars().all()
+    workouts = []
+    if upserted["workout"]:
+        workouts = (await session.execute(
+            select(Workout)
+            .where(Workout.user_id == user_id, Workout.id.in_(upserted["workout"]))
+            .options(selectinload(Workout.exercises), selectinload(Workout.rating))
+            .order_by(Workout.id)
+        )).scalars().all()
+
+    # Deleted later than this page reaches: still report them as gone
+    deleted["meal"] += sorted(set(upserted["meal"]) - {m.id for m in meals})
+    deleted["workout"] += sorted(set(upserted["workout"]) - {w.id for w in workouts})
+
+    return {
+        "reset": False,
+        "cursor": rows[-1].id if rows else cursor,
+        "has_more": has_more,
+        "meals": [_meal_to_dict(meal) for meal in meals],
+        "workouts": [WorkoutRead.model_validate(w).model_dump(mode="json") for w in workouts],
+        "deleted": deleted,
+    }
+
+
+async def prune_sync_log(session: AsyncSession, days: int = SYNC_RETENTION_DAYS) -> int:
+    """Drop change log entries and applied mutation ids older than the retention period."""
+    cutoff = datetime.now() - timedelta(days=days)
+    result = await session.execute(delete(ChangeLog).where(ChangeLog.changed_at < cutoff))
+    await session.execute(delete(SyncMutation).where(SyncMutation.created_at < cutoff))
+    await session.commit()
+    return result.rowcount
+
+
+# ---------------------------------------------------------------------------
+# Response versions (conditional GET)
+# ---------------------------------------------------------------------------
+
+USER_VERSION_SCOPES = ("profile", "meals", "workouts", "forum_favorites")
+GLOBAL_VERSION_OWNER = 0   # owner of the app-wide scopes ("coaches", "forums")
+
+
+async def _bump_versions(session: AsyncSession, scope: str, owner_ids=(GLOBAL_VERSION_OWNER,)):
+    """+1 on the `scope` counter of each owner, inside the caller's transaction."""
+    owner_ids = set(owner_ids)
+    if not owner_ids:
+        return
+
+    existing = set((await session.execute(
+        select(EntityVersion.owner_id).where(EntityVersion.scope == scope, EntityVersion.owner_id.in_(owner_ids))
+    )).scalars().all())
+    if existing:
+        await session.execute(
+            update(EntityVersion)
+            .where(EntityVersion.scope == scope, EntityVersion.owner_id.in_(existing))
+            .values(version=EntityVersion.version + 1)
+        )
+    missing = owner_ids - existing
+    if missing:
+        try:
+            async with session.begin_nested():
+                await session.execute(insert(EntityVersion), [
+                    {"scope": scope, "owner_id": owner_id, "version": 1} for owner_id in missing
+                ])
+        except IntegrityError:
+            # created concurrently: bump those rows instead
+            await session.execute(
+                update(EntityVersion)
+                .where(EntityVersion.scope == scope, EntityVersion.owner_id.in_(missing))
+                .values(version=EntityVersion.version + 1)
+            )
+
+
+async def _version_etag(session: AsyncSession, keys: list[tuple[str, int]], *extra) -> str:
+    """ETag from the (scope, owner) counters plus whatever else shapes the body (params, today's date)."""
+    rows = (await session.execute(
+        select(EntityVersion.scope, EntityVersion.owner_id, EntityVersion.version).where(
+            EntityVersion.scope.in_({scope for scope, _ in keys}),
+            EntityVersion.owner_id.in_({owner_id for _, owner_id in keys}),
+        )
+    )).all()
+    versions = {(scope, owner_id): version for scope, owner_id, version in rows}
+    return _etag([[scope, owner_id, versions.get((scope, owner_id), 0)] for scope, owner_id in keys] + list(extra))
+
+
+async def dashboard_stats_etag(session: AsyncSession, user_id: int) -> str:
+    return await _version_etag(session, [("profile", user_id), ("meals", user_id)], "dashboard", date.today())
+
+
+async def user_workouts_etag(session: AsyncSession, user_id: int, date_from: date = None, date_to: date = None,
+                             include_scheduled: bool = False) -> str:
+    # today's date: the default window and the scheduled occurrences move with it
+    return await _version_etag(
+        session, [("workouts", user_id)], "my-workouts", date.today(), date_from, date_to, include_scheduled
+    )
+
+
+async def coach_directory_etag(session: AsyncSession, after_id: int = None, limit: int = COACH_DIRECTORY_PAGE_SIZE) -> str:
+    return await _version_etag(session, [("coaches", GLOBAL_VERSION_OWNER)], "coaches", after_id, limit)
+
+
+async def public_forums_etag(session: AsyncSession, user_id: int, *params) -> str:
+    return await _version_etag(
+        session, [("forums", GLOBAL_VERSION_OWNER), ("forum_favorites", user_id)], "forums", *params
+    )
+
+
+async def coach_home_summary_etag(session: AsyncSession, coach_id: int) -> str:
+    """
+    The summary reads the clients' profiles and workouts (counters) plus the
+    coach's inbox; the inbox is fingerprinted with a few indexed aggregates
+    rather than counters on every message / notification write path.
+    """
+    client_ids = (await session.execute(
+        select(Users.id).where(Users.coach_id == coach_id).order_by(Users.id)
+    )).scalars().all()
+    pending_requests = (await session.execute(
+        select(func.count(ClientCoachRequest.id))
+        .where(ClientCoachRequest.coach_id == coach_id, ClientCoachRequest.status == "pending")
+    )).scalar() or 0
+    last_notification, unread_notifications = (await session.execute(
+        select(func.max(Notification.id), func.coalesce(func.sum(case((Notification.is_read == False, 1), else_=0)), 0))
+        .where(Notification.recipient_id == coach_id)
+    )).one()
+    inbox = [await _unread_total(session, coach_id), pending_requests, last_notification, unread_notifications]
+
+    keys = [(scope, client_id) for client_id in client_ids for scope in ("profile", "workouts")]
+    return await _version_etag(session, keys, "home-summary", coach_id, date.today(), inbox)
+
+
+# ---------------------------------------------------------------------------
+# Home screen ("today" aggregate)
+# ---------------------------------------------------------------------------
+
+TODAY_SECTIONS = ("dashboard", "meals", "workouts", "calories_burned", "unread")
+
+
+def _etag(data) -> str:
+    digest = hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def parse_if_none_match(header: str | None) -> set[str]:
+    """ETags listed in an If-None-Match header (weak prefixes ignored)."""
+    if not header:
+        return set()
+    return {tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()}
+
+
+async def get_today_summary(session: AsyncSession, user_id: int, known_etags: set[str] = frozenset()):
+    """
+    Everything the home screen loads on open, from one user read and one query
+    per table: dashboard totals, today's meals, today's workouts (schedule
+    occurrences included), calories burned and unread messages.
+
+    Every section carries an ETag; a section whose ETag the app sent back
+    (If-None-Match) is returned as {"etag", "unchanged": true} without data.
+    """
+    user = await session.get(Users, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    today = date.today()
+    today_start = datetime.combine(today, datetime.min.time())
+    today_end = today_start + timedelta(days=1)
+
+    meals = (await session.execute(
+        select(Meal)
+        .where(Meal.user_id == user_id, Meal.hourtime >= today_start, Meal.hourtime < today_end)
+        .order_by(Meal.hourtime.asc())
+    )).scalars().all()
+
+    workouts = list((await session.execute(
+        select(Workout)
+        .where(Workout.user_id == user_id, Workout.scheduled_date >= today_start, Workout.scheduled_date < today_end)
+        .options(selectinload(Workout.exercises), selectinload(Workout.rating))
+        .order_by(Workout.scheduled_date.asc(), Workout.id.asc())
+    )).scalars().all())
+    completed = [w for w in workouts if w.is_completed]
+    workouts = sorted(workouts + await _virtual_workouts(session, [user_id], today, today),
+                      key=lambda w: _naive(w.scheduled_date))
+
+    sections = {
+        "dashboard": _dashboard_values(user, meals),
+        "meals": [_meal_to_dict(meal) for meal in meals],
+        "workouts": [
+            (WorkoutRead if w.id is not None else ScheduledOccurrenceRead)
+            .model_validate(w, from_attributes=True).model_dump(mode="json")
+            for w in workouts
+        ],
+        "calories_burned": _calories_burned_values(
+            user.weight or 70.0,
+            len(completed),
+            sum(w.exercise_count or 0 for w in completed),
+            sum(w.calories_ref or 0 for w in completed),
+        ),
+        "unread": {"unread_count": await _unread_total(session, user_id)},
+    }
+
+    payload = {"date": today.isoformat(), "sections": {}}
+    etags = []
+    for name in TODAY_SECTIONS:
+        etag = _etag([name, sections[name]])
+        etags.append(etag)
+        if etag in known_etags:
+            payload["sections"][name] = {"etag": etag, "unchanged": True}
+        else:
+            payload["sections"][name] = {"etag": etag, "data": sections[name]}
+    payload["etag"] = _etag(etags)
+    return payload
+
+
 # ---------------------------------------------------------------------------
 # RGPD — Account deletion (Right to Erasure)
 # ---------------------------------------------------------------------------
@@ -2641,7 +5139,13 @@ async def delete_user_account(session: AsyncSession, user_id: int):
     # 2. Delete injuries
     await session.execute(delete(UserInjury).where(UserInjury.user_id == user_id))
 
-    # 3. Delete meals
+    # 3. Delete meals (and the sync feed of meals / workouts)
+    await session.execute(delete(ChangeLog).where(ChangeLog.user_id == user_id))
+    await session.execute(delete(SyncMutation).where(SyncMutation.user_id == user_id))
+    await session.execute(delete(EntityVersion).where(
+        EntityVersion.owner_id == user_id, EntityVersion.scope.in_(USER_VERSION_SCOPES)
+    ))
+    await session.execute(delete(MealItem).where(MealItem.user_id == user_id))
     await session.execute(delete(Meal).where(Meal.user_id == user_id))
 
     # 4. Delete workout exercises (via workouts)
@@ -2649,7 +5153,10 @@ async def delete_user_account(session: AsyncSession, user_id: int):
         select(Workout.id).where(Workout.user_id == user_id)
     )
     workout_ids = [row[0] for row in workout_ids_result.all()]
+    await session.execute(delete(ExerciseProgress).where(ExerciseProgress.user_id == user_id))
+    await session.execute(delete(PersonalRecord).where(PersonalRecord.user_id == user_id))
     if workout_ids:
+        coach_totals = await _coach_workout_totals(session, workout_ids)
         await session.execute(
             delete(WorkoutRating).where(WorkoutRating.workout_id.in_(workout_ids))
         )
@@ -2657,6 +5164,8 @@ async def delete_user_account(session: AsyncSession, user_id: int):
             delete(WorkoutExercise).where(WorkoutExercise.workout_id.in_(workout_ids))
         )
         await session.execute(delete(Workout).where(Workout.user_id == user_id))
+        await _subtract_coach_stats(session, coach_totals)
+    await session.execute(delete(WorkoutSchedule).where(WorkoutSchedule.user_id == user_id))
 
     # 5. Delete trainings
     await session.execute(delete(Training).where(Training.user_id == user_id))
@@ -2665,6 +5174,12 @@ async def delete_user_account(session: AsyncSession, user_id: int):
     await session.execute(delete(Message).where(
         or_(Message.sender_id == user_id, Message.receiver_id == user_id)
     ))
+    await session.execute(delete(Notification).where(
+        or_(Notification.sender_id == user_id, Notification.recipient_id == user_id)
+    ))
+    await session.execute(delete(UnreadCounter).where(
+        or_(UnreadCounter.sender_id == user_id, UnreadCounter.receiver_id == user_id)
+    ))
 
     # 7. Delete coach invitations
     await session.execute(delete(CoachInvitation).where(
@@ -2679,21 +5194,43 @@ async def delete_user_account(session: AsyncSession, user_id: int):
     # 9. Delete forum favorites
     await session.execute(delete(ForumFavorite).where(ForumFavorite.user_id == user_id))
 
-    # 10. Delete forum messages
+    # 10. Delete forum messages (and their search index rows)
+    await session.execute(delete(ForumSearchTerm).where(
+        or_(
+            ForumSearchTerm.message_id.in_(select(ForumMessage.id).where(ForumMessage.user_id == user_id)),
+            ForumSearchTerm.forum_id.in_(select(Forum.id).where(Forum.user_id == user_id)),
+        )
+    ))
     await session.execute(delete(ForumMessage).where(ForumMessage.user_id == user_id))
 
     # 11. Delete forums created by user
     await session.execute(delete(Forum).where(Forum.user_id == user_id))
 
-    # 12. Unlink clients if user is a coach
+    # 12. Unlink clients and authored workouts if user is a coach, drop their stats
     if user.role == "coach":
         await session.execute(
             update(Users).where(Users.coach_id == user_id).values(coach_id=None)
         )
+        await session.execute(
+            update(Workout).where(Workout.coach_id == user_id).values(coach_id=None)
+        )
+        await session.execute(
+            update(WorkoutSchedule).where(WorkoutSchedule.coach_id == user_id).values(coach_id=None)
+        )
+        await session.execute(delete(CoachStats).where(CoachStats.coach_id == user_id))
+        await session.execute(delete(CoachTemplate).where(CoachTemplate.coach_id == user_id))
 
     # 13. Delete the user
+    former_coach_id = user.coach_id
     await session.delete(user)
+    if former_coach_id is not None:
+        await _bump_coach_stats(session, former_coach_id, active_clients=-1)
+    await _bump_versions(session, "forums")
+    if user.role == "coach":
+        await _bump_versions(session, "coaches")
     await session.commit()
+    if user.role == "coach":
+        invalidate_coach_directory()
 
     return JSONResponse(status_code=200, content={"detail": "Account and all associated data permanently deleted"})
 
@@ -2800,6 +5337,18 @@ async def export_user_data(session: AsyncSession, user_id: int):
         "is_read": dm.is_read,
     } for dm in dm_result.scalars().all()]
 
+    # Coach notifications
+    notif_result = await session.execute(select(Notification).where(
+        or_(Notification.sender_id == user_id, Notification.recipient_id == user_id)
+    ))
+    notifications = [{
+        "sender_id": n.sender_id, "recipient_id": n.recipient_id,
+        "type": n.type, "label": n.label,
+        "date": str(n.activity_date) if n.activity_date else None,
+        "created_at": n.created_at.isoformat() if n.created_at else None,
+        "is_read": n.is_read,
+    } for n in notif_result.scalars().all()]
+
     return JSONResponse(status_code=200, content={
         "export_date": datetime.utcnow().isoformat(),
         "format_version": "1.0",
@@ -2810,6 +5359,7 @@ async def export_user_data(session: AsyncSession, user_id: int):
         "ai_chat_history": chat_messages,
         "forum_posts": forum_posts,
         "direct_messages": direct_messages,
+        "notifications": notifications,
     })
 
 
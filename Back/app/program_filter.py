@@ -0,0 +1,269 @@
+"""
+Deterministic exercise filtering for AI workout programs.
+
+Drops the exercises that cannot fit a day (wrong focus) or that the injury
+protocol already forbids, so the LLM only sees real candidates. The same rules
+power `generate_rule_based_program`, a non-LLM generator used as a fallback
+when the AI provider is slow or down.
+"""
+
+from collections import Counter
+
+# ---------------------------------------------------------------------------
+# Focus rules
+# ---------------------------------------------------------------------------
+
+# Muscle groups allowed per focus: the app groups (chest, back, legs, arms...)
+# plus the finer names the exercise API may send (biceps, quadriceps...)
+UPPER_MUSCLES = {
+    "chest", "back", "shoulders", "trapezius", "traps", "arms", "biceps",
+    "triceps", "forearms", "lats", "upper back", "middle back", "neck",
+}
+LOWER_MUSCLES = {
+    "legs", "glutes", "calves", "quadriceps", "quads", "hamstrings",
+    "adductors", "abductors", "lower back",
+}
+CORE_MUSCLES = {"abs", "abdominals", "core", "obliques"}
+CARDIO_MUSCLES = {"cardio"}
+
+FOCUS_MUSCLES = {
+    "Full Body": UPPER_MUSCLES | LOWER_MUSCLES | CORE_MUSCLES,
+    "Adapted Full Body": UPPER_MUSCLES | LOWER_MUSCLES | CORE_MUSCLES,
+    "Upper Body": UPPER_MUSCLES,
+    "Lower Body": LOWER_MUSCLES,
+    "Push": {"chest", "shoulders", "triceps", "arms"},
+    "Pull": {"back", "biceps", "forearms", "lats", "upper back", "middle back", "trapezius", "traps", "arms"},
+    "Core": CORE_MUSCLES,
+    "Cardio": CARDIO_MUSCLES,
+}
+
+# "arms" mixes curls and extensions: keep only the right half on push/pull days
+ARM_KEYWORDS = {
+    "Push": ("tricep", "dip", "pushdown", "extension"),
+    "Pull": ("curl",),
+}
+
+# Below this many focus matches, the day is completed with other safe exercises
+MIN_DAY_CANDIDATES = 4
+
+# ---------------------------------------------------------------------------
+# Injury rules (mirror of the CRITICAL INJURY PROTOCOL sent to the LLM)
+# ---------------------------------------------------------------------------
+
+INJURY_GROUPS = {
+    "right_shoulder": "shoulder",
+    "left_shoulder": "shoulder",
+    "right_trapezius": "shoulder",
+    "left_trapezius": "shoulder",
+    "lower_back": "lower_back",
+    "right_knee": "knee",
+    "left_knee": "knee",
+    "right_elbow": "elbow",
+    "left_elbow": "elbow",
+    "right_hip": "hip",
+    "left_hip": "hip",
+}
+
+# Lowercase name fragments excluded for each injury group
+INJURY_EXCLUDED_KEYWORDS = {
+    "shoulder": (
+        "pull-up", "pull up", "chin-up", "chin up", "hanging",
+        "barbell squat", "back squat",
+        "deadlift", "barbell row", "bent over", "t-bar row",
+        "overhead press", "military press", "arnold press", "push press",
+        "dip",
+    ),
+    "lower_back": (
+        "barbell squat", "back squat", "overhead press", "military press",
+        "deadlift", "barbell row", "bent over", "t-bar row", "good morning",
+    ),
+    "knee": ("squat", "lunge", "leg extension", "jump", "box jump"),
+    "elbow": ("barbell curl", "barbell bicep curl", "skull crusher"),
+    "hip": ("squat", "lunge", "sumo deadlift"),
+}
+
+
+def injured_zones(injuries: list[str]) -> set[str]:
+    """Body zones of the user's active injuries ("right_knee: details" -> "right_knee")."""
+    return {inj.split(":", 1)[0].strip() for inj in injuries or [] if inj}
+
+
+def injury_groups(zones: set[str]) -> set[str]:
+    """Protocol groups covering `zones`; zones without a dedicated rule map to "other"."""
+    return {INJURY_GROUPS.get(zone, "other") for zone in zones}
+
+
+def is_excluded_by_injuries(exercise: dict, groups: set[str]) -> bool:
+    name = exercise["name"].lower()
+    return any(
+        keyword in name
+        for group in groups
+        for keyword in INJURY_EXCLUDED_KEYWORDS.get(group, ())
+    )
+
+
+def matches_focus(exercise: dict, focus: str) -> bool:
+    muscles = FOCUS_MUSCLES.get(focus)
+    if muscles is None:
+        return True  # unknown focus: let the model decide
+
+    muscle = exercise["muscle"].lower()
+    if focus == "Cardio":
+        return muscle in muscles or exercise.get("type") == "duration"
+    if muscle not in muscles:
+        return False
+    if muscle == "arms" and focus in ARM_KEYWORDS:
+        return any(keyword in exercise["name"].lower() for keyword in ARM_KEYWORDS[focus])
+    return True
+
+
+def safe_exercises(available_exercises: list[dict], injuries: list[str]) -> list[dict]:
+    """Exercises the injury protocol allows, whatever the day's focus."""
+    groups = injury_groups(injured_zones(injuries))
+    return [ex for ex in available_exercises if not is_excluded_by_injuries(ex, groups)]
+
+
+def filter_exercises_for_day(day: dict, available_exercises: list[dict], injuries: list[str]) -> list[dict]:
+    """
+    Candidate exercises for one {date, focus, mode} day: safe for the user's
+    injuries and matching the focus, completed with other safe exercises when
+    the focus alone has fewer than MIN_DAY_CANDIDATES. Never returns an
+    exercise the injuries exclude: empty when none is safe, which callers
+    must reject (see safe_exercises) rather than generate from.
+    """
+    safe = safe_exercises(available_exercises, injuries)
+
+    candidates = [ex for ex in safe if matches_focus(ex, day["focus"])]
+    if len(candidates) < MIN_DAY_CANDIDATES:
+        allow_cardio = day["focus"] == "Cardio"
+        candidates += [
+            ex for ex in safe
+            if ex not in candidates and (allow_cardio or ex["muscle"].lower() not in CARDIO_MUSCLES)
+        ]
+
+    return candidates or safe
+
+
+def pick_least_used(candidates: list[dict], usage: Counter, count: int, spread_muscles: bool = True) -> list[dict]:
+    """
+    Pick `count` exercises, least used across the plan first (ties keep list
+    order), alternating muscle groups so a session is not five chest moves in a
+    row. Updates `usage` with the picks.
+    """
+    ordered = sorted(candidates, key=lambda ex: usage[ex["name"]])
+    picked: list[dict] = []
+    if spread_muscles:
+        seen_muscles: set[str] = set()
+        for ex in ordered:
+            if len(picked) >= count:
+                break
+            if ex["muscle"] not in seen_muscles:
+                picked.append(ex)
+                seen_muscles.add(ex["muscle"])
+    for ex in ordered:
+        if len(picked) >= count:
+            break
+        if ex not in picked:
+            picked.append(ex)
+
+    usage.update(ex["name"] for ex in picked)
+    return picked
+
+
+# ---------------------------------------------------------------------------
+# Rule-based generator (no LLM)
+# ---------------------------------------------------------------------------
+
+# exercises per session, sets per exercise, starting weight (kg) and step per set
+LEVEL_PARAMS = {
+    "beginner": {"exercises": 4, "sets": 3, "weight": 10.0, "step": 2.0, "duration": 30},
+    "intermediate": {"exercises": 5, "sets": 3, "weight": 20.0, "step": 5.0, "duration": 45},
+    "advanced": {"exercises": 6, "sets": 4, "weight": 30.0, "step": 7.5, "duration": 60},
+}
+
+# Marks workouts built without the LLM (not memoized as AI answers)
+RULE_BASED_SOURCE = "rules"
+
+# Rep targets rotated across the plan: strength, hypertrophy, endurance
+REP_CYCLE = (8, 12, 15)
+
+FOCUS_NAMES = {
+    "Full Body": "Full Body Session",
+    "Adapted Full Body": "Adapted Full Body",
+    "Upper Body": "Upper Body Power",
+    "Lower Body": "Leg Day",
+    "Push": "Push Day",
+    "Pull": "Pull Day",
+    "Core": "Core Stability",
+    "Cardio": "Cardio Burn",
+}
+
+
+def _sets_for(exercise: dict, mode: str, num_sets: int, base_reps: int, params: dict) -> list[dict]:
+    """Set details following the day's load mode (see "Load mode rules" in the AI prompt)."""
+    if mode == "progressive":
+        steps = list(range(num_sets))
+    elif mode == "degressive":
+        steps = list(range(num_sets - 1, -1, -1))
+    else:
+        steps = [0] * num_sets
+
+    sets = []
+    for number, step in enumerate(steps, start=1):
+        if exercise.get("type") == "duration":
+            sets.append({"set_number": number, "reps": 0, "weight": 0, "duration": params["duration"] + 10 * step})
+        else:
+            sets.append({
+                "set_number": number,
+                "reps": max(4, base_reps + 2 - 2 * step),
+                "weight": params["weight"] + params["step"] * step,
+                "duration": 0,
+            })
+    return sets
+
+
+def generate_rule_based_program(days: list[dict], available_exercises: list[dict], user_context: dict) -> list[dict]:
+    """
+    Build a program without the LLM: filtered candidates per day, least-used
+    exercises first for variety, rep targets rotated across days and sets
+    following each day's load mode. Same output format as the AI generator.
+    """
+    fitness_level = user_context.get("fitness_level") or "intermediate"
+    params = LEVEL_PARAMS.get(fitness_level, LEVEL_PARAMS["intermediate"])
+    zones = injured_zones(user_context.get("injuries", []))
+    usage: Counter = Counter()
+
+    workouts = []
+    for index, day in enumerate(days):
+        candidates = filter_exercises_for_day(day, available_exercises, user_context.get("injuries", []))
+        if not candidates:
+            continue  # nothing safe to offer: no session rather than an unsafe one
+        picked = pick_least_used(candidates, usage, params["exercises"])
+        base_reps = REP_CYCLE[index % len(REP_CYCLE)] + (4 if fitness_level == "beginner" else 0)
+
+        description = (
+            f"{day['focus']} session with a {day['mode']} load, built from your exercise list "
+            f"to suit a {fitness_level} level and a {base_reps}-rep target today."
+        )
+        if zones:
+            description += f" Exercises loading your injured zones ({', '.join(sorted(zones))}) were left out."
+
+        workouts.append({
+            "name": FOCUS_NAMES.get(day["focus"], f"{day['focus']} Session"),
+            "description": description,
+            "difficulty": fitness_level.capitalize(),
+            "scheduled_date": f"{day['date']}T10:00:00",
+            "source": RULE_BASED_SOURCE,
+            "exercises": [
+                {
+                    "name": ex["name"],
+                    "muscle": ex["muscle"],
+                    "num_sets": params["sets"],
+                    "rest_time": 60,
+                    "sets_details": _sets_for(ex, day["mode"], params["sets"], base_reps, params),
+                }
+                for ex in picked
+            ],
+        })
+
+    return workouts
@@ -0,0 +1,70 @@
+"""
+Recurrence rules for workout schedules.
+
+A schedule stores a small RRULE subset (FREQ=DAILY|WEEKLY, INTERVAL, BYDAY,
+UNTIL, plus EXDATE-like skipped dates) and is never expanded ahead of time:
+occurrences are computed for the date range being read, so a schedule costs
+one row however far it reaches. The write paths in app/model.py materialize
+an occurrence into a Workout row only when it is started or completed; this
+module only does the date arithmetic.
+"""
+
+from datetime import date, timedelta
+
+FREQUENCIES = ("daily", "weekly")
+
+# Longest range expanded in one read, whatever the requested window
+MAX_EXPANSION_DAYS = 366
+
+
+def parse_weekdays(value: str | None) -> list[int]:
+    """ "0,2,4" -> [0, 2, 4] (Monday = 0)."""
+    return sorted({int(day) for day in value.split(",") if day.strip()}) if value else []
+
+
+def format_weekdays(weekdays) -> str | None:
+    return ",".join(str(day) for day in sorted(set(weekdays))) if weekdays else None
+
+
+def occurrences(freq: str, interval: int, start: date, weekdays: list[int], until: date | None,
+                window_start: date, window_end: date, excluded=()) -> list[date]:
+    """
+    Occurrence dates of a rule within [window_start, window_end].
+
+    Weekly rules repeat on `weekdays` (default: the start's weekday) every
+    `interval` weeks, counted from the week containing `start`; daily rules
+    every `interval` days from `start`.
+    """
+    interval = max(1, interval or 1)
+    first = max(start, window_start)
+    last = min(window_end, until) if until else window_end
+    last = min(last, first + timedelta(days=MAX_EXPANSION_DAYS - 1))
+    if first > last:
+        return []
+
+    excluded = set(excluded)
+    weekdays = set(weekdays or [start.weekday()])
+    start_monday = start - timedelta(days=start.weekday())
+
+    days = []
+    day = first
+    while day <= last:
+        if freq == "daily":
+            matches = (day - start).days % interval == 0
+        else:
+            matches = day.weekday() in weekdays and ((day - start_monday).days // 7) % interval == 0
+        if matches and day not in excluded:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def until_for_count(freq: str, interval: int, start: date, weekdays: list[int], count: int) -> date:
+    """Date of the count-th occurrence, to store a COUNT rule as an UNTIL rule."""
+    found: list[date] = []
+    window_start = start
+    while len(found) < count:
+        window_end = window_start + timedelta(days=MAX_EXPANSION_DAYS - 1)
+        found += occurrences(freq, interval, start, weekdays, None, window_start, window_end)
+        window_start = window_end + timedelta(days=1)
+    return found[count - 1]
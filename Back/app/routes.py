@@ -1,19 +1,22 @@
 # routes.py
-from fastapi import APIRouter, Depends, Request, HTTPException
+from fastapi import APIRouter, Depends, Request, Response, HTTPException, Query
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.model import *
 from app.database import get_session
 from app.api import *
-from app.schemas import WorkoutCreate, WorkoutRead, WorkoutExerciseCreate, MealRead, MealCreateByCoach, UserGoalUpdate, MacroUpdate, ForumCreate, ForumUpdate, ForumMessageCreate, AIChatRequest, AIChatResponse, AIChatMessageRead, AIChatMessage, AI_DAILY_MESSAGE_LIMIT, AI_WEEKLY_WORKOUT_LIMIT, AI_DAILY_WORKOUT_LIMIT, UserInjury, UserInjuryRead, InjuryProposal, InjuryConfirmRequest, GenerateProgramRequest, SaveGeneratedProgramRequest, Users, Workout, WorkoutExercise, NewsletterSubscribeRequest, NewsletterSendRequest, WorkoutRatingCreate
+from app.schemas import WorkoutCreate, WorkoutRead, MealRead, MealCreateByCoach, UserGoalUpdate, MacroUpdate, ForumCreate, ForumUpdate, ForumMessageCreate, AIChatRequest, AIChatResponse, AIChatMessageRead, AIChatMessage, AI_DAILY_MESSAGE_LIMIT, AI_WEEKLY_WORKOUT_LIMIT, AI_DAILY_WORKOUT_LIMIT, UserInjury, UserInjuryRead, InjuryProposal, InjuryConfirmRequest, GenerateProgramRequest, GeneratedWorkout, SaveGeneratedProgramRequest, AI_PREVIEW_TTL_SECONDS, Users, Workout, WorkoutExercise, NewsletterSubscribeRequest, NewsletterSendRequest, WorkoutRatingCreate
 from typing import List, Any, Optional
 from jose import JWTError, jwt
 from dotenv import load_dotenv
 from sqlalchemy import select, desc, update, func as sa_func
-from app.ai_coach import generate_ai_response, generate_workout_program
+from app.ai_coach import generate_ai_response, generate_workout_program_cached
+from app.program_filter import safe_exercises
+from app.cache import TTLCache
 from datetime import date, datetime, timedelta
 import os
 import re
+import secrets
 
 router = APIRouter()
 load_dotenv()
@@ -33,6 +36,15 @@ async def get_current_user_id(token: str = Depends(oauth2_scheme)):
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
 
 
+async def _conditional_get(request: Request, response: Response, etag: str, load):
+    """304 when the app already has this version (If-None-Match), else `await load()` tagged with the ETag."""
+    if etag in parse_if_none_match(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers={"ETag": etag})
+    body = await load()
+    (body if isinstance(body, Response) else response).headers["ETag"] = etag
+    return body
+
+
 # ---------------------------------------------------------------------------
 # Root
 # ---------------------------------------------------------------------------
@@ -65,10 +77,29 @@ async def check_user(request: Request, session: AsyncSession = Depends(get_sessi
 # -- Chemins fixes sous /users/me/
 @router.get("/users/me/dashboard-stats")
 async def get_dashboard_stats_route(
+    request: Request,
+    response: Response,
     current_user: Any = Depends(get_current_user_id),
     session: AsyncSession = Depends(get_session)
 ):
-    return await get_dashboard_stats(session, current_user)
+    etag = await dashboard_stats_etag(session, current_user)
+    return await _conditional_get(request, response, etag, lambda: get_dashboard_stats(session, current_user))
+
+
+@router.get("/users/me/today")
+async def get_today_route(
+    request: Request,
+    response: Response,
+    current_user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    """Home screen in one call; sections the app already has (If-None-Match) come back without data."""
+    known_etags = parse_if_none_match(request.headers.get("if-none-match"))
+    summary = await get_today_summary(session, current_user_id, known_etags)
+    if summary["etag"] in known_etags or all(section.get("unchanged") for section in summary["sections"].values()):
+        return Response(status_code=304, headers={"ETag": summary["etag"]})
+    response.headers["ETag"] = summary["etag"]
+    return summary
 
 
 @router.patch("/users/me/profile")
@@ -160,6 +191,16 @@ async def updateMeal(meal_id: int, request: Request, current_user: int = Depends
     return await update_meal(session, meal_id, mealData)
 
 
+@router.get("/meals/top-foods")
+async def get_top_foods_route(
+    days: int = Query(30, ge=1, le=365),
+    limit: int = Query(TOP_FOODS_LIMIT, ge=1, le=50),
+    user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    return await get_top_foods(session, user_id, days, limit)
+
+
 @router.patch("/meals/{meal_id}/toggle-consume", response_model=MealRead)
 async def toggle_meal_consume_route(
     meal_id: int,
@@ -174,6 +215,30 @@ async def deleteMeal(meal_id: int, request: Request, current_user: int = Depends
     return await delete_meal(session, meal_id)
 
 
+# ---------------------------------------------------------------------------
+# Sync (apps hors ligne) — préfixe distinct
+# ---------------------------------------------------------------------------
+
+@router.post("/sync")
+async def sync_route(
+    batch: SyncRequest,
+    user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    """Apply queued offline meal / workout mutations in one request."""
+    return await apply_sync_batch(session, user_id, batch)
+
+
+@router.get("/sync/changes")
+async def sync_changes_route(
+    cursor: int = Query(0, ge=0),
+    limit: int = Query(SYNC_PULL_LIMIT, ge=1, le=SYNC_PULL_LIMIT),
+    user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    return await get_sync_changes(session, user_id, cursor, limit)
+
+
 # ---------------------------------------------------------------------------
 # Workouts — route fixe (/workouts/create, /workouts/my-workouts) avant /{id}
 # ---------------------------------------------------------------------------
@@ -187,12 +252,100 @@ async def create_workout_route(
     return await create_full_workout(session, user_id, workout_data)
 
 
-@router.get("/workouts/my-workouts", response_model=List[WorkoutRead])
+@router.get("/workouts/my-workouts", response_model=List[WorkoutListItem])
 async def get_my_workouts_route(
+    request: Request,
+    response: Response,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    include_scheduled: bool = False,
+    user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    etag = await user_workouts_etag(session, user_id, date_from, date_to, include_scheduled)
+    return await _conditional_get(
+        request, response, etag,
+        lambda: get_user_workouts(session, user_id, date_from, date_to, include_scheduled)
+    )
+
+
+@router.get("/workouts/calendar")
+async def get_workout_calendar_route(
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    cursor: Optional[str] = None,
+    limit: int = Query(WORKOUT_CALENDAR_PAGE_SIZE, ge=1, le=500),
+    user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    return await get_workout_calendar(session, user_id, date_from, date_to, cursor=cursor, limit=limit)
+
+
+@router.post("/workouts/schedules", status_code=201, response_model=WorkoutScheduleRead)
+async def create_workout_schedule_route(
+    schedule_data: WorkoutScheduleCreate,
+    user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    return await create_workout_schedule(session, user_id, schedule_data)
+
+
+@router.get("/workouts/schedules", response_model=List[WorkoutScheduleRead])
+async def get_workout_schedules_route(
+    user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    return await get_workout_schedules(session, user_id)
+
+
+@router.delete("/workouts/schedules/{schedule_id}")
+async def delete_workout_schedule_route(
+    schedule_id: int,
+    user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    return await delete_workout_schedule(session, schedule_id, user_id)
+
+
+@router.post("/workouts/schedules/{schedule_id}/occurrences/{occurrence_date}", response_model=WorkoutRead)
+async def start_schedule_occurrence_route(
+    schedule_id: int,
+    occurrence_date: date,
+    complete: bool = False,
+    user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    """Turn a scheduled occurrence into a real workout (to start, edit or complete it)."""
+    return await start_schedule_occurrence(session, user_id, schedule_id, occurrence_date, complete=complete)
+
+
+@router.delete("/workouts/schedules/{schedule_id}/occurrences/{occurrence_date}")
+async def skip_schedule_occurrence_route(
+    schedule_id: int,
+    occurrence_date: date,
     user_id: int = Depends(get_current_user_id),
     session: AsyncSession = Depends(get_session)
 ):
-    return await get_user_workouts(session, user_id)
+    return await skip_schedule_occurrence(session, user_id, schedule_id, occurrence_date)
+
+
+@router.get("/workouts/personal-records")
+async def get_personal_records_route(
+    user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    return await get_personal_records(session, user_id)
+
+
+@router.get("/workouts/progression")
+async def get_exercise_progression_route(
+    exercise: str = Query(..., min_length=1, max_length=100),
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    return await get_exercise_progression(session, user_id, exercise, date_from, date_to)
 
 
 @router.get("/workouts/calories-burned")
@@ -220,6 +373,23 @@ async def update_workout_route(
     return await update_full_workout(session, workout_id, workout_data)
 
 
+@router.patch("/workouts/{workout_id}")
+async def patch_workout_route(
+    workout_id: int,
+    workout_data: WorkoutPatch,
+    user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    from app.schemas import Workout as WorkoutModel
+    result = await session.execute(
+        select(WorkoutModel).where(WorkoutModel.id == workout_id, WorkoutModel.user_id == user_id)
+    )
+    workout = result.scalars().first()
+    if not workout:
+        raise HTTPException(status_code=404, detail="Workout not found or not yours")
+    return await update_full_workout(session, workout_id, workout_patch_payload(workout_data), partial=True)
+
+
 @router.patch("/workouts/{workout_id}/toggle-complete")
 async def toggle_workout_complete_route(
     workout_id: int,
@@ -249,40 +419,32 @@ async def delete_workout_route(
     return await delete_workout_for_user(session, workout_id, user_id)
 
 
-@router.post("/workouts/generate-program")
-async def generate_program_route(
-    request_data: GenerateProgramRequest,
-    user_id: int = Depends(get_current_user_id),
-    session: AsyncSession = Depends(get_session),
-):
-    """Generate an AI-adapted workout program for selected dates."""
-    # Fetch user profile
+async def _build_program_context(session: AsyncSession, user_id: int) -> dict:
+    """User profile + active injuries passed to the AI program generator."""
     result = await session.execute(select(Users).where(Users.id == user_id))
     user = result.scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    # Fetch active injuries
     injury_result = await session.execute(
         select(UserInjury).where(UserInjury.user_id == user_id, UserInjury.is_active == True)
     )
     active_injuries = injury_result.scalars().all()
     injury_list = [f"{inj.body_zone}: {inj.description or 'no details'}" for inj in active_injuries]
 
-    user_context = {
+    return {
         "goal": user.goal,
         "fitness_level": getattr(user, "fitness_level", None) or "intermediate",
         "weight": user.weight,
         "injuries": injury_list,
     }
 
-    available_exercises = [ex.model_dump() for ex in request_data.available_exercises]
-    day_configs = [dc.model_dump() for dc in request_data.day_configs] if request_data.day_configs else None
 
-    # Check weekly AI workout limit
+async def _check_ai_program_limits(session: AsyncSession, user_id: int, selected_dates: List[str]) -> int:
+    """Raise 429 if the request exceeds the weekly/daily AI limits, else return the weekly remaining count."""
     weekly_used = await _count_ai_workouts_this_week(session, user_id)
     weekly_remaining = max(0, AI_WEEKLY_WORKOUT_LIMIT - weekly_used)
-    num_requested = len(request_data.selected_dates)
+    num_requested = len(selected_dates)
     if num_requested > weekly_remaining:
         raise HTTPException(
             status_code=429,
@@ -290,7 +452,7 @@ async def generate_program_route(
         )
 
     # Check daily limit (max 2 AI workouts per day)
-    for date_str in request_data.selected_dates:
+    for date_str in selected_dates:
         target = datetime.strptime(date_str, "%Y-%m-%d").date()
         daily_count = await _count_ai_workouts_for_date(session, user_id, target)
         if daily_count >= AI_DAILY_WORKOUT_LIMIT:
@@ -299,45 +461,59 @@ async def generate_program_route(
                 detail=f"Daily AI limit reached for {date_str} (max {AI_DAILY_WORKOUT_LIMIT}/day)."
             )
 
+    return weekly_remaining
+
+
+async def _generate_program(session: AsyncSession, user_id: int, request_data: GenerateProgramRequest) -> List[dict]:
+    user_context = await _build_program_context(session, user_id)
+    available_exercises = [ex.model_dump() for ex in request_data.available_exercises]
+    if not safe_exercises(available_exercises, user_context["injuries"]):
+        raise HTTPException(
+            status_code=422,
+            detail="None of the available exercises is safe with your declared injuries. "
+                   "Add other exercises or update your injuries."
+        )
+    day_configs = [dc.model_dump() for dc in request_data.day_configs] if request_data.day_configs else None
+
+    # Identical requests (double tap on preview, preview then generate...) share one LLM call
+    return await generate_workout_program_cached(
+        user_id=user_id,
+        selected_dates=request_data.selected_dates,
+        available_exercises=available_exercises,
+        user_context=user_context,
+        day_configs=day_configs,
+    )
+
+
+@router.post("/workouts/generate-program")
+async def generate_program_route(
+    request_data: GenerateProgramRequest,
+    user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session),
+):
+    """Generate an AI-adapted workout program for selected dates."""
+    await _check_ai_program_limits(session, user_id, request_data.selected_dates)
+
     # Call AI to generate program
     try:
-        workouts_data = await generate_workout_program(
-            selected_dates=request_data.selected_dates,
-            available_exercises=available_exercises,
-            user_context=user_context,
-            day_configs=day_configs,
-        )
+        workouts_data = await _generate_program(session, user_id, request_data)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[AI Program] Error generating program: {e}")
         raise HTTPException(status_code=500, detail=f"AI generation failed: {str(e)}")
 
-    # Create workouts in DB
-    count = 0
-    for workout in workouts_data:
-        try:
-            exercises = []
-            for ex in workout.get("exercises", []):
-                exercises.append(WorkoutExerciseCreate(
-                    name=ex["name"],
-                    muscle=ex["muscle"],
-                    num_sets=ex.get("num_sets", 3),
-                    rest_time=ex.get("rest_time", 60),
-                    sets_details=ex.get("sets_details", []),
-                ))
-            workout_create = WorkoutCreate(
-                name=workout["name"],
-                description=workout.get("description"),
-                difficulty=workout.get("difficulty", "Intermediate"),
-                scheduled_date=workout["scheduled_date"],
-                exercises=exercises,
-            )
-            await create_full_workout(session, user_id, workout_create, is_ai_generated=True)
-            count += 1
-        except Exception as e:
-            print(f"[AI Program] Error creating workout '{workout.get('name')}': {e}")
-            continue
+    # Create all workouts in a single transaction
+    report = await create_workouts_bulk(session, user_id, workouts_data, is_ai_generated=True)
+    for failure in report["failed"]:
+        print(f"[AI Program] Error creating workout '{failure['name']}': {failure['error']}")
+    count = len(report["created"])
+
+    return {"message": f"Generated {count} workouts", "count": count, "failed": report["failed"]}
 
-    return {"message": f"Generated {count} workouts", "count": count}
+
+# Previews kept server-side so /workouts/save-generated-program can commit them by id
+_program_previews = TTLCache(ttl_seconds=AI_PREVIEW_TTL_SECONDS)
 
 
 @router.post("/workouts/preview-program")
@@ -347,59 +523,32 @@ async def preview_program_route(
     session: AsyncSession = Depends(get_session),
 ):
     """Generate an AI workout program and return it for preview (no save)."""
-    result = await session.execute(select(Users).where(Users.id == user_id))
-    user = result.scalars().first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    injury_result = await session.execute(
-        select(UserInjury).where(UserInjury.user_id == user_id, UserInjury.is_active == True)
-    )
-    active_injuries = injury_result.scalars().all()
-    injury_list = [f"{inj.body_zone}: {inj.description or 'no details'}" for inj in active_injuries]
-
-    user_context = {
-        "goal": user.goal,
-        "fitness_level": getattr(user, "fitness_level", None) or "intermediate",
-        "weight": user.weight,
-        "injuries": injury_list,
-    }
-
-    available_exercises = [ex.model_dump() for ex in request_data.available_exercises]
-    day_configs = [dc.model_dump() for dc in request_data.day_configs] if request_data.day_configs else None
-
-    # Check weekly AI workout limit
-    weekly_used = await _count_ai_workouts_this_week(session, user_id)
-    weekly_remaining = max(0, AI_WEEKLY_WORKOUT_LIMIT - weekly_used)
-    num_requested = len(request_data.selected_dates)
-    if num_requested > weekly_remaining:
-        raise HTTPException(
-            status_code=429,
-            detail=f"Weekly AI workout limit: {weekly_remaining} remaining out of {AI_WEEKLY_WORKOUT_LIMIT}/week."
-        )
-
-    # Check daily limit
-    for date_str in request_data.selected_dates:
-        target = datetime.strptime(date_str, "%Y-%m-%d").date()
-        daily_count = await _count_ai_workouts_for_date(session, user_id, target)
-        if daily_count >= AI_DAILY_WORKOUT_LIMIT:
-            raise HTTPException(
-                status_code=429,
-                detail=f"Daily AI limit reached for {date_str} (max {AI_DAILY_WORKOUT_LIMIT}/day)."
-            )
+    weekly_remaining = await _check_ai_program_limits(session, user_id, request_data.selected_dates)
 
     try:
-        workouts_data = await generate_workout_program(
-            selected_dates=request_data.selected_dates,
-            available_exercises=available_exercises,
-            user_context=user_context,
-            day_configs=day_configs,
-        )
+        workouts_data = await _generate_program(session, user_id, request_data)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[AI Program] Error generating preview: {e}")
         raise HTTPException(status_code=500, detail=f"AI generation failed: {str(e)}")
 
-    return {"workouts": workouts_data, "ai_workouts_remaining": weekly_remaining}
+    workouts = []
+    for workout in workouts_data:
+        try:
+            workouts.append(GeneratedWorkout.model_validate(workout))
+        except Exception as e:
+            print(f"[AI Program] Dropping invalid preview workout '{workout.get('name')}': {e}")
+
+    preview_id = secrets.token_urlsafe(16)
+    _program_previews.set(preview_id, {"user_id": user_id, "workouts": workouts})
+
+    return {
+        "preview_id": preview_id,
+        "expires_in": AI_PREVIEW_TTL_SECONDS,
+        "workouts": [w.model_dump() for w in workouts],
+        "ai_workouts_remaining": weekly_remaining,
+    }
 
 
 @router.post("/workouts/save-generated-program")
@@ -408,43 +557,41 @@ async def save_generated_program_route(
     user_id: int = Depends(get_current_user_id),
     session: AsyncSession = Depends(get_session),
 ):
-    """Save previously previewed AI-generated workouts."""
+    """Save previously previewed AI-generated workouts, by preview id or as uploaded."""
+    if request_data.preview_id:
+        preview = _program_previews.get(request_data.preview_id)
+        if not preview or preview["user_id"] != user_id:
+            raise HTTPException(status_code=404, detail="Preview not found or expired, please generate it again.")
+        workouts = preview["workouts"]
+    else:
+        workouts = request_data.workouts
+
     # Check weekly AI workout limit before saving
     weekly_used = await _count_ai_workouts_this_week(session, user_id)
     weekly_remaining = max(0, AI_WEEKLY_WORKOUT_LIMIT - weekly_used)
-    total_new = len(request_data.workouts)
+    total_new = len(workouts)
     if total_new > weekly_remaining:
         raise HTTPException(
             status_code=429,
             detail=f"Cannot save: {total_new} workouts would exceed weekly limit ({weekly_remaining} remaining out of {AI_WEEKLY_WORKOUT_LIMIT})."
         )
 
-    count = 0
-    for workout in request_data.workouts:
-        try:
-            exercises = []
-            for ex in workout.exercises:
-                exercises.append(WorkoutExerciseCreate(
-                    name=ex.name,
-                    muscle=ex.muscle,
-                    num_sets=ex.num_sets,
-                    rest_time=ex.rest_time,
-                    sets_details=ex.sets_details,
-                ))
-            workout_create = WorkoutCreate(
-                name=workout.name,
-                description=workout.description,
-                difficulty=workout.difficulty,
-                scheduled_date=workout.scheduled_date,
-                exercises=exercises,
-            )
-            await create_full_workout(session, user_id, workout_create, is_ai_generated=True)
-            count += 1
-        except Exception as e:
-            print(f"[AI Program] Error saving workout '{workout.name}': {e}")
-            continue
+    report = await create_workouts_bulk(session, user_id, workouts, is_ai_generated=True)
+    for failure in report["failed"]:
+        print(f"[AI Program] Error saving workout '{failure['name']}': {failure['error']}")
+    count = len(report["created"])
+
+    response = {"message": f"Saved {count} workouts", "count": count, "failed": report["failed"]}
+    if request_data.preview_id:
+        if report["failed"]:
+            # keep only what failed, so the save can be retried without regenerating (AI quota)
+            failed_indexes = {failure["index"] for failure in report["failed"]}
+            preview["workouts"] = [w for i, w in enumerate(workouts) if i in failed_indexes]
+            response["preview_id"] = request_data.preview_id
+        else:
+            _program_previews.pop(request_data.preview_id)
 
-    return {"message": f"Saved {count} workouts", "count": count}
+    return response
 
 
 # ---------------------------------------------------------------------------
@@ -503,12 +650,22 @@ async def get_ai_remaining(
     }
 
 
+# -- GET dynamique — après tous les GET fixes /workouts/... (my-workouts, calendar, schedules, personal-records, progression, ai-remaining)
+@router.get("/workouts/{workout_id}", response_model=WorkoutRead)
+async def get_workout_detail_route(
+    workout_id: int,
+    user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    return await get_workout_detail(session, workout_id, user_id)
+
+
 # ---------------------------------------------------------------------------
 # External API (food / exercises) — tous fixes ou préfixes distincts
 # ---------------------------------------------------------------------------
 
 @router.get("/getMuscles/")
-async def get_muscles_from_api(current_user: int = Depends(get_current_user_id), session: AsyncSession = Depends(get_session)):
+async def get_muscles_from_api(current_user: int = Depends(get_current_user_id)):
     return get_muscles()
 
 
@@ -523,8 +680,8 @@ async def get_aliment_from_api(aliment_name: str, current_user: int = Depends(ge
 
 
 @router.get("/getExercises/{muscle}")
-async def get_exercises_from_api(muscle: str, current_user: int = Depends(get_current_user_id), session: AsyncSession = Depends(get_session)):
-    return get_exercises(muscle)
+async def get_exercises_from_api(muscle: str, target: Optional[str] = None, difficulty: Optional[str] = None, current_user: int = Depends(get_current_user_id)):
+    return get_exercises(muscle, target, difficulty)
 
 
 @router.get("/scan/{code}/{format}")
@@ -536,7 +693,7 @@ async def scan_aliment(code: str, current_user: int = Depends(get_current_user_i
 # Coaches
 #
 # Ordre de priorité dans chaque méthode HTTP :
-#   1. Chemins entièrement fixes         (/coaches/list, /coaches/search, /coaches/invite-client)
+#   1. Chemins entièrement fixes         (/coaches/list, /coaches/search, /coaches/cities, /coaches/invite-client)
 #   2. Chemins fixes + /me/...           (/coaches/me/sent-invitations, ...)
 #   3. Chemins semi-fixes sous-préfixe   (/coaches/client/..., /coaches/client-details/...,
 #                                         /coaches/clients/..., /coaches/workouts/...,
@@ -547,8 +704,16 @@ async def scan_aliment(code: str, current_user: int = Depends(get_current_user_i
 
 # -- GET fixes & /me/
 @router.get("/coaches/list")
-async def list_coaches(current_user: int = Depends(get_current_user_id), session: AsyncSession = Depends(get_session)):
-    return await get_all_coaches(session)
+async def list_coaches(
+    request: Request,
+    response: Response,
+    after_id: Optional[int] = Query(None, ge=0),
+    limit: int = Query(COACH_DIRECTORY_PAGE_SIZE, ge=1, le=100),
+    current_user: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    etag = await coach_directory_etag(session, after_id, limit)
+    return await _conditional_get(request, response, etag, lambda: get_all_coaches(session, after_id, limit))
 
 
 @router.get("/coaches/search", response_model=list[CoachSearchResponse])
@@ -556,10 +721,22 @@ async def search_coaches_route(
     city: str = None,
     lat: float = None,
     lon: float = None,
+    radius_km: Optional[float] = Query(None, gt=0),
+    limit: int = Query(COACH_SEARCH_DEFAULT_LIMIT, ge=1, le=200),
     current_user: int = Depends(get_current_user_id),
     session: AsyncSession = Depends(get_session)
 ):
-    return await search_coaches_near_location(session, city, lat, lon)
+    return await search_coaches_near_location(session, city, lat, lon, radius_km, limit)
+
+
+@router.get("/coaches/cities")
+async def search_coach_cities_route(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    return await search_cities(session, q, limit)
 
 
 @router.get("/coaches/me/sent-invitations")
@@ -586,6 +763,15 @@ async def get_coach_pending_requests_route(
     return await get_coach_pending_client_requests(session, current_user_id)
 
 
+@router.get("/coaches/templates")
+async def get_coach_templates_route(
+    kind: Optional[str] = Query(None, pattern="^(workout|meal)$"),
+    current_user: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    return await get_coach_templates(session, current_user, kind)
+
+
 # -- GET semi-fixes (2e segment fixe, param dynamique ensuite)
 @router.get("/coaches/client-details/{client_id}")
 async def get_client_details_full_route(
@@ -623,8 +809,9 @@ async def list_coach_clients(coach_id: int, current_user: int = Depends(get_curr
 
 
 @router.get("/coaches/{coach_id}/home-summary")
-async def get_coach_home_summary_route(coach_id: int, current_user: int = Depends(get_current_user_id), session: AsyncSession = Depends(get_session)):
-    return await get_coach_home_summary(session, coach_id)
+async def get_coach_home_summary_route(coach_id: int, request: Request, response: Response, current_user: int = Depends(get_current_user_id), session: AsyncSession = Depends(get_session)):
+    etag = await coach_home_summary_etag(session, coach_id)
+    return await _conditional_get(request, response, etag, lambda: get_coach_home_summary(session, coach_id))
 
 
 @router.get("/coaches/{coach_id}/public-profile")
@@ -646,6 +833,26 @@ async def invite_client_by_code_route(
     return await invite_client_by_unique_code(session, user_id, invitation_data.unique_code)
 
 
+@router.post("/coaches/templates", status_code=201)
+async def create_coach_template_route(
+    template_data: CoachTemplateCreate,
+    current_user: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    return await create_coach_template(session, current_user, template_data)
+
+
+@router.post("/coaches/templates/{template_id}/apply")
+async def apply_coach_template_route(
+    template_id: int,
+    apply_data: TemplateApplyRequest,
+    current_user: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    """Create the template's workout / meal for many clients on many dates in one transaction."""
+    return await apply_coach_template(session, current_user, template_id, apply_data)
+
+
 @router.post("/coaches/clients/{client_id}/workouts/create", status_code=201)
 async def create_workout_for_client_route(
     client_id: int,
@@ -653,7 +860,19 @@ async def create_workout_for_client_route(
     current_user: int = Depends(get_current_user_id),
     session: AsyncSession = Depends(get_session)
 ):
-    return await create_full_workout(session, client_id, workout_data)
+    return await create_full_workout(session, client_id, workout_data, coach_id=current_user)
+
+
+@router.post("/coaches/clients/{client_id}/workouts/schedules", status_code=201, response_model=WorkoutScheduleRead)
+async def create_workout_schedule_for_client_route(
+    client_id: int,
+    schedule_data: WorkoutScheduleCreate,
+    current_user: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    """Recurring workout authored by the client's coach (WorkoutSchedule.coach_id)."""
+    await require_client_coach(session, client_id, current_user)
+    return await create_workout_schedule(session, client_id, schedule_data, coach_id=current_user)
 
 
 @router.post("/coaches/clients/{client_id}/meals/create", status_code=status.HTTP_201_CREATED)
@@ -679,12 +898,24 @@ async def add_client_via_code(coach_id: int, request: Request, current_user: int
 async def coach_update_workout(
     workout_id: int,
     workout_data: dict,
-    session: AsyncSession = Depends(get_session),
-    token: str = Depends(oauth2_scheme)
+    current_user: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
 ):
+    await require_workout_coach(session, workout_id, current_user)
     return await update_full_workout(session, workout_id, workout_data)
 
 
+@router.patch("/coaches/workouts/{workout_id}")
+async def coach_patch_workout(
+    workout_id: int,
+    workout_data: WorkoutPatch,
+    current_user: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    await require_workout_coach(session, workout_id, current_user)
+    return await update_full_workout(session, workout_id, workout_patch_payload(workout_data), partial=True)
+
+
 @router.put("/coaches/meals/{meal_id}", status_code=status.HTTP_200_OK)
 async def update_meal_by_coach_route(
     meal_id: int,
@@ -725,6 +956,15 @@ async def delete_meal_by_coach_route(
     return await delete_meal_by_coach(session, meal_id)
 
 
+@router.delete("/coaches/templates/{template_id}")
+async def delete_coach_template_route(
+    template_id: int,
+    current_user: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    return await delete_coach_template(session, template_id, current_user)
+
+
 @router.delete("/coaches/clients/{client_id}", status_code=status.HTTP_200_OK)
 async def remove_client_from_coach_route(
     client_id: int,
@@ -844,6 +1084,15 @@ async def send_message_route(
     return await send_message(session, current_user_id, message_data)
 
 
+@router.post("/messages/broadcast")
+async def broadcast_message_route(
+    broadcast: MessageBroadcast,
+    current_user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    return await broadcast_message(session, current_user_id, broadcast)
+
+
 @router.post("/messages/notify-coach")
 async def notify_coach_route(
     notification: CoachNotification,
@@ -885,6 +1134,17 @@ async def get_forum_topics():
     return {"topics": FORUM_TOPICS}
 
 
+@router.get("/forums/search")
+async def search_forums_route(
+    q: str = Query(..., min_length=1, max_length=200),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(FORUM_SEARCH_PAGE_SIZE, ge=1, le=50),
+    user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_session)
+):
+    return await search_forums(session, user_id, q, page, page_size)
+
+
 @router.get("/forums/my-forums")
 async def get_my_forums_route(
     page: int = 1,
@@ -909,14 +1169,21 @@ async def get_favorite_forums_route(
 
 @router.get("/forums")
 async def get_public_forums_route(
+    request: Request,
+    response: Response,
     page: int = 1,
     page_size: int = 15,
     topic: str | None = None,
     sort: str = "recent",
+    cursor: str | None = None,
     user_id: int = Depends(get_current_user_id),
     session: AsyncSession = Depends(get_session)
 ):
-    return await get_public_forums(session, user_id, page, page_size, topic=topic, sort=sort)
+    etag = await public_forums_etag(session, user_id, page, page_size, topic, sort, cursor)
+    return await _conditional_get(
+        request, response, etag,
+        lambda: get_public_forums(session, user_id, page, page_size, topic=topic, sort=sort, cursor=cursor)
+    )
 
 
 # -- POST fix
@@ -933,10 +1200,13 @@ async def create_forum_route(
 @router.get("/forums/{forum_id}")
 async def get_forum_route(
     forum_id: int,
+    before: str | None = None,
+    after: str | None = None,
+    limit: int = Query(FORUM_MESSAGES_PAGE_SIZE, ge=1, le=200),
     user_id: int = Depends(get_current_user_id),
     session: AsyncSession = Depends(get_session)
 ):
-    return await get_forum_with_messages(session, forum_id, user_id)
+    return await get_forum_with_messages(session, forum_id, user_id, before=before, after=after, limit=limit)
 
 
 @router.post("/forums/{forum_id}/messages", status_code=201)
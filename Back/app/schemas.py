@@ -1,10 +1,10 @@
-from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime, Enum, func, event, JSON, Boolean, Text, Any, UniqueConstraint
+from sqlalchemy import Column, Integer, Float, String, ForeignKey, Date, DateTime, Enum, func, event, JSON, Boolean, Text, Any, UniqueConstraint, Index
 from app.database import Base
 from sqlalchemy.orm import relationship
 from passlib.context import CryptContext
 from pydantic import BaseModel, EmailStr, Field
-from typing import List, Optional, Dict
-from datetime import datetime
+from typing import List, Optional, Dict, Literal, Union, Annotated
+from datetime import datetime, date
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 class LocationUpdate(BaseModel):
@@ -42,6 +42,30 @@ class Message(Base):
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     is_read = Column(Boolean, default=False)
 
+class UnreadCounter(Base):
+    """Unread direct messages per (receiver, sender), maintained by the message write paths."""
+    __tablename__ = "unread_counters"
+
+    receiver_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    sender_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class Notification(Base):
+    """Client activity (meal, workout, profile updates) sent to their coach, shown in the chat and the coach feed."""
+    __tablename__ = "notifications"
+    # Recent-activity feeds are range reads on this index
+    __table_args__ = (Index("ix_notifications_recipient_created", "recipient_id", "created_at"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    recipient_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    sender_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    type = Column(String(50), nullable=False)    # meal_created, meal_updated, workout_updated, profile_updated
+    label = Column(String(255), nullable=False)
+    activity_date = Column(Date, nullable=True)  # day of the meal/workout, opens the coach dashboard on it
+    is_read = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 class MessageBase(BaseModel):
     content: str
 
@@ -58,6 +82,11 @@ class MessageRead(MessageBase):
     class Config:
         from_attributes = True
 
+class MessageBroadcast(MessageBase):
+    """Coach message to all their clients, or to the ones matching every given filter."""
+    client_ids: list[int] | None = None
+    goal: str | None = None
+
 class CoachNotification(BaseModel):
     type: str  # meal_created, meal_updated, workout_created, workout_updated, profile_updated
     label: str  # e.g. "Breakfast", "Push Day", "Weight: 75kg"
@@ -112,13 +141,18 @@ class Exercice(Base):
     __tablename__ = 'exercice'
 
     id = Column(Integer, primary_key=True)
-    exercice_name = Column(String(50), nullable=False)
-    target = Column(String(15), nullable=False)
+    exercice_name = Column(String(50), nullable=False, unique=True)
+    muscle = Column(String(20), nullable=False, index=True)   # app muscle group: chest, back, legs...
+    target = Column(String(30), nullable=False)                # finer target: pectorals, quads, serratus anterior...
+    difficulty = Column(String(15), nullable=False, default="intermediate")
+    exercise_type = Column(String(10), nullable=False, default="strength")  # strength | duration
+    equipment = Column(String(30), nullable=True)
+    body_zones = Column(JSON, nullable=True)                   # zones stressed, for injury filtering
     is_bodyweight = Column(Boolean, default=False)
     weight_required = Column(Boolean, default=False)
     repetitions = Column(Integer, nullable=True)
     num_sets = Column(Integer, nullable=True)
-    description = Column(String(100), nullable=False)
+    description = Column(String(255), nullable=False)
     video_url = Column(String(200), nullable=True)
     created_at = Column(DateTime, server_default=func.now())
 
@@ -165,6 +199,43 @@ class Meal(Base):
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Id generated by the app for meals created offline (see /sync)
+    client_uuid = Column(String(64), nullable=True)
+
+    __table_args__ = (
+        # Per-user day ranges (daily totals, coach dashboard)
+        Index("ix_meals_user_hourtime", "user_id", "hourtime"),
+        UniqueConstraint("user_id", "client_uuid", name="uq_meals_user_client_uuid"),
+    )
+
+class MealItem(Base):
+    """One food of a meal, normalized out of `Meal.aliments` so it can be queried."""
+    __tablename__ = "meal_items"
+    __table_args__ = (
+        Index("ix_meal_items_meal", "meal_id"),
+        Index("ix_meal_items_user_food", "user_id", "food_key"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    meal_id = Column(Integer, ForeignKey("meals.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    position = Column(Integer, nullable=False, default=0)
+    # Barcode / food id when the food comes from the food API, else the folded name
+    food_key = Column(String(150), nullable=False)
+    food_code = Column(String(100), nullable=True)
+    name = Column(String(255), nullable=False)
+    image = Column(String(500), nullable=True)
+    grams = Column(Float, nullable=False, default=0.0)
+
+    energy = Column(Float, nullable=False, default=0.0)
+    proteins = Column(Float, nullable=False, default=0.0)
+    carbohydrates = Column(Float, nullable=False, default=0.0)
+    sugars = Column(Float, nullable=False, default=0.0)
+    lipids = Column(Float, nullable=False, default=0.0)
+    saturated_fats = Column(Float, nullable=False, default=0.0)
+    fiber = Column(Float, nullable=False, default=0.0)
+    salt = Column(Float, nullable=False, default=0.0)
+
 class MealBase(BaseModel):
     name: str
     hourtime: datetime
@@ -225,6 +296,7 @@ class Users(Base):
     unique_code = Column(String(10), unique=True, nullable=True)
 
     city = Column(String(100), nullable=True)
+    city_key = Column(String(100), nullable=True)  # normalize_city(city): lowercase, no accents, for indexed prefix search
     latitude = Column(Float, nullable=True)
     longitude = Column(Float, nullable=True)
     
@@ -243,6 +315,12 @@ class Users(Base):
     cgu_version = Column(String(20), nullable=True)
     last_activity_at = Column(DateTime, server_default=func.now())
 
+    # Coach search: bounding-box range scan on coordinates, prefix range scan on city_key
+    __table_args__ = (
+        Index("ix_users_role_lat_lon", "role", "latitude", "longitude"),
+        Index("ix_users_role_city_key", "role", "city_key"),
+    )
+
     @property
     def password(self):
         return self._password
@@ -253,6 +331,19 @@ class Users(Base):
 
     def verify_password(self, plain_password: str) -> bool:
         return pwd_context.verify(plain_password, self.password)
+
+
+class CoachStats(Base):
+    """Per-coach counters shown on the public profile, maintained by the write paths."""
+    __tablename__ = "coach_stats"
+
+    coach_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    active_clients = Column(Integer, nullable=False, default=0)
+    workouts_created = Column(Integer, nullable=False, default=0)   # workouts authored for clients
+    forum_posts = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Integer, nullable=False, default=0)         # client ratings of authored workouts
+    rating_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     
 class UserCreate(BaseModel):
     firstname: str
@@ -318,6 +409,22 @@ class WorkoutBase(BaseModel):
 class WorkoutCreate(WorkoutBase):
     exercises: List[WorkoutExerciseCreate]
 
+class WorkoutExercisePatch(BaseModel):
+    """Exercise of a PATCH payload: `id` targets a stored exercise, without it the exercise is added."""
+    id: Optional[int] = None
+    name: Optional[str] = None
+    muscle: Optional[str] = None
+    num_sets: Optional[int] = None
+    rest_time: Optional[int] = None
+    sets_details: Optional[List[ExerciseSetDetail]] = None
+
+class WorkoutPatch(BaseModel):
+    name: Optional[str] = None
+    description: Optional[str] = None
+    difficulty: Optional[str] = None
+    exercises: Optional[List[WorkoutExercisePatch]] = None
+    removed_exercise_ids: List[int] = []
+
 class WorkoutRead(WorkoutBase):
     id: int
     user_id: int
@@ -328,11 +435,103 @@ class WorkoutRead(WorkoutBase):
     is_ai_generated: bool = False
     rating: Optional["WorkoutRatingRead"] = None
 
+    schedule_id: Optional[int] = None
+    occurrence_date: Optional[date] = None
+
+    class Config:
+        from_attributes = True
+
+class ScheduledOccurrenceRead(WorkoutBase):
+    """Occurrence of a schedule not materialized yet: no id until it is started."""
+    user_id: int
+    schedule_id: int
+    occurrence_date: date
+    exercises: List[WorkoutExerciseBase] = []
+    is_virtual: bool = True
+    is_completed: bool = False
+    is_ai_generated: bool = False
+
     class Config:
         from_attributes = True
 
+# Real workouts first: a materialized occurrence must keep its id
+WorkoutListItem = Annotated[Union[WorkoutRead, ScheduledOccurrenceRead], Field(union_mode="left_to_right")]
+
+class WorkoutScheduleCreate(BaseModel):
+    name: str
+    description: Optional[str] = None
+    difficulty: str
+    exercises: List[WorkoutExerciseCreate]
+    starts_at: datetime
+    freq: Literal["daily", "weekly"] = "weekly"
+    interval: int = Field(1, ge=1, le=52)
+    weekdays: Optional[List[int]] = None
+    until: Optional[date] = None
+    count: Optional[int] = Field(None, ge=1, le=730)
+
+class WorkoutTemplateBody(BaseModel):
+    name: str
+    description: Optional[str] = None
+    difficulty: str
+    exercises: List[WorkoutExerciseCreate]
+
+class MealTemplateBody(BaseModel):
+    name: str
+    total_calories: float
+    total_proteins: float
+    total_carbohydrates: float
+    total_lipids: float
+    aliments: List[Dict[str, Any]] = []
+
+class CoachTemplateCreate(BaseModel):
+    """Exactly one of `workout` / `meal`, matching `kind`."""
+    kind: Literal["workout", "meal"]
+    workout: Optional[WorkoutTemplateBody] = None
+    meal: Optional[MealTemplateBody] = None
+
+class TemplateApplyRequest(BaseModel):
+    """Every client gets one workout / meal per date (date and time of day)."""
+    client_ids: List[int] = Field(..., min_length=1, max_length=200)
+    dates: List[datetime] = Field(..., min_length=1, max_length=366)
+
+class SyncMutationIn(BaseModel):
+    """
+    One offline change. The target is `id` (server id) or `client_uuid` (id
+    the app gave the row when creating it, usable before it knows the server id).
+    """
+    mutation_id: str = Field(..., min_length=1, max_length=64)
+    entity: Literal["meal", "workout"]
+    op: Literal["create", "update", "toggle_consume", "toggle_complete", "delete"]
+    id: Optional[int] = None
+    client_uuid: Optional[str] = Field(None, max_length=64)
+    data: Dict[str, Any] = {}
+
+class SyncRequest(BaseModel):
+    mutations: List[SyncMutationIn] = Field(..., max_length=500)
+
+class WorkoutScheduleRead(BaseModel):
+    id: int
+    user_id: int
+    name: str
+    description: Optional[str] = None
+    difficulty: str
+    exercises: List[WorkoutExerciseBase]
+    freq: str
+    interval: int
+    weekdays: List[int] = []
+    starts_at: datetime
+    until: Optional[date] = None
+    excluded_dates: List[date] = []
+
 class Workout(Base):
     __tablename__ = "workouts"
+    __table_args__ = (
+        # Per-user date windows (calendar, my-workouts?from=&to=)
+        Index("ix_workouts_user_scheduled", "user_id", "scheduled_date"),
+        # At most one materialized workout per schedule occurrence
+        UniqueConstraint("schedule_id", "occurrence_date", name="uq_workouts_schedule_occurrence"),
+        UniqueConstraint("user_id", "client_uuid", name="uq_workouts_user_client_uuid"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -349,6 +548,129 @@ class Workout(Base):
 
     is_completed = Column(Boolean, default=False)
     is_ai_generated = Column(Boolean, default=False)
+    coach_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # author, when created by a coach for a client
+
+    # Metrics computed from the exercises on write (NULL until computed)
+    exercise_count = Column(Integer, nullable=True)
+    total_reps = Column(Integer, nullable=True)
+    total_volume = Column(Float, nullable=True)        # sum of reps x weight (kg)
+    duration_seconds = Column(Integer, nullable=True)  # estimated, rests included
+    calories_ref = Column(Float, nullable=True)        # estimated kcal for REFERENCE_WEIGHT_KG
+
+    # Set when the workout is a materialized occurrence of a WorkoutSchedule
+    schedule_id = Column(Integer, ForeignKey("workout_schedules.id"), nullable=True)
+    occurrence_date = Column(Date, nullable=True)
+
+    # Id generated by the app for workouts created offline (see /sync)
+    client_uuid = Column(String(64), nullable=True)
+
+class WorkoutSchedule(Base):
+    """
+    Recurring workout ("Push every Monday"): an RRULE subset expanded when a
+    date range is read (see app/recurrence.py). An occurrence becomes a
+    Workout row only once started or completed.
+    """
+    __tablename__ = "workout_schedules"
+    __table_args__ = (Index("ix_workout_schedules_user", "user_id"),)
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    coach_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # author, when set by a coach
+
+    name = Column(String(100), nullable=False)
+    description = Column(Text, nullable=True)
+    difficulty = Column(String(50), nullable=False)
+    exercises = Column(JSON, nullable=False)  # WorkoutExerciseCreate dicts, copied on materialization
+
+    freq = Column(String(10), nullable=False)              # "daily" | "weekly"
+    interval = Column(Integer, nullable=False, default=1)
+    weekdays = Column(String(20), nullable=True)           # "0,2,4", Monday = 0 (weekly only)
+    starts_at = Column(DateTime, nullable=False)           # first day, and time of day of every occurrence
+    until = Column(Date, nullable=True)                    # last possible day, NULL = open-ended
+    excluded_dates = Column(JSON, nullable=True)           # skipped occurrences, ISO dates
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class CoachTemplate(Base):
+    """Reusable workout or meal a coach applies to many clients and dates at once."""
+    __tablename__ = "coach_templates"
+    __table_args__ = (Index("ix_coach_templates_coach", "coach_id"),)
+
+    id = Column(Integer, primary_key=True)
+    coach_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    kind = Column(String(10), nullable=False)   # "workout" | "meal"
+    name = Column(String(100), nullable=False)
+    payload = Column(JSON, nullable=False)      # WorkoutTemplateBody / MealTemplateBody dict
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ChangeLog(Base):
+    """
+    Append-only feed of meal / workout writes per user; its id is the cursor
+    apps pull changes from (GET /sync/changes). Pruned after a retention period.
+    """
+    __tablename__ = "change_log"
+    __table_args__ = (Index("ix_change_log_user_id", "user_id", "id"),)
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    entity = Column(String(20), nullable=False)     # "meal" | "workout"
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String(10), nullable=False)         # "upsert" | "delete"
+    changed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class SyncMutation(Base):
+    """Mutations already applied by /sync, so a batch re-sent after a timeout is not applied twice."""
+    __tablename__ = "sync_mutations"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    mutation_id = Column(String(64), primary_key=True)
+    entity = Column(String(20), nullable=False)
+    entity_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class EntityVersion(Base):
+    """
+    Change counter per (scope, owner), bumped by the write paths. Conditional
+    GETs build their ETag from it without running the query. owner_id is a
+    user id, or 0 for app-wide scopes (coach directory, forums).
+    """
+    __tablename__ = "entity_versions"
+
+    scope = Column(String(20), primary_key=True)   # "profile" | "meals" | "workouts" | "forum_favorites" | "coaches" | "forums"
+    owner_id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class PersonalRecord(Base):
+    """Best performances per (user, exercise), kept up to date from ExerciseProgress."""
+    __tablename__ = "personal_records"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    exercise_key = Column(String(100), primary_key=True)  # normalized name: "bench press"
+    exercise_name = Column(String(100), nullable=False)   # name as last entered
+    best_weight = Column(Float, nullable=False, default=0)
+    best_e1rm = Column(Float, nullable=False, default=0)  # estimated one-rep max (Epley)
+    best_volume = Column(Float, nullable=False, default=0)  # best single-session reps x weight
+    sessions = Column(Integer, nullable=False, default=0)
+    last_performed_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class ExerciseProgress(Base):
+    """One row per exercise of a completed workout: the series behind progression curves."""
+    __tablename__ = "exercise_progress"
+    __table_args__ = (
+        Index("ix_exercise_progress_user_exercise_date", "user_id", "exercise_key", "performed_at"),
+        Index("ix_exercise_progress_workout", "workout_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    workout_id = Column(Integer, ForeignKey("workouts.id"), nullable=False)
+    exercise_key = Column(String(100), nullable=False)
+    performed_at = Column(DateTime(timezone=True), nullable=False)
+    best_weight = Column(Float, nullable=False, default=0)
+    best_e1rm = Column(Float, nullable=False, default=0)
+    volume = Column(Float, nullable=False, default=0)
+    total_reps = Column(Integer, nullable=False, default=0)
 
 class WorkoutExercise(Base):
     __tablename__ = "workout_exercises"
@@ -361,6 +683,12 @@ class WorkoutExercise(Base):
     rest_time = Column(Integer, nullable=True, default=60)
     sets_details = Column(JSON, nullable=True)
 
+    # Metrics computed from sets_details on write, see Workout
+    total_reps = Column(Integer, nullable=True)
+    total_volume = Column(Float, nullable=True)
+    duration_seconds = Column(Integer, nullable=True)
+    calories_ref = Column(Float, nullable=True)
+
     workout = relationship("Workout", back_populates="exercises")
 
 
@@ -421,6 +749,8 @@ FORUM_TOPICS = [
 
 class Forum(Base):
     __tablename__ = "forums"
+    # Public listing, keyset-paginated by last activity
+    __table_args__ = (Index("ix_forums_status_activity", "status", "last_activity_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -437,6 +767,8 @@ class Forum(Base):
 
 class ForumMessage(Base):
     __tablename__ = "forum_messages"
+    # Thread pages, keyset-paginated by (created_at, id)
+    __table_args__ = (Index("ix_forum_messages_forum_created", "forum_id", "created_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
     forum_id = Column(Integer, ForeignKey("forums.id"), nullable=False)
@@ -459,6 +791,21 @@ class ForumFavorite(Base):
     forum = relationship("Forum", back_populates="favorites")
 
 
+class ForumSearchTerm(Base):
+    """Inverted index for forum search: one row per term of a forum's title/description or of one message."""
+    __tablename__ = "forum_search_terms"
+    __table_args__ = (
+        Index("ix_forum_search_terms_term_forum", "term", "forum_id"),
+        Index("ix_forum_search_terms_forum_message", "forum_id", "message_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    term = Column(String(40), nullable=False)
+    forum_id = Column(Integer, ForeignKey("forums.id"), nullable=False)
+    message_id = Column(Integer, ForeignKey("forum_messages.id"), nullable=True)  # NULL: title/description
+    weight = Column(Integer, nullable=False)
+
+
 class ForumCreate(BaseModel):
     title: str = Field(..., max_length=80)
     description: Optional[str] = Field(None, max_length=500)
@@ -518,6 +865,7 @@ AI_DAILY_MESSAGE_LIMIT = 15
 AI_MESSAGE_MAX_LENGTH = 500
 AI_WEEKLY_WORKOUT_LIMIT = 14
 AI_DAILY_WORKOUT_LIMIT = 2
+AI_PREVIEW_TTL_SECONDS = 30 * 60
 
 
 class AIChatRequest(BaseModel):
@@ -648,7 +996,8 @@ class GeneratedWorkout(BaseModel):
     exercises: List[GeneratedWorkoutExercise]
 
 class SaveGeneratedProgramRequest(BaseModel):
-    workouts: List[GeneratedWorkout]
+    preview_id: Optional[str] = None  # commit a server-side preview as-is
+    workouts: List[GeneratedWorkout] = []  # or upload the (edited) program
 
 
 # ---------------------------------------------------------------------------
@@ -683,7 +1032,10 @@ __all__ = [
     "ClientCoachRequestCreate",
     "ClientCoachRequest",
     "Message",
+    "UnreadCounter",
+    "Notification",
     "MessageCreate",
+    "MessageBroadcast",
     "MessageRead",
     "CoachNotification",
     "ConversationRead",
@@ -691,15 +1043,36 @@ __all__ = [
     "InvitationCreate",
     "InvitationUpdate",
     "Users",
+    "CoachStats",
     "UserUpdate",
     "UserCreate",
     "Meal",
+    "MealItem",
     "MealCreateByCoach",
     "Training",
     "Exercice",
     "Workout",
     "WorkoutExercise",
+    "PersonalRecord",
+    "ExerciseProgress",
     "WorkoutCreate",
+    "WorkoutExercisePatch",
+    "WorkoutSchedule",
+    "ScheduledOccurrenceRead",
+    "WorkoutListItem",
+    "WorkoutScheduleCreate",
+    "WorkoutScheduleRead",
+    "CoachTemplate",
+    "ChangeLog",
+    "SyncMutation",
+    "EntityVersion",
+    "SyncMutationIn",
+    "SyncRequest",
+    "WorkoutTemplateBody",
+    "MealTemplateBody",
+    "CoachTemplateCreate",
+    "TemplateApplyRequest",
+    "WorkoutPatch",
     "WorkoutRead",
     "WorkoutExerciseCreate",
     "WorkoutExerciseRead",
@@ -715,6 +1088,7 @@ __all__ = [
     "Forum",
     "ForumMessage",
     "ForumFavorite",
+    "ForumSearchTerm",
     "ForumCreate",
     "ForumUpdate",
     "ForumRead",
@@ -0,0 +1,108 @@
+"""
+Benchmark: get_coach_dashboard_stats, legacy per-client loop vs grouped query.
+
+Seeds a coach with 10 / 100 / 1000 clients (MEALS_PER_CLIENT meals each, spread
+over a week) and times both implementations.
+
+    cd Back
+    python -m benchmarks.coach_dashboard                 # throwaway SQLite file (needs aiosqlite)
+    DATABASE_URL=mysql+aiomysql://... python -m benchmarks.coach_dashboard
+
+WARNING: the schema is dropped and recreated, never point it at a real database.
+"""
+
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.gettempdir()}/staple_bench.db")
+
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_, func, insert, select
+
+from app.database import Base, SessionLocal, engine
+from app.model import get_coach_dashboard_stats
+from app.schemas import Meal, Users
+
+CLIENT_COUNTS = (10, 100, 1000)
+MEALS_PER_CLIENT = 20
+RUNS = 5
+
+
+async def legacy_coach_dashboard_stats(session, coach_id: int):
+    """Previous implementation: one SUM query per client with func.date()."""
+    today = date.today()
+    clients = (await session.execute(select(Users).where(Users.coach_id == coach_id))).scalars().all()
+    dashboard_data = []
+    for client in clients:
+        total = (await session.execute(
+            select(func.sum(Meal.total_calories))
+            .where(and_(Meal.user_id == client.id, func.date(Meal.hourtime) == today))
+        )).scalar() or 0
+        dashboard_data.append({"client_id": client.id, "calories_consumed": round(total)})
+    return dashboard_data
+
+
+async def seed(num_clients: int) -> int:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    now = datetime.now()
+    async with SessionLocal() as session:
+        coach = Users(firstname="Coach", lastname="Bench", email="coach@bench.local", age=35,
+                      gender="male", role="coach", _password="x")
+        session.add(coach)
+        await session.flush()
+
+        await session.execute(insert(Users), [
+            {"firstname": "Client", "lastname": str(i), "email": f"client{i}@bench.local", "age": 30,
+             "gender": "female", "role": "client", "_password": "x", "coach_id": coach.id,
+             "daily_caloric_needs": 2200}
+            for i in range(num_clients)
+        ])
+        client_ids = (await session.execute(select(Users.id).where(Users.coach_id == coach.id))).scalars().all()
+
+        await session.execute(insert(Meal), [
+            {"user_id": client_id, "name": "Meal", "aliments": "[]",
+             "total_calories": random.uniform(200, 900),
+             "hourtime": now - timedelta(days=random.randint(0, 6), hours=random.randint(0, 12))}
+            for client_id in client_ids
+            for _ in range(MEALS_PER_CLIENT)
+        ])
+        await session.commit()
+        return coach.id
+
+
+async def timed(fn, coach_id: int) -> tuple[float, list]:
+    best = float("inf")
+    result = []
+    for _ in range(RUNS):
+        async with SessionLocal() as session:
+            start = time.perf_counter()
+            result = await fn(session, coach_id)
+            best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+async def main():
+    engine.echo = False
+    print(f"{engine.url.get_backend_name()}, {MEALS_PER_CLIENT} meals/client, best of {RUNS}")
+    print(f"{'clients':>8} {'legacy (ms)':>12} {'grouped (ms)':>13} {'speedup':>8}")
+    for num_clients in CLIENT_COUNTS:
+        coach_id = await seed(num_clients)
+        legacy_s, legacy = await timed(legacy_coach_dashboard_stats, coach_id)
+        grouped_s, grouped = await timed(get_coach_dashboard_stats, coach_id)
+
+        assert [(r["client_id"], r["calories_consumed"]) for r in legacy] == \
+               [(r["client_id"], r["calories_consumed"]) for r in grouped], "results differ"
+        print(f"{num_clients:>8} {legacy_s * 1000:>12.1f} {grouped_s * 1000:>13.1f} {legacy_s / grouped_s:>7.1f}x")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,35 @@
+import os
+import tempfile
+
+# app.database builds its engine on import: point it at a throwaway SQLite file first
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.gettempdir()}/staple_tests.db")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import create_app
+from app.database import engine
+
+engine.echo = False
+
+
+@pytest.fixture(scope="session")
+def client():
+    # startup drops and recreates the schema: the session starts from an empty database,
+    # tests share it (use distinct emails)
+    with TestClient(create_app()) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def register(client):
+    def _register(email: str, role: str = "client", **extra):
+        body = {"firstname": "Test", "lastname": "User", "email": email, "password": "password",
+                "age": 30, "gender": "male", "role": role, **extra}
+        response = client.post("/register", json=body)
+        assert response.status_code == 201, response.text
+        data = response.json()
+        return data["user"]["id"], {"Authorization": f"Bearer {data['access_token']}"}
+    return _register
@@ -0,0 +1,97 @@
+from datetime import datetime
+
+from sqlalchemy import delete
+
+from app.database import SessionLocal
+from app.schemas import CoachStats
+
+RATING = {"perceived_difficulty": "just_right", "energy_level": "normal"}
+
+
+def _coach_workout(client, register, email_prefix):
+    coach_id, coach_headers = register(f"{email_prefix}-coach@test.fr", "coach")
+    client_id, client_headers = register(f"{email_prefix}-client@test.fr")
+    assert client.put(f"/users/{client_id}/assign-coach/{coach_id}", headers=coach_headers).status_code == 200
+    workout = {
+        "name": "Coach session", "difficulty": "Beginner",
+        "scheduled_date": datetime.now().replace(microsecond=0).isoformat(),
+        "exercises": [{"name": "Squat", "muscle": "legs", "num_sets": 1,
+                       "sets_details": [{"set_number": 1, "reps": 10, "weight": 40, "duration": 0}]}],
+    }
+    response = client.post(f"/coaches/clients/{client_id}/workouts/create", json=workout, headers=coach_headers)
+    assert response.status_code == 201, response.text
+    return coach_id, coach_headers, client_headers, response.json()["workout_id"]
+
+
+def _ratings(client, coach_id, headers):
+    stats = client.get(f"/coaches/{coach_id}/public-profile", headers=headers).json()["stats"]
+    return stats["ratings_count"], stats["average_rating"]
+
+
+def test_rating_from_toggle_complete_counts_for_the_coach(client, register):
+    coach_id, coach_headers, headers, workout_id = _coach_workout(client, register, "toggle")
+
+    client.patch(f"/workouts/{workout_id}/toggle-complete", json={"overall_rating": 5, **RATING}, headers=headers)
+    assert _ratings(client, coach_id, coach_headers) == (1, 5.0)
+
+    client.put(f"/workouts/{workout_id}/rating", json={"overall_rating": 3, **RATING}, headers=headers)
+    assert _ratings(client, coach_id, coach_headers) == (1, 3.0)
+
+    # uncompleting deletes the rating
+    client.patch(f"/workouts/{workout_id}/toggle-complete", headers=headers)
+    assert _ratings(client, coach_id, coach_headers) == (0, None)
+
+
+def test_deleting_a_rated_workout_removes_its_rating(client, register):
+    coach_id, coach_headers, headers, workout_id = _coach_workout(client, register, "delete")
+
+    client.patch(f"/workouts/{workout_id}/toggle-complete", json={"overall_rating": 4, **RATING}, headers=headers)
+    assert _ratings(client, coach_id, coach_headers) == (1, 4.0)
+
+    assert client.delete(f"/workouts/{workout_id}", headers=headers).status_code == 200
+    assert _ratings(client, coach_id, coach_headers) == (0, None)
+
+
+def test_rating_update_rebuilds_missing_stats_row_with_new_rating(client, register):
+    coach_id, coach_headers, headers, workout_id = _coach_workout(client, register, "missing")
+    client.patch(f"/workouts/{workout_id}/toggle-complete", headers=headers)
+
+    async def drop_stats():
+        async with SessionLocal() as session:
+            await session.execute(delete(CoachStats).where(CoachStats.coach_id == coach_id))
+            await session.commit()
+    client.portal.call(drop_stats)
+
+    client.put(f"/workouts/{workout_id}/rating", json={"overall_rating": 2, **RATING}, headers=headers)
+    assert _ratings(client, coach_id, coach_headers) == (1, 2.0)
+
+
+def _stats(client, coach_id, headers):
+    return client.get(f"/coaches/{coach_id}/public-profile", headers=headers).json()["stats"]
+
+
+def test_counters_are_live_and_match_a_reseeded_row(client, register):
+    coach_id, coach_headers, headers, workout_id = _coach_workout(client, register, "live")
+    start = _stats(client, coach_id, coach_headers)
+
+    forum = {"title": "Coach corner", "description": "Questions", "topic": "general", "status": "public"}
+    forum_id = client.post("/forums", json=forum, headers=coach_headers).json()["id"]
+    first = client.post(f"/forums/{forum_id}/messages", json={"content": "Welcome"}, headers=coach_headers).json()["id"]
+    client.post(f"/forums/{forum_id}/messages", json={"content": "Rules"}, headers=coach_headers)
+    assert _stats(client, coach_id, coach_headers)["forum_posts"] == start["forum_posts"] + 2
+
+    client.delete(f"/forums/{forum_id}/messages/{first}", headers=coach_headers)
+    assert _stats(client, coach_id, coach_headers)["forum_posts"] == start["forum_posts"] + 1
+    client.delete(f"/forums/{forum_id}", headers=coach_headers)
+    assert _stats(client, coach_id, coach_headers)["forum_posts"] == start["forum_posts"]
+
+    client.delete(f"/workouts/{workout_id}", headers=headers)
+    tracked = _stats(client, coach_id, coach_headers)
+    assert tracked["workouts_created"] == start["workouts_created"] - 1
+
+    async def drop_stats():
+        async with SessionLocal() as session:
+            await session.execute(delete(CoachStats).where(CoachStats.coach_id == coach_id))
+            await session.commit()
+    client.portal.call(drop_stats)
+    assert _stats(client, coach_id, coach_headers) == tracked
@@ -0,0 +1,29 @@
+from datetime import datetime
+
+WORKOUT = {
+    "name": "Upper body", "difficulty": "Beginner",
+    "scheduled_date": datetime.now().replace(microsecond=0).isoformat(),
+    "exercises": [{"name": "Push-up", "muscle": "chest", "num_sets": 1,
+                   "sets_details": [{"set_number": 1, "reps": 12, "weight": 0, "duration": 0}]}],
+}
+
+
+def _client_workout(client, register):
+    coach_id, coach_headers = register("edit-coach@test.fr", "coach")
+    client_id, _ = register("edit-client@test.fr")
+    client.put(f"/users/{client_id}/assign-coach/{coach_id}", headers=coach_headers)
+    response = client.post(f"/coaches/clients/{client_id}/workouts/create", json=WORKOUT, headers=coach_headers)
+    return coach_headers, response.json()["workout_id"]
+
+
+def test_coach_workout_edits_require_the_clients_coach(client, register):
+    coach_headers, workout_id = _client_workout(client, register)
+    _, other_coach_headers = register("edit-other-coach@test.fr", "coach")
+
+    for method, body in (("put", {**WORKOUT, "name": "Renamed"}), ("patch", {"name": "Renamed"})):
+        url = f"/coaches/workouts/{workout_id}"
+        assert client.request(method, url, json=body, headers={"Authorization": "Bearer not-a-token"}).status_code == 401
+        assert client.request(method, url, json=body, headers=other_coach_headers).status_code == 403
+        assert client.request(method, url, json=body, headers=coach_headers).status_code == 200
+
+    assert client.patch("/coaches/workouts/999999", json={"name": "x"}, headers=coach_headers).status_code == 404
@@ -0,0 +1,9 @@
+from app.exercise_catalog import REMOTE_MUSCLE_GROUPS, _entry_to_row, _remote_to_entry
+from app.schemas import Exercice
+
+
+def test_remote_targets_are_stored_whole():
+    assert max(len(target) for target in REMOTE_MUSCLE_GROUPS) <= Exercice.__table__.c.target.type.length
+
+    entry = _remote_to_entry({"name": "jumping jacks", "targetMuscles": ["cardiovascular system"]})
+    assert _entry_to_row(entry)["target"] == "cardiovascular system"
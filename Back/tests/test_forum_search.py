@@ -0,0 +1,35 @@
+def test_description_match_after_eighth_word_is_the_snippet(client, register):
+    _, headers = register("forum-search@test.fr")
+    forum = {
+        "title": "Kitchen corner",
+        "description": "Weekly thread about nutrition tips recipes meal prep macros and protein shakes",
+        "topic": "nutrition", "status": "public",
+    }
+    forum_id = client.post("/forums", json=forum, headers=headers).json()["id"]
+    client.post(f"/forums/{forum_id}/messages", json={"content": "Best protein bars?"}, headers=headers)
+
+    results = client.get("/forums/search", params={"q": "protein"}, headers=headers).json()["results"]
+    hit = next(r for r in results if r["id"] == forum_id)
+    assert hit["snippet_source"] == "description"
+
+
+def test_backfill_indexes_only_missing_forums_and_messages(client, register):
+    from sqlalchemy import delete
+
+    from app.database import SessionLocal
+    from app.model import backfill_forum_search_index
+    from app.schemas import ForumSearchTerm
+
+    _, headers = register("forum-backfill@test.fr")
+    forum = {"title": "Marathon training", "description": "Long runs", "topic": "running", "status": "public"}
+    forum_id = client.post("/forums", json=forum, headers=headers).json()["id"]
+    client.post(f"/forums/{forum_id}/messages", json={"content": "Tapering advice"}, headers=headers)
+
+    async def run():
+        async with SessionLocal() as session:
+            already_indexed = await backfill_forum_search_index(session)
+            await session.execute(delete(ForumSearchTerm).where(ForumSearchTerm.forum_id == forum_id))
+            await session.commit()
+            return already_indexed, await backfill_forum_search_index(session), await backfill_forum_search_index(session)
+
+    assert client.portal.call(run) == (0, 2, 0)
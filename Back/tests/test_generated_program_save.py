@@ -0,0 +1,43 @@
+from datetime import date
+
+from app.routes import _program_previews
+from app.schemas import GeneratedWorkout
+
+
+def _workout(name, scheduled_date):
+    return GeneratedWorkout(name=name, scheduled_date=scheduled_date, exercises=[
+        {"name": "Plank", "muscle": "abs", "num_sets": 1,
+         "sets_details": [{"set_number": 1, "reps": 0, "weight": 0, "duration": 45}]},
+    ])
+
+
+def test_failed_workouts_stay_in_the_preview(client, register):
+    user_id, headers = register("preview@test.fr")
+    today = f"{date.today().isoformat()}T10:00:00"
+    _program_previews.set("retry-preview", {"user_id": user_id, "workouts": [
+        _workout("Good", today), _workout("Bad", "not-a-date"),
+    ]})
+
+    response = client.post("/workouts/save-generated-program", json={"preview_id": "retry-preview"}, headers=headers)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["count"] == 1 and len(body["failed"]) == 1
+    assert body["preview_id"] == "retry-preview"
+    assert [w.name for w in _program_previews.get("retry-preview")["workouts"]] == ["Bad"]
+
+    # nothing saved: the preview is still there for another try
+    response = client.post("/workouts/save-generated-program", json={"preview_id": "retry-preview"}, headers=headers)
+    assert response.json()["count"] == 0
+    assert _program_previews.get("retry-preview") is not None
+
+
+def test_fully_saved_preview_is_consumed(client, register):
+    user_id, headers = register("preview-ok@test.fr")
+    _program_previews.set("done-preview", {"user_id": user_id, "workouts": [
+        _workout("Good", f"{date.today().isoformat()}T10:00:00"),
+    ]})
+
+    response = client.post("/workouts/save-generated-program", json={"preview_id": "done-preview"}, headers=headers)
+    assert response.json()["count"] == 1
+    assert "preview_id" not in response.json()
+    assert _program_previews.get("done-preview") is None
@@ -0,0 +1,24 @@
+import json
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app.database import SessionLocal
+from app.model import backfill_meal_items
+from app.schemas import Meal
+
+
+def test_backfill_skips_meals_without_aliments(client, register):
+    user_id, _ = register("backfill@test.fr")
+    aliment = {"name": "Apple", "code": "123", "quantity": 150, "macros": {"energy": 78}}
+
+    async def run():
+        async with SessionLocal() as session:
+            await session.execute(insert(Meal), [
+                {"user_id": user_id, "name": name, "aliments": aliments, "total_calories": 0, "hourtime": datetime.now()}
+                for name, aliments in (("Empty", "[]"), ("Blank", ""), ("Snack", json.dumps([aliment])))
+            ])
+            await session.commit()
+            return await backfill_meal_items(session), await backfill_meal_items(session)
+
+    assert client.portal.call(run) == (1, 0)
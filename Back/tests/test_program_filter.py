@@ -0,0 +1,19 @@
+from app.program_filter import filter_exercises_for_day, generate_rule_based_program
+
+DAY = {"date": "2026-01-05", "focus": "Lower Body", "mode": "constant"}
+KNEE = ["right_knee: sprain"]
+
+
+def test_no_fallback_to_excluded_exercises():
+    exercises = [{"name": "Barbell Squat", "muscle": "legs"}, {"name": "Walking Lunge", "muscle": "legs"}]
+    assert filter_exercises_for_day(DAY, exercises, KNEE) == []
+
+
+def test_rule_based_program_skips_days_without_safe_exercises():
+    exercises = [{"name": "Barbell Squat", "muscle": "legs"}]
+    assert generate_rule_based_program([DAY], exercises, {"injuries": KNEE}) == []
+
+
+def test_safe_exercises_are_kept():
+    exercises = [{"name": "Barbell Squat", "muscle": "legs"}, {"name": "Hip Thrust", "muscle": "glutes"}]
+    assert [ex["name"] for ex in filter_exercises_for_day(DAY, exercises, KNEE)] == ["Hip Thrust"]
@@ -0,0 +1,34 @@
+from datetime import date, datetime
+
+
+def test_today_includes_schedule_occurrence(client, register):
+    _, headers = register("today@test.fr", weight=75)
+    schedule = {
+        "name": "Daily mobility",
+        "difficulty": "Beginner",
+        "starts_at": datetime.now().replace(microsecond=0).isoformat(),
+        "freq": "daily",
+        "exercises": [{"name": "Squat", "muscle": "legs", "num_sets": 2,
+                       "sets_details": [{"set_number": 1, "reps": 10, "weight": 0, "duration": 0}]}],
+    }
+    response = client.post("/workouts/schedules", json=schedule, headers=headers)
+    assert response.status_code == 201, response.text
+
+    response = client.get("/users/me/today", headers=headers)
+    assert response.status_code == 200, response.text
+
+    workouts = response.json()["sections"]["workouts"]["data"]
+    occurrences = [w for w in workouts if w.get("is_virtual")]
+    assert len(occurrences) == 1
+    assert occurrences[0]["occurrence_date"] == date.today().isoformat()
+    assert occurrences[0]["exercises"][0]["name"] == "Squat"
+
+
+def test_today_unchanged_sections_return_304(client, register):
+    _, headers = register("etag@test.fr")
+    first = client.get("/users/me/today", headers=headers)
+    assert first.status_code == 200
+
+    etags = ", ".join(section["etag"] for section in first.json()["sections"].values())
+    second = client.get("/users/me/today", headers={**headers, "If-None-Match": etags})
+    assert second.status_code == 304
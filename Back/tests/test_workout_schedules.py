@@ -0,0 +1,38 @@
+from datetime import date, datetime
+
+SCHEDULE = {
+    "name": "Morning run", "difficulty": "Beginner", "freq": "daily",
+    "starts_at": datetime.now().replace(microsecond=0).isoformat(),
+    "exercises": [{"name": "Run", "muscle": "cardio", "num_sets": 1,
+                   "sets_details": [{"set_number": 1, "reps": 0, "weight": 0, "duration": 900}]}],
+}
+
+
+def test_my_workouts_lists_occurrences_only_on_request(client, register):
+    _, headers = register("schedule-list@test.fr")
+    assert client.post("/workouts/schedules", json=SCHEDULE, headers=headers).status_code == 201
+
+    workouts = client.get("/workouts/my-workouts", headers=headers).json()
+    assert workouts and all(w.get("id") is not None for w in workouts)
+
+    with_scheduled = client.get("/workouts/my-workouts?include_scheduled=true", headers=headers).json()
+    assert any(w.get("id") is None and w.get("is_virtual") for w in with_scheduled)
+
+
+def test_coach_schedule_for_client(client, register):
+    coach_id, coach_headers = register("schedule-coach@test.fr", "coach")
+    client_id, headers = register("schedule-client@test.fr")
+    _, other_coach_headers = register("schedule-other-coach@test.fr", "coach")
+    client.put(f"/users/{client_id}/assign-coach/{coach_id}", headers=coach_headers)
+
+    url = f"/coaches/clients/{client_id}/workouts/schedules"
+    assert client.post(url, json=SCHEDULE, headers=other_coach_headers).status_code == 403
+    response = client.post(url, json=SCHEDULE, headers=coach_headers)
+    assert response.status_code == 201, response.text
+    schedule_id = response.json()["id"]
+
+    before = client.get(f"/coaches/{coach_id}/public-profile", headers=coach_headers).json()["stats"]
+    workout = client.post(f"/workouts/schedules/{schedule_id}/occurrences/{date.today().isoformat()}", headers=headers)
+    assert workout.status_code == 200, workout.text
+    after = client.get(f"/coaches/{coach_id}/public-profile", headers=coach_headers).json()["stats"]
+    assert after["workouts_created"] == before["workouts_created"] + 1